@@ -1,8 +1,10 @@
-from flask import Flask, request, jsonify, render_template
+from flask import Flask, request, jsonify, render_template, g, Response
 import os
+import time
 from flask_cors import CORS, cross_origin
-from cnnClassifier.utils.common import decodeImage
-from cnnClassifier.pipeline.predict import PredictionPipeline
+from cnnClassifier.utils.common import decodeImageBytes
+from cnnClassifier.pipeline.client_app import ClientApp, ModelNotReady
+from cnnClassifier.components.instrumentation import observe_request, PREDICTION_STEP_DURATION
 
 
 os.putenv('LANG', 'en_US.UTF-8')
@@ -12,10 +14,34 @@ app = Flask(__name__)
 CORS(app)
 
 
-class ClientApp:
-    def __init__(self):
-        self.filename = "inputImage.jpg"
-        self.classifier = PredictionPipeline(self.filename)
+@app.before_request
+def startTimer():
+    g.request_start = time.perf_counter()
+
+
+@app.after_request
+def recordRequest(response):
+    # Routes are labelled by their rule, e.g. /train/jobs/<job_id>, to bound the number of series
+    route = request.url_rule.rule if request.url_rule is not None else "unmatched"
+    observe_request(route, request.method, response.status_code, time.perf_counter() - g.request_start)
+    return response
+
+
+@app.errorhandler(ModelNotReady)
+def modelNotReady(e):
+    return jsonify({"error": str(e)}), 503, {"Retry-After": "5"}
+
+
+@app.route("/healthz", methods=['GET'])
+def healthzRoute():
+    # Liveness: the process answers, whether or not the model is loaded yet
+    return jsonify({"status": "ok"})
+
+
+@app.route("/readyz", methods=['GET'])
+def readyzRoute():
+    payload, status = clApp.readiness()
+    return jsonify(payload), status
 
 
 @app.route("/", methods=['GET'])
@@ -27,22 +53,93 @@ def home():
 @app.route("/train", methods=['GET','POST'])
 @cross_origin()
 def trainRoute():
-    os.system("python main.py")
-    return "Training done successfully!"
+    # Stage names may be given to run only part of the pipeline, e.g. {"stages": ["training"]}
+    stages = (request.get_json(silent=True) or {}).get("stages")
+    payload, status = clApp.submit_training(stages)
+    return jsonify(payload), status
+
+
+@app.route("/train/jobs", methods=['GET'])
+@cross_origin()
+def trainJobsRoute():
+    return jsonify(clApp.training_jobs.jobs())
+
+
+@app.route("/train/jobs/<job_id>", methods=['GET'])
+@cross_origin()
+def trainJobStatusRoute(job_id):
+    payload, status = clApp.training_job(job_id)
+    return jsonify(payload), status
+
+
+@app.route("/models", methods=['GET'])
+@cross_origin()
+def modelsRoute():
+    return jsonify(clApp.model_server.status())
+
+
+@app.route("/models/rollback", methods=['POST'])
+@cross_origin()
+def modelRollbackRoute():
+    payload, status = clApp.rollback_model()
+    return jsonify(payload), status
 
 
+@app.route("/models/<version>/promote", methods=['POST'])
+@cross_origin()
+def modelPromoteRoute(version):
+    payload, status = clApp.promote_model(version)
+    return jsonify(payload), status
+
 
 @app.route("/predict", methods=['POST'])
 @cross_origin()
 def predictRoute():
-    image = request.json['image']
-    decodeImage(image, clApp.filename)
-    result = clApp.classifier.predict()
-    return jsonify(result)
+    image = decodeImageBytes(request.json['image'])
+    result = clApp.predict(image)
+    with PREDICTION_STEP_DURATION.time(step="serialize"):
+        return jsonify(result)
+
+
+@app.route("/predict_batch", methods=['POST'])
+@cross_origin()
+def predictBatchRoute():
+    # Accepts either multipart file uploads or a JSON array of base64 images
+    if request.files:
+        items = [(f.filename or key, f.read()) for key, f in request.files.items(multi=True)]
+    else:
+        images = request.json
+        if isinstance(images, dict):
+            images = images['images']
+        items = [(str(i), decodeImageBytes(image)) for i, image in enumerate(images)]
+
+    results = list(clApp.bulk_scorer.iter_predictions(items))
+    return jsonify(results)
+
+
+@app.route("/cache/stats", methods=['GET'])
+@cross_origin()
+def cacheStatsRoute():
+    return jsonify(clApp.cache_stats())
+
+
+@app.route("/batching/stats", methods=['GET'])
+@cross_origin()
+def batchingStatsRoute():
+    return jsonify(clApp.batching_stats())
+
+
+@app.route("/metrics", methods=['GET'])
+def metricsRoute():
+    return Response(clApp.metrics(), content_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+# Created at import so WSGI servers such as gunicorn (app:app) get it too; the
+# model loads in the background and /readyz turns 200 once it is served
+clApp = ClientApp()
 
 
 if __name__ == "__main__":
-    clApp = ClientApp()
     # app.run(host='0.0.0.0', port=8080) #local host
     # app.run(host='0.0.0.0', port=8080) #for AWS
-    app.run(host='0.0.0.0', port=80) #for AZURE
\ No newline at end of file
+    app.run(host='0.0.0.0', port=80) #for AZURE
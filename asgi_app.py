@@ -0,0 +1,321 @@
+import asyncio
+import binascii
+import contextlib
+import os
+import time
+import numpy as np
+import uvicorn
+from starlette.applications import Starlette
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import UploadFile
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.responses import JSONResponse, PlainTextResponse
+from starlette.routing import Route
+from starlette.templating import Jinja2Templates
+from cnnClassifier import logger
+from cnnClassifier.utils.common import decodeImageBytes
+from cnnClassifier.config.configuration import ConfigurationManager
+from cnnClassifier.pipeline.client_app import ClientApp, ModelNotReady
+from cnnClassifier.components.inference_pool import InferencePool, InferenceQueueFull
+from cnnClassifier.components.instrumentation import observe_request, PREDICTION_STEP_DURATION
+
+
+os.putenv('LANG', 'en_US.UTF-8')
+os.putenv('LC_ALL', 'en_US.UTF-8')
+
+templates = Jinja2Templates(directory="templates")
+
+
+class MetricsMiddleware:
+    """Records the latency and status of every HTTP request."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status = [500]
+
+        async def send_with_status(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            # The router puts the matched endpoint in the scope; routes are labelled by their path template
+            route = ROUTE_PATHS.get(scope.get("endpoint"), "unmatched")
+            observe_request(route, scope["method"], status[0], time.perf_counter() - start)
+
+
+class PayloadError(ValueError):
+    def __init__(self, message: str, status_code: int = 400):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+async def read_images(request) -> list:
+    """(name, bytes) of the uploaded images.
+
+    Accepts multipart uploads, a JSON body with base64 images ({"image": ...},
+    {"images": [...]} or a plain list) and a raw image body of any other
+    content type, which avoids the base64 overhead.
+    """
+    max_bytes = int(request.app.state.config.max_upload_mb * 1024 * 1024)
+    if int(request.headers.get("content-length") or 0) > max_bytes:
+        raise PayloadError(f"Request body exceeds {request.app.state.config.max_upload_mb} MB", 413)
+
+    content_type = request.headers.get("content-type", "")
+    if content_type.startswith("multipart/form-data"):
+        form = await request.form(max_part_size=max_bytes)
+        return [
+            (value.filename or key, await value.read())
+            for key, value in form.multi_items() if isinstance(value, UploadFile)
+        ]
+
+    if content_type.startswith("application/json"):
+        try:
+            payload = await request.json()
+        except ValueError:
+            raise PayloadError("Request body is not valid JSON")
+        if isinstance(payload, dict):
+            payload = payload["images"] if "images" in payload else [payload.get("image")]
+        try:
+            return [(str(i), decodeImageBytes(image)) for i, image in enumerate(payload)]
+        except (binascii.Error, TypeError, ValueError):
+            raise PayloadError("Images must be base64 encoded strings")
+
+    body = await request.body()
+    if len(body) > max_bytes:
+        raise PayloadError(f"Request body exceeds {request.app.state.config.max_upload_mb} MB", 413)
+    return [("image", body)] if body else []
+
+
+async def run_inference(request, work):
+    """Runs ``work()`` within the admission and timeout limits of the inference pool."""
+    pool = request.app.state.pool
+    try:
+        async with pool.slot():
+            result = await pool.with_timeout(work())
+        with PREDICTION_STEP_DURATION.time(step="serialize"):
+            return JSONResponse(result)
+    except InferenceQueueFull:
+        return JSONResponse(
+            {"error": "Server is busy, retry later"},
+            status_code=503,
+            headers={"Retry-After": str(request.app.state.config.retry_after_s)}
+        )
+    except asyncio.TimeoutError:
+        return JSONResponse({"error": "Prediction timed out"}, status_code=504)
+    except PayloadError as e:
+        return JSONResponse({"error": str(e)}, status_code=e.status_code)
+
+
+async def modelNotReady(request, exc):
+    return JSONResponse(
+        {"error": str(exc)}, status_code=503, headers={"Retry-After": str(request.app.state.config.retry_after_s)}
+    )
+
+
+async def healthzRoute(request):
+    # Liveness: the process answers, whether or not the model is loaded yet
+    return JSONResponse({"status": "ok"})
+
+
+async def readyzRoute(request):
+    payload, status = request.app.state.client_app.readiness()
+    return JSONResponse(payload, status_code=status)
+
+
+async def home(request):
+    return templates.TemplateResponse(request, "index.html")
+
+
+async def predictRoute(request):
+    try:
+        images = await read_images(request)
+    except PayloadError as e:
+        return JSONResponse({"error": str(e)}, status_code=e.status_code)
+    if len(images) != 1:
+        return JSONResponse({"error": "Expected exactly one image, use /predict_batch for more"}, status_code=400)
+
+    client_app = request.app.state.client_app
+    pool = request.app.state.pool
+    # The model is picked once so a hot swap never mixes two versions in one request
+    served = client_app.model_server.active
+    classifier = served.classifier
+
+    # Resubmitted images are answered from the cache without taking an inference slot
+    key = client_app.cache_key(images[0][1], served)
+    if key is not None:
+        cache = client_app.prediction_cache
+        result = cache.get_memory(key)
+        if result is None and cache.shared:
+            # The SQLite lookup may wait on a lock of another process, so it runs off the event loop
+            result = await run_in_threadpool(cache.get_shared, key)
+        if result is not None:
+            with PREDICTION_STEP_DURATION.time(step="serialize"):
+                return JSONResponse(result)
+
+    def profiled_predict():
+        # cProfile only follows the thread it runs on, so a sampled request takes the same
+        # steps on a single pool thread, which waits for its micro-batch
+        with client_app.profiler.profile("predict"):
+            try:
+                array = classifier.preprocess(images[0][1])
+            except Exception as e:
+                raise PayloadError(f"Could not decode image: {e}")
+            if classifier.batcher is not None:
+                probabilities = classifier.batcher.predict(array)
+            else:
+                probabilities = classifier.predict_batch(np.expand_dims(array, axis=0))[0]
+            return classifier.postprocess(probabilities)
+
+    async def predict():
+        if client_app.profiler.sample():
+            result = await pool.run(profiled_predict)
+        else:
+            try:
+                array = await pool.run(classifier.preprocess, images[0][1])
+            except Exception as e:
+                raise PayloadError(f"Could not decode image: {e}")
+            if classifier.batcher is not None:
+                # Waiting for the micro-batch does not hold a pool thread
+                probabilities = await asyncio.wrap_future(classifier.batcher.submit(array))
+            else:
+                probabilities = (await pool.run(classifier.predict_batch, np.expand_dims(array, axis=0)))[0]
+            result = classifier.postprocess(probabilities)
+        if key is not None:
+            # The shared SQLite store is written off the event loop
+            await pool.run(client_app.prediction_cache.put, key, result)
+        return result
+
+    return await run_inference(request, predict)
+
+
+async def predictBatchRoute(request):
+    try:
+        images = await read_images(request)
+    except PayloadError as e:
+        return JSONResponse({"error": str(e)}, status_code=e.status_code)
+
+    pool = request.app.state.pool
+    bulk_scorer = request.app.state.client_app.bulk_scorer
+
+    async def predict_batch():
+        return await pool.run(lambda: list(bulk_scorer.iter_predictions(images)))
+
+    return await run_inference(request, predict_batch)
+
+
+async def trainRoute(request):
+    # Stage names may be given to run only part of the pipeline, e.g. {"stages": ["training"]}
+    try:
+        stages = (await request.json() or {}).get("stages")
+    except ValueError:
+        stages = None
+    payload, status = await run_in_threadpool(request.app.state.client_app.submit_training, stages)
+    return JSONResponse(payload, status_code=status)
+
+
+async def trainJobsRoute(request):
+    return JSONResponse(await run_in_threadpool(request.app.state.client_app.training_jobs.jobs))
+
+
+async def trainJobStatusRoute(request):
+    payload, status = await run_in_threadpool(
+        request.app.state.client_app.training_job, request.path_params["job_id"]
+    )
+    return JSONResponse(payload, status_code=status)
+
+
+async def modelsRoute(request):
+    return JSONResponse(await run_in_threadpool(request.app.state.client_app.model_server.status))
+
+
+async def modelRollbackRoute(request):
+    payload, status = await run_in_threadpool(request.app.state.client_app.rollback_model)
+    return JSONResponse(payload, status_code=status)
+
+
+async def modelPromoteRoute(request):
+    # Loading and warming up the version takes a while, so it runs off the event loop
+    payload, status = await run_in_threadpool(
+        request.app.state.client_app.promote_model, request.path_params["version"]
+    )
+    return JSONResponse(payload, status_code=status)
+
+
+async def cacheStatsRoute(request):
+    return JSONResponse(request.app.state.client_app.cache_stats())
+
+
+async def metricsRoute(request):
+    return PlainTextResponse(
+        await run_in_threadpool(request.app.state.client_app.metrics),
+        media_type="text/plain; version=0.0.4"
+    )
+
+
+async def batchingStatsRoute(request):
+    return JSONResponse({
+        **request.app.state.client_app.batching_stats(),
+        "inference_pool": request.app.state.pool.stats()
+    })
+
+
+@contextlib.asynccontextmanager
+async def lifespan(app):
+    config = ConfigurationManager().get_serving_config()
+    app.state.config = config
+    # Every server process loads its own model in the background; requests are
+    # accepted at once and /readyz reports when the model is served
+    app.state.client_app = await run_in_threadpool(ClientApp)
+    app.state.pool = InferencePool(
+        num_workers=config.inference_workers,
+        max_pending=config.max_pending,
+        timeout_s=config.request_timeout_s
+    )
+    logger.info(f"ASGI server ready with {config.inference_workers} inference workers")
+    yield
+    app.state.pool.shutdown()
+    app.state.client_app.stop()
+
+
+app = Starlette(
+    routes=[
+        Route("/", home, methods=["GET"]),
+        Route("/healthz", healthzRoute, methods=["GET"]),
+        Route("/readyz", readyzRoute, methods=["GET"]),
+        Route("/train", trainRoute, methods=["GET", "POST"]),
+        Route("/train/jobs", trainJobsRoute, methods=["GET"]),
+        Route("/train/jobs/{job_id}", trainJobStatusRoute, methods=["GET"]),
+        Route("/models", modelsRoute, methods=["GET"]),
+        Route("/models/rollback", modelRollbackRoute, methods=["POST"]),
+        Route("/models/{version}/promote", modelPromoteRoute, methods=["POST"]),
+        Route("/predict", predictRoute, methods=["POST"]),
+        Route("/predict_batch", predictBatchRoute, methods=["POST"]),
+        Route("/cache/stats", cacheStatsRoute, methods=["GET"]),
+        Route("/batching/stats", batchingStatsRoute, methods=["GET"]),
+        Route("/metrics", metricsRoute, methods=["GET"])
+    ],
+    middleware=[
+        Middleware(MetricsMiddleware),
+        Middleware(CORSMiddleware, allow_origins=["*"], allow_methods=["*"], allow_headers=["*"])
+    ],
+    exception_handlers={ModelNotReady: modelNotReady},
+    lifespan=lifespan
+)
+ROUTE_PATHS = {route.endpoint: route.path for route in app.routes}
+
+
+if __name__ == "__main__":
+    # For several processes run: uvicorn asgi_app:app --workers N
+    config = ConfigurationManager().get_serving_config()
+    uvicorn.run(app, host=config.host, port=config.port)
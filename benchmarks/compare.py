@@ -0,0 +1,82 @@
+"""Compares two benchmark result files metric by metric.
+
+Metrics ending in ``_per_s`` are better when higher; metrics ending in
+``_s``, ``_ms`` or ``_mb`` are better when lower. Exits with status 1 when a
+metric got worse by more than ``--threshold``.
+
+    python -m benchmarks.compare benchmarks/results/base.json benchmarks/results/new.json --threshold 0.1
+"""
+import argparse
+import json
+import sys
+
+
+def flatten(data: dict, prefix: str = "") -> dict:
+    flat = {}
+    for key, value in data.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            flat.update(flatten(value, f"{name}."))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[name] = value
+    return flat
+
+
+def direction(metric: str) -> int:
+    """1 when higher is better, -1 when lower is better, 0 for metrics that are not compared."""
+    if metric.endswith("_per_s"):
+        return 1
+    if metric.endswith(("_s", "_ms", "_mb")):
+        return -1
+    return 0
+
+
+def compare(base: dict, new: dict) -> list:
+    """(metric, base value, new value, relative change, regression) of the metrics in both files."""
+    base_metrics = flatten(base["suites"])
+    new_metrics = flatten(new["suites"])
+    rows = []
+    for metric in sorted(base_metrics.keys() & new_metrics.keys()):
+        sign = direction(metric)
+        if sign == 0 or base_metrics[metric] == 0:
+            continue
+        change = (new_metrics[metric] - base_metrics[metric]) / abs(base_metrics[metric])
+        # Positive when the metric got worse
+        rows.append((metric, base_metrics[metric], new_metrics[metric], change, -sign * change))
+    return rows
+
+
+def main(argv: list = None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("base")
+    parser.add_argument("new")
+    parser.add_argument("--threshold", type=float, default=0.1, help="relative slowdown reported as a regression")
+    args = parser.parse_args(argv)
+
+    with open(args.base) as f:
+        base = json.load(f)
+    with open(args.new) as f:
+        new = json.load(f)
+    if base.get("settings") != new.get("settings"):
+        print("Warning: the runs used different settings")
+    if base.get("machine") != new.get("machine"):
+        print("Warning: the runs were made on different machines or package versions")
+
+    print(f"{str(base.get('commit'))[:8]} -> {str(new.get('commit'))[:8]}")
+    regressions = 0
+    for metric, base_value, new_value, change, worse in compare(base, new):
+        flag = ""
+        if worse > args.threshold:
+            flag = "  REGRESSION"
+            regressions += 1
+        elif worse < -args.threshold:
+            flag = "  improved"
+        print(f"{metric:55s} {base_value:12.3f} {new_value:12.3f} {change:+8.1%}{flag}")
+
+    if regressions:
+        print(f"{regressions} metrics regressed by more than {args.threshold:.0%}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,625 @@
+"""Benchmarks of the training, evaluation and inference hot paths.
+
+Runs offline on a synthetic dataset with the class layout of
+Chicken-fecal-images, in a workspace with its own config.yaml, params.yaml
+and artifacts, so the project's artifacts are never touched. Every suite runs
+in its own process, which makes its peak RSS meaningful, and the results of
+a run are written to ``benchmarks/results/<timestamp>_<commit>.json``.
+
+    python -m benchmarks.run
+    python -m benchmarks.run --suites prediction http --param BACKBONE=VGG16 --param IMAGE_SIZE=[224,224,3]
+    python -m benchmarks.compare benchmarks/results/old.json benchmarks/results/new.json
+"""
+import argparse
+import dataclasses
+import functools
+import http.server
+import json
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from importlib import metadata
+from pathlib import Path
+import numpy as np
+import yaml
+
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+SUITES = ["ingestion", "input_pipeline", "training", "evaluation", "prediction", "http", "cold_start"]
+
+# Small enough to run on a laptop CPU in a few minutes
+DEFAULT_PARAMS = {
+    "BACKBONE": "MobileNetV3Small",
+    "IMAGE_SIZE": [96, 96, 3],
+    "BATCH_SIZE": 16,
+    "EPOCHS": 2,
+    "FEATURE_CACHE": False
+}
+
+
+def percentiles(samples_s: list) -> dict:
+    """p50/p90/p99 and mean of durations in seconds, in milliseconds."""
+    samples = np.asarray(samples_s) * 1000.
+    return {
+        "p50_ms": float(np.percentile(samples, 50)),
+        "p90_ms": float(np.percentile(samples, 90)),
+        "p99_ms": float(np.percentile(samples, 99)),
+        "mean_ms": float(samples.mean())
+    }
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.
+
+
+def parse_param(item: str):
+    key, _, value = item.partition("=")
+    return key, yaml.safe_load(value)
+
+
+# ---------------------------------------------------------------------------
+# Workspace
+
+
+def prepare_workspace(workspace: Path, settings: dict):
+    """Synthetic dataset, config.yaml, params.yaml and dvc.yaml of a benchmark run."""
+    from benchmarks.synthetic_data import make_dataset, make_archive
+
+    source_dir = workspace / "source"
+    archive = source_dir / "Chicken-fecal-images.zip"
+    if not archive.exists():
+        data_dir = make_dataset(
+            source_dir, settings["images_per_class"], size=tuple(settings["source_size"]), seed=settings["seed"]
+        )
+        make_archive(data_dir, archive)
+
+    with open(REPO_ROOT / "config" / "config.yaml") as f:
+        config = yaml.safe_load(f)
+    config["data_ingestion"]["source_URL"] = str(archive)
+    config["data_ingestion"]["source_sha256"] = None
+    # Served straight from the trained model; repeated benchmark images must not hit the cache
+    config["prediction"]["use_registry"] = False
+    config["prediction_cache"]["enabled"] = False
+    config["serving"]["host"] = "127.0.0.1"
+    config["serving"]["port"] = settings["port"]
+    (workspace / "config").mkdir(exist_ok=True)
+    with open(workspace / "config" / "config.yaml", "w") as f:
+        yaml.safe_dump(config, f, sort_keys=False)
+
+    with open(REPO_ROOT / "params.yaml") as f:
+        params = yaml.safe_load(f)
+    params.update(settings["params"])
+    # No pretrained weights: the benchmarks must run offline
+    params[params["BACKBONE"]]["weights"] = None
+    with open(workspace / "params.yaml", "w") as f:
+        yaml.safe_dump(params, f, sort_keys=False)
+
+    shutil.copy(REPO_ROOT / "dvc.yaml", workspace / "dvc.yaml")
+    # dvc.yaml dependencies and the templates of the front ends are relative to the repo
+    for name in ["src", "templates"]:
+        if not (workspace / name).exists():
+            os.symlink(REPO_ROOT / name, workspace / name)
+
+
+def run_stages(stages: list):
+    """Runs the prerequisite stages of a suite, skipping the up-to-date ones."""
+    from cnnClassifier.config.configuration import ConfigurationManager
+    from cnnClassifier.pipeline.runner import StageRunner
+
+    StageRunner(ConfigurationManager().get_pipeline_runner_config()).run(stages)
+
+
+def ensure_trained_model():
+    from cnnClassifier.config.configuration import ConfigurationManager
+
+    # The training suite trains outside the stage runner, so the model is checked for directly
+    if ConfigurationManager().get_training_config().trained_model_path.exists():
+        run_stages(["data_ingestion", "dataset_packing"])
+    else:
+        run_stages(["training"])
+
+
+# ---------------------------------------------------------------------------
+# Suites, each run in a child process inside the workspace
+
+
+def bench_ingestion(settings: dict) -> dict:
+    """Download from a local HTTP server, cold and incremental extraction, split index."""
+    from cnnClassifier.config.configuration import ConfigurationManager
+    from cnnClassifier.components.data_ingestion import DataIngestion
+    from cnnClassifier.components.split_index import SplitIndex
+
+    config = ConfigurationManager()
+    ingestion_config = config.get_data_ingestion_config()
+    archive = Path(ingestion_config.source_URL)
+    shutil.rmtree(ingestion_config.root_dir, ignore_errors=True)
+    Path(ingestion_config.root_dir).mkdir(parents=True, exist_ok=True)
+
+    handler = functools.partial(http.server.SimpleHTTPRequestHandler, directory=str(archive.parent))
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        download = DataIngestion(dataclasses.replace(
+            ingestion_config, source_URL=f"http://127.0.0.1:{server.server_address[1]}/{archive.name}"
+        ))
+        start = time.perf_counter()
+        download.download_file()
+        download_s = time.perf_counter() - start
+    finally:
+        server.shutdown()
+
+    ingestion = DataIngestion(ingestion_config)
+    start = time.perf_counter()
+    ingestion.extract_zip_file()
+    extract_cold_s = time.perf_counter() - start
+    start = time.perf_counter()
+    ingestion.extract_zip_file()
+    extract_warm_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    split_index = SplitIndex.from_config(config.get_split_index_config())
+    split_index_s = time.perf_counter() - start
+
+    num_files = len(split_index.list_files()[0])
+    return {
+        "files": num_files,
+        "archive_mb": archive.stat().st_size / 2**20,
+        "download_s": download_s,
+        "download_mb_per_s": archive.stat().st_size / 2**20 / download_s,
+        "extract_cold_s": extract_cold_s,
+        "extract_cold_files_per_s": num_files / extract_cold_s,
+        "extract_warm_s": extract_warm_s,
+        "split_index_s": split_index_s
+    }
+
+
+def bench_input_pipeline(settings: dict) -> dict:
+    """Images/s of the training input of ``Training.train_valid_generator``, per epoch."""
+    from cnnClassifier.config.configuration import ConfigurationManager
+    from cnnClassifier.components.training import Training
+
+    run_stages(["data_ingestion", "dataset_packing"])
+    training = Training(ConfigurationManager().get_training_config())
+    start = time.perf_counter()
+    training.train_valid_generator()
+    setup_s = time.perf_counter() - start
+
+    epochs = []
+    iterator = iter(training.train_generator)
+    for _ in range(settings["input_epochs"]):
+        start = time.perf_counter()
+        for _ in range(training.steps_per_epoch):
+            next(iterator)
+        elapsed = time.perf_counter() - start
+        epochs.append({
+            "epoch_s": elapsed,
+            "images_per_s": training.steps_per_epoch * training.global_batch_size / elapsed
+        })
+
+    # Later epochs read from the cache of the pipeline, if any
+    return {
+        "input_pipeline": training.config.params_input_pipeline,
+        "steps_per_epoch": training.steps_per_epoch,
+        "batch_size": training.global_batch_size,
+        "setup_s": setup_s,
+        "epochs": epochs,
+        "first_epoch_images_per_s": epochs[0]["images_per_s"],
+        "steady_images_per_s": float(np.mean([e["images_per_s"] for e in epochs[1:] or epochs]))
+    }
+
+
+def bench_training(settings: dict) -> dict:
+    """Step times of ``Training.train`` on the prepared base model."""
+    import tensorflow as tf
+    from cnnClassifier.config.configuration import ConfigurationManager
+    from cnnClassifier.components.training import Training
+
+    class StepTimer(tf.keras.callbacks.Callback):
+        # Time between consecutive steps, including the wait for input
+        def on_train_begin(self, logs=None):
+            self.step_times = []
+            self._last = time.perf_counter()
+
+        def on_train_batch_end(self, batch, logs=None):
+            now = time.perf_counter()
+            self.step_times.append(now - self._last)
+            self._last = now
+
+        def on_test_begin(self, logs=None):
+            self._validation_start = time.perf_counter()
+
+        def on_test_end(self, logs=None):
+            # Validation at the end of an epoch is not part of the next step
+            self._last += time.perf_counter() - self._validation_start
+
+    run_stages(["data_ingestion", "dataset_packing", "prepare_base_model"])
+    training = Training(ConfigurationManager().get_training_config())
+    start = time.perf_counter()
+    training.get_base_model()
+    training.train_valid_generator()
+    setup_s = time.perf_counter() - start
+
+    timer = StepTimer()
+    start = time.perf_counter()
+    training.train(callback_list=[timer])
+    train_s = time.perf_counter() - start
+
+    # The first step traces and compiles the train function
+    steady = timer.step_times[1:] or timer.step_times
+    return {
+        "epochs": training.config.params_epochs,
+        "steps": len(timer.step_times),
+        "batch_size": training.global_batch_size,
+        "setup_s": setup_s,
+        "train_s": train_s,
+        "first_step_ms": timer.step_times[0] * 1000.,
+        "step": percentiles(steady),
+        "steady_images_per_s": training.global_batch_size / float(np.mean(steady))
+    }
+
+
+def bench_evaluation(settings: dict) -> dict:
+    """Wall time of ``Evaluation.evaluation``, cold and repeated.
+
+    The wall time includes loading the model, which repeated runs in the same
+    process reuse; the streaming pass alone is taken from the performance file
+    the evaluation appends to.
+    """
+    from cnnClassifier.config.configuration import ConfigurationManager
+    from cnnClassifier.components.evaluation import Evaluation
+
+    ensure_trained_model()
+    runs, evaluate_runs = [], []
+    for _ in range(settings["repeats"]):
+        evaluation_config = ConfigurationManager().get_validation_config()
+        evaluation = Evaluation(evaluation_config)
+        start = time.perf_counter()
+        evaluation.evaluation()
+        runs.append(time.perf_counter() - start)
+        with open(evaluation_config.performance_file) as f:
+            evaluate_runs.append(json.load(f)[-1]["eval_time_s"])
+
+    return {
+        "images": evaluation.valid_samples,
+        "cold_s": runs[0],
+        "best_s": min(runs),
+        "evaluate_cold_s": evaluate_runs[0],
+        "evaluate_best_s": min(evaluate_runs),
+        "evaluate_images_per_s": evaluation.valid_samples / min(evaluate_runs),
+        "loss": float(evaluation.score[0]),
+        "accuracy": float(evaluation.score[1])
+    }
+
+
+def bench_prediction(settings: dict) -> dict:
+    """Model load, single-image latency and batched throughput of PredictionPipeline."""
+    from benchmarks.synthetic_data import encoded_images
+    from cnnClassifier.config.configuration import ConfigurationManager
+    from cnnClassifier.pipeline.predict import PredictionPipeline
+
+    ensure_trained_model()
+    images = encoded_images(settings["prediction_images"], size=tuple(settings["source_size"]))
+
+    start = time.perf_counter()
+    classifier = PredictionPipeline(ConfigurationManager().get_prediction_config())
+    load_s = time.perf_counter() - start
+
+    def timed(fn, items):
+        durations = []
+        for item in items:
+            start = time.perf_counter()
+            fn(item)
+            durations.append(time.perf_counter() - start)
+        return durations
+
+    # Decode and preprocessing alone, then the full single-image path as /predict runs it
+    preprocess = timed(classifier.preprocess, images)
+    single = timed(classifier.predict, images)
+
+    arrays = np.stack([classifier.preprocess(image) for image in images])
+    batched = {}
+    for batch_size in settings["batch_sizes"]:
+        batches = [arrays[i:i + batch_size] for i in range(0, len(arrays) - batch_size + 1, batch_size)]
+        classifier.predict_batch(batches[0])
+        durations = timed(classifier.predict_batch, batches)
+        batched[str(batch_size)] = {
+            **percentiles(durations),
+            "images_per_s": batch_size * len(batches) / sum(durations)
+        }
+
+    return {
+        "images": len(images),
+        "source_size": settings["source_size"],
+        "load_s": load_s,
+        "preprocess": percentiles(preprocess),
+        "single": {**percentiles(single), "images_per_s": len(single) / sum(single)},
+        "batch": batched
+    }
+
+
+def server_command(server: str, port: int) -> list:
+    if server == "asgi":
+        return [sys.executable, "-m", "uvicorn", "asgi_app:app", "--app-dir", str(REPO_ROOT),
+                "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"]
+    # The Flask development server, as app.py runs it
+    return [sys.executable, "-c",
+            f"import sys; sys.path.insert(0, {str(REPO_ROOT)!r}); import app; "
+            f"app.app.run(host='127.0.0.1', port={port}, threaded=True)"]
+
+
+def server_peak_rss_mb(pid: int) -> float:
+    with open(f"/proc/{pid}/status") as f:
+        for line in f:
+            if line.startswith("VmHWM:"):
+                return int(line.split()[1]) / 1024.
+    return None
+
+
+def wait_for_server(process, url: str, settings: dict):
+    """Polls ``url`` until it answers 200."""
+    import requests
+
+    start = time.perf_counter()
+    while True:
+        if process.poll() is not None:
+            raise RuntimeError(f"The {settings['server']} server exited with code {process.returncode}")
+        try:
+            if requests.get(url, timeout=1).status_code == 200:
+                return
+        except requests.ConnectionError:
+            pass
+        if time.perf_counter() - start > settings["server_timeout_s"]:
+            raise TimeoutError(f"{url} did not answer within {settings['server_timeout_s']}s")
+        time.sleep(0.05)
+
+
+def bench_http(settings: dict) -> dict:
+    """POST /predict under concurrent load against a server process."""
+    import base64
+    import requests
+    from benchmarks.synthetic_data import encoded_images
+
+    ensure_trained_model()
+    port = settings["port"]
+    url = f"http://127.0.0.1:{port}"
+    payloads = [
+        json.dumps({"image": base64.b64encode(image).decode()})
+        for image in encoded_images(settings["prediction_images"], size=tuple(settings["source_size"]))
+    ]
+
+    start = time.perf_counter()
+    process = subprocess.Popen(server_command(settings["server"], port))
+    try:
+        wait_for_server(process, f"{url}/readyz", settings)
+        startup_s = time.perf_counter() - start
+
+        local = threading.local()
+
+        def post(i):
+            session = getattr(local, "session", None)
+            if session is None:
+                session = local.session = requests.Session()
+            start = time.perf_counter()
+            response = session.post(
+                f"{url}/predict", data=payloads[i % len(payloads)],
+                headers={"Content-Type": "application/json"}, timeout=60
+            )
+            return response.status_code, time.perf_counter() - start
+
+        with ThreadPoolExecutor(max_workers=settings["concurrency"]) as executor:
+            list(executor.map(post, range(settings["concurrency"] * 2)))
+            start = time.perf_counter()
+            results = list(executor.map(post, range(settings["requests"])))
+            elapsed = time.perf_counter() - start
+
+        server_rss_mb = server_peak_rss_mb(process.pid)
+    finally:
+        process.terminate()
+        process.wait(timeout=30)
+
+    statuses = {}
+    for status, _ in results:
+        statuses[str(status)] = statuses.get(str(status), 0) + 1
+    ok = [duration for status, duration in results if status == 200]
+    return {
+        "server": settings["server"],
+        "concurrency": settings["concurrency"],
+        "requests": len(results),
+        "status_codes": statuses,
+        "startup_s": startup_s,
+        "latency": percentiles(ok) if ok else None,
+        "requests_per_s": len(ok) / elapsed,
+        "server_peak_rss_mb": server_rss_mb
+    }
+
+
+def bench_cold_start(settings: dict) -> dict:
+    """Time to live, ready and first prediction of a server process, without and with the warm-start cache."""
+    import base64
+    import requests
+    from benchmarks.synthetic_data import encoded_images
+    from cnnClassifier.config.configuration import ConfigurationManager
+
+    ensure_trained_model()
+    warm_start_dir = ConfigurationManager().get_prediction_config().warm_start_dir
+    payload = json.dumps({"image": base64.b64encode(
+        encoded_images(1, size=tuple(settings["source_size"]))[0]
+    ).decode()})
+
+    def start_server() -> dict:
+        port = settings["port"]
+        url = f"http://127.0.0.1:{port}"
+        start = time.perf_counter()
+        process = subprocess.Popen(server_command(settings["server"], port))
+        try:
+            wait_for_server(process, f"{url}/healthz", settings)
+            live_s = time.perf_counter() - start
+            wait_for_server(process, f"{url}/readyz", settings)
+            ready_s = time.perf_counter() - start
+            response = requests.post(
+                f"{url}/predict", data=payload, headers={"Content-Type": "application/json"}, timeout=60
+            )
+            response.raise_for_status()
+            first_prediction_s = time.perf_counter() - start
+
+            # The cold start exports the warm-start SavedModel in the background
+            deadline = time.perf_counter() + settings["server_timeout_s"]
+            while not any(warm_start_dir.glob("*/source.json")) and time.perf_counter() < deadline:
+                time.sleep(0.2)
+        finally:
+            process.terminate()
+            process.wait(timeout=30)
+        return {"live_s": live_s, "ready_s": ready_s, "first_prediction_s": first_prediction_s}
+
+    shutil.rmtree(warm_start_dir, ignore_errors=True)
+    cold = start_server()
+    warm = start_server()
+
+    # The CLI only needs TensorFlow once a stage runs
+    start = time.perf_counter()
+    subprocess.run([sys.executable, "-m", "cnnClassifier.cli", "--help"], check=True, capture_output=True)
+    cli_help_s = time.perf_counter() - start
+
+    return {"server": settings["server"], "cold": cold, "warm": warm, "cli_help_s": cli_help_s}
+
+
+BENCHMARKS = {
+    "ingestion": bench_ingestion,
+    "input_pipeline": bench_input_pipeline,
+    "training": bench_training,
+    "evaluation": bench_evaluation,
+    "prediction": bench_prediction,
+    "http": bench_http,
+    "cold_start": bench_cold_start
+}
+
+
+def run_child(suite: str, settings: dict, result_file: Path):
+    start = time.perf_counter()
+    result = BENCHMARKS[suite](settings)
+    result["wall_s"] = time.perf_counter() - start
+    result["peak_rss_mb"] = peak_rss_mb()
+    with open(result_file, "w") as f:
+        json.dump(result, f)
+
+
+# ---------------------------------------------------------------------------
+# Parent process
+
+
+def git_info() -> dict:
+    def git(*args):
+        return subprocess.run(["git", *args], cwd=REPO_ROOT, capture_output=True, text=True).stdout.strip()
+
+    return {"commit": git("rev-parse", "HEAD") or None, "dirty": bool(git("status", "--porcelain", "--untracked-files=no"))}
+
+
+def machine_info() -> dict:
+    info = {"platform": platform.platform(), "python": platform.python_version(), "cpu_count": os.cpu_count()}
+    for package in ["tensorflow", "tensorflow-cpu", "keras", "numpy", "pillow"]:
+        try:
+            info[package] = metadata.version(package)
+        except metadata.PackageNotFoundError:
+            pass
+    return info
+
+
+def main(argv: list = None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--suites", nargs="+", choices=SUITES, default=SUITES)
+    parser.add_argument("--param", action="append", default=[], metavar="KEY=VALUE",
+                        help="params.yaml override, the value is parsed as YAML")
+    parser.add_argument("--images-per-class", type=int, default=120)
+    parser.add_argument("--source-size", type=int, nargs=2, default=[640, 480], metavar=("WIDTH", "HEIGHT"),
+                        help="size of the synthetic photos")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--input-epochs", type=int, default=3)
+    parser.add_argument("--repeats", type=int, default=3, help="evaluation runs")
+    parser.add_argument("--prediction-images", type=int, default=64)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--server", choices=["asgi", "flask"], default="asgi")
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--server-timeout-s", type=float, default=300)
+    parser.add_argument("--workspace", type=Path, help="kept between runs, a temporary directory by default")
+    parser.add_argument("--output", type=Path, default=REPO_ROOT / "benchmarks" / "results")
+    parser.add_argument("--child", choices=SUITES, help=argparse.SUPPRESS)
+    parser.add_argument("--settings", help=argparse.SUPPRESS)
+    parser.add_argument("--result-file", type=Path, help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child:
+        run_child(args.child, json.loads(args.settings), args.result_file)
+        return
+
+    from cnnClassifier.utils.common import free_port
+
+    settings = {
+        "params": {**DEFAULT_PARAMS, **dict(parse_param(item) for item in args.param)},
+        "images_per_class": args.images_per_class,
+        "source_size": args.source_size,
+        "seed": args.seed,
+        "input_epochs": args.input_epochs,
+        "repeats": args.repeats,
+        "prediction_images": args.prediction_images,
+        "batch_sizes": args.batch_sizes,
+        "server": args.server,
+        "requests": args.requests,
+        "concurrency": args.concurrency,
+        "server_timeout_s": args.server_timeout_s,
+        "port": free_port()
+    }
+
+    workspace = args.workspace or Path(tempfile.mkdtemp(prefix="cnnClassifier-bench-"))
+    workspace = workspace.resolve()
+    workspace.mkdir(parents=True, exist_ok=True)
+    prepare_workspace(workspace, settings)
+
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [str(REPO_ROOT), str(REPO_ROOT / "src"), env.get("PYTHONPATH")]))
+    suites = {}
+    for suite in [s for s in SUITES if s in args.suites]:
+        print(f"Running the {suite} benchmark", flush=True)
+        result_file = workspace / f"{suite}.result.json"
+        result_file.unlink(missing_ok=True)
+        process = subprocess.run(
+            [sys.executable, "-m", "benchmarks.run", "--child", suite,
+             "--settings", json.dumps(settings), "--result-file", str(result_file)],
+            cwd=workspace, env=env
+        )
+        if process.returncode != 0:
+            suites[suite] = {"error": f"exited with code {process.returncode}"}
+            continue
+        with open(result_file) as f:
+            suites[suite] = json.load(f)
+
+    git = git_info()
+    report = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        **git,
+        "machine": machine_info(),
+        "settings": {key: value for key, value in settings.items() if key != "port"},
+        "suites": suites
+    }
+    args.output.mkdir(parents=True, exist_ok=True)
+    output = args.output / f"{time.strftime('%Y%m%d-%H%M%S')}_{(git['commit'] or 'nogit')[:8]}.json"
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {output}")
+
+    if args.workspace is None:
+        shutil.rmtree(workspace, ignore_errors=True)
+    if any("error" in result for result in suites.values()):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+import io
+import os
+import zipfile
+from pathlib import Path
+import numpy as np
+from PIL import Image, ImageFilter
+
+
+DATASET_NAME = "Chicken-fecal-images"
+CLASS_NAMES = ["Coccidiosis", "Healthy"]
+
+
+def synthetic_image(rng: np.random.Generator, class_index: int, size: tuple) -> Image.Image:
+    """A noisy photo-like image whose colour and texture depend on the class."""
+    width, height = size
+    # Smooth background plus blobs, darker and redder for Coccidiosis
+    base = rng.normal(90 + 80 * class_index, 25, (height // 16, width // 16, 3))
+    base[..., 0] += 30 * (1 - class_index)
+    image = Image.fromarray(np.clip(base, 0, 255).astype(np.uint8)).resize(size, Image.BICUBIC)
+    noise = rng.integers(0, 255, (height, width, 3), dtype=np.uint8)
+    texture = Image.fromarray(noise).filter(ImageFilter.GaussianBlur(1))
+    return Image.blend(image, texture, 0.2)
+
+
+def make_dataset(root: Path, images_per_class: int, size: tuple = (640, 480), seed: int = 0) -> Path:
+    """Writes ``root/Chicken-fecal-images/<class>/*.jpg`` like the real dataset."""
+    rng = np.random.default_rng(seed)
+    data_dir = Path(root) / DATASET_NAME
+    for class_index, class_name in enumerate(CLASS_NAMES):
+        class_dir = data_dir / class_name
+        os.makedirs(class_dir, exist_ok=True)
+        for i in range(images_per_class):
+            synthetic_image(rng, class_index, size).save(class_dir / f"{class_name[0]}{i:04d}.jpg", quality=90)
+    return data_dir
+
+
+def make_archive(data_dir: Path, archive: Path) -> Path:
+    """Zips ``data_dir`` with the layout of the published archive."""
+    data_dir = Path(data_dir)
+    with zipfile.ZipFile(archive, "w", zipfile.ZIP_STORED) as zip_ref:
+        for path in sorted(data_dir.rglob("*.jpg")):
+            zip_ref.write(path, path.relative_to(data_dir.parent).as_posix())
+    return Path(archive)
+
+
+def encoded_images(count: int, size: tuple = (640, 480), seed: int = 1) -> list:
+    """JPEG bytes of ``count`` synthetic images, e.g. as request payloads."""
+    rng = np.random.default_rng(seed)
+    images = []
+    for i in range(count):
+        buffer = io.BytesIO()
+        synthetic_image(rng, i % len(CLASS_NAMES), size).save(buffer, format="JPEG", quality=90)
+        images.append(buffer.getvalue())
+    return images
@@ -25,6 +25,11 @@ setuptools.setup(
     },
     package_dir={"": "src"},  # Specify the source directory
     packages=setuptools.find_packages(where="src"),  # Finds all packages in the src folder
+    entry_points={
+        "console_scripts": [
+            "cnnClassifier=cnnClassifier.cli:main",  # Bulk scoring and pipeline CLI
+        ],
+    },
     classifiers=[
         "Programming Language :: Python :: 3",
         "License :: OSI Approved :: MIT License",
@@ -0,0 +1,164 @@
+import argparse
+import json
+from dataclasses import replace
+from itertools import islice
+from pathlib import Path
+import numpy as np
+from cnnClassifier.config.configuration import ConfigurationManager
+from cnnClassifier import logger
+from cnnClassifier.components.bulk_scoring import BulkScorer, iter_image_source
+from cnnClassifier.components.preprocessing import decode_and_resize, decode_image, to_model_input
+from cnnClassifier.pipeline.predict import PredictionPipeline
+
+
+def score(args):
+    config = ConfigurationManager().get_prediction_config()
+    # Bulk scoring forms its own large batches, so the online micro-batcher is not needed
+    config = replace(config, enable_batching=False)
+    if args.model is not None:
+        config = replace(config, path_of_model=Path(args.model))
+
+    scorer = BulkScorer(
+        classifier=PredictionPipeline(config),
+        batch_size=args.batch_size or config.bulk_batch_size,
+        num_workers=args.workers or config.decode_workers
+    )
+    scorer.score_to_file(source=args.source, output=args.output, output_format=args.format)
+
+
+def check_preprocessing(args):
+    """Compares the serving preprocessing with the training-time decode and resize."""
+    config = ConfigurationManager().get_prediction_config()
+    config = replace(config, enable_batching=False)
+    if args.model is not None:
+        config = replace(config, path_of_model=Path(args.model))
+    serving = PredictionPipeline(config)
+    reference = PredictionPipeline(replace(config, draft_decode=False, fuse_preprocessing=False))
+
+    pixel_diffs, probability_diffs, agreements = [], [], []
+    items = islice(iter_image_source(args.source), args.limit)
+    while True:
+        chunk = list(islice(items, config.bulk_batch_size))
+        if not chunk:
+            break
+        fast = np.empty((len(chunk), *config.params_image_size[:2], 3), dtype=np.uint8)
+        for row, (_, data) in enumerate(chunk):
+            decode_image(data, config.params_image_size, draft=config.draft_decode, out=fast[row])
+        exact = np.stack([decode_and_resize(data, config.params_image_size).numpy() for _, data in chunk])
+        pixel_diffs.extend(np.abs(fast - exact).reshape(len(chunk), -1).mean(axis=1))
+
+        fast_probabilities = serving.predict_batch(
+            fast if serving.fused else to_model_input(fast, config.params_preprocessing)
+        )
+        exact_probabilities = reference.predict_batch(to_model_input(exact, config.params_preprocessing))
+        probability_diffs.extend(np.abs(fast_probabilities - exact_probabilities).max(axis=1))
+        agreements.extend(np.argmax(fast_probabilities, axis=1) == np.argmax(exact_probabilities, axis=1))
+
+    if not agreements:
+        raise SystemExit(f"No images found in {args.source}")
+    report = {
+        "images": len(agreements),
+        "draft_decode": config.draft_decode,
+        "fuse_preprocessing": serving.fused,
+        "mean_abs_pixel_diff": float(np.mean(pixel_diffs)),
+        "max_mean_abs_pixel_diff": float(np.max(pixel_diffs)),
+        "max_probability_diff": float(np.max(probability_diffs)),
+        "label_agreement": float(np.mean(agreements))
+    }
+    logger.info(f"Serving vs training preprocessing: {json.dumps(report)}")
+    if report["max_probability_diff"] > args.tolerance:
+        raise SystemExit(
+            f"Serving predictions differ by up to {report['max_probability_diff']:.4f}, "
+            f"more than the tolerance of {args.tolerance}"
+        )
+
+
+def train_workers(args):
+    # Imported here as it loads TensorFlow, which the other commands only need once a model loads
+    from cnnClassifier.components.distribution import launch_local_workers, max_weight_difference
+
+    config = ConfigurationManager()
+    if config.params.DISTRIBUTION.STRATEGY != "multi_worker_mirrored":
+        raise SystemExit("Set DISTRIBUTION.STRATEGY to multi_worker_mirrored in params.yaml first")
+
+    exit_codes = launch_local_workers(args.workers)
+    if any(exit_codes):
+        raise SystemExit(f"Workers failed with exit codes {exit_codes}")
+
+    training_config = config.get_training_config()
+    model_name = Path(training_config.trained_model_path).name
+    paths = [training_config.trained_model_path] + [
+        Path(training_config.root_dir) / f"worker_{index}" / model_name
+        for index in range(1, args.workers)
+    ]
+    difference = max_weight_difference(paths)
+    logger.info(f"Max weight difference between the {args.workers} workers: {difference}")
+    if difference > args.tolerance:
+        raise SystemExit(f"The workers diverged by {difference}, more than the tolerance of {args.tolerance}")
+
+
+def sweep(args):
+    from cnnClassifier.components.sweep import HyperparameterSweep
+
+    config = ConfigurationManager().get_sweep_config()
+    overrides = {
+        "num_trials": args.trials,
+        "max_parallel": args.parallel,
+        "search": args.search
+    }
+    config = replace(config, **{key: value for key, value in overrides.items() if value is not None})
+    if args.early_stopping is not None:
+        config = replace(config, early_stopping=None if args.early_stopping == "none" else args.early_stopping)
+    HyperparameterSweep(config, name=args.name).run()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="cnnClassifier")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    score_parser = subparsers.add_parser(
+        "score", help="Score a directory tree or a tar/zip archive of images"
+    )
+    score_parser.add_argument("source", type=Path, help="Image directory, .zip or .tar(.gz) archive")
+    score_parser.add_argument("-o", "--output", type=Path, required=True, help="Output .csv or .jsonl file")
+    score_parser.add_argument("--format", choices=["csv", "jsonl"], default=None,
+                              help="Output format, inferred from the output extension by default")
+    score_parser.add_argument("--model", default=None, help="Model to score with, defaults to the trained model")
+    score_parser.add_argument("--batch-size", type=int, default=None)
+    score_parser.add_argument("--workers", type=int, default=None, help="Number of decode threads")
+    score_parser.set_defaults(func=score)
+
+    check_parser = subparsers.add_parser(
+        "check-preprocessing", help="Check that serving preprocessing predicts like the training pipeline"
+    )
+    check_parser.add_argument("source", type=Path, help="Image directory, .zip or .tar(.gz) archive")
+    check_parser.add_argument("--model", default=None, help="Model to check with, defaults to the trained model")
+    check_parser.add_argument("--limit", type=int, default=200, help="Number of images to compare")
+    check_parser.add_argument("--tolerance", type=float, default=0.02,
+                              help="Max allowed difference of a class probability")
+    check_parser.set_defaults(func=check_preprocessing)
+
+    workers_parser = subparsers.add_parser(
+        "train-workers", help="Run the training stage as a multi-worker cluster on localhost"
+    )
+    workers_parser.add_argument("--workers", type=int, default=2)
+    workers_parser.add_argument("--tolerance", type=float, default=1e-5,
+                                help="Max allowed difference between the weights of the workers")
+    workers_parser.set_defaults(func=train_workers)
+
+    sweep_parser = subparsers.add_parser(
+        "sweep", help="Train and evaluate trials over the search space under sweep in config/config.yaml"
+    )
+    sweep_parser.add_argument("--name", default=None, help="Sweep directory name, a timestamp by default")
+    sweep_parser.add_argument("--trials", type=int, default=None, help="Number of trials to sample")
+    sweep_parser.add_argument("--parallel", type=int, default=None, help="Trials to run at a time")
+    sweep_parser.add_argument("--search", choices=["random", "grid"], default=None)
+    sweep_parser.add_argument("--early-stopping", choices=["successive_halving", "median", "none"], default=None)
+    sweep_parser.set_defaults(func=sweep)
+
+    args = parser.parse_args(argv)
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+import csv
+import json
+import os
+import tarfile
+import zipfile
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from pathlib import Path
+import numpy as np
+from cnnClassifier import logger
+
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp", ".gif", ".tif", ".tiff")
+
+
+def _is_image(name: str) -> bool:
+    return name.lower().endswith(IMAGE_EXTENSIONS)
+
+
+def iter_image_source(source: Path):
+    """Yields (name, bytes) for every image in a directory tree, tar or zip archive."""
+    source = Path(source)
+    if source.is_dir():
+        for root, dirs, files in os.walk(source):
+            dirs.sort()
+            for filename in sorted(files):
+                if _is_image(filename):
+                    path = Path(root) / filename
+                    yield str(path.relative_to(source)), path.read_bytes()
+    elif zipfile.is_zipfile(source):
+        with zipfile.ZipFile(source) as zip_ref:
+            for info in zip_ref.infolist():
+                if not info.is_dir() and _is_image(info.filename):
+                    yield info.filename, zip_ref.read(info)
+    elif tarfile.is_tarfile(source):
+        # Stream mode reads the archive sequentially without seeking
+        with tarfile.open(source, "r|*") as tar_ref:
+            for member in tar_ref:
+                if member.isfile() and _is_image(member.name):
+                    yield member.name, tar_ref.extractfile(member).read()
+    else:
+        raise ValueError(f"Unsupported image source: {source}")
+
+
+class BulkScorer:
+    def __init__(self, classifier, batch_size: int, num_workers: int, prefetch_batches: int = 2):
+        self.classifier = classifier
+        self.batch_size = batch_size
+        self.num_workers = num_workers
+        self.prefetch_batches = prefetch_batches
+
+    def _decode(self, data: bytes, out: np.ndarray):
+        """Decodes ``data`` into the batch row ``out``; returns the error message of a failure."""
+        try:
+            self.classifier.decode(data, out=out)
+            return None
+        except Exception as e:
+            return str(e)
+
+    def _score(self, names, futures, buffer):
+        errors = [future.result() for future in futures]
+        valid = [i for i, error in enumerate(errors) if error is None]
+
+        probabilities = {}
+        if valid:
+            # Rows of undecodable images are left out, otherwise the buffer is used as is
+            images = buffer[:len(names)] if len(valid) == len(names) else buffer[valid]
+            for i, row in zip(valid, self.classifier.predict_batch(self.classifier.to_input(images))):
+                probabilities[i] = row
+
+        for i, name in enumerate(names):
+            if i not in probabilities:
+                yield {"name": name, "error": errors[i]}
+                continue
+            row = probabilities[i]
+            result = {
+                "name": name,
+                "image": self.classifier.class_names[int(np.argmax(row))]
+            }
+            for class_name, probability in zip(self.classifier.class_names, row):
+                result[class_name] = float(probability)
+            yield result
+
+    def iter_predictions(self, items):
+        """Scores an iterable of (name, bytes) pairs in batches.
+
+        Decoding runs on a thread pool and is kept ``prefetch_batches`` batches
+        ahead of the model, so image decoding overlaps with model execution.
+        Images are decoded straight into the rows of preallocated uint8
+        batches, one per batch in flight, which are reused for later batches.
+        """
+        height, width = self.classifier.config.params_image_size[:2]
+        buffers = [
+            np.empty((self.batch_size, height, width, 3), dtype=np.uint8) for _ in range(self.prefetch_batches + 1)
+        ]
+        items = iter(items)
+        pending = deque()
+        with ThreadPoolExecutor(max_workers=self.num_workers) as executor:
+            for index, chunk in enumerate(iter(lambda: list(islice(items, self.batch_size)), [])):
+                names = [name for name, _ in chunk]
+                # The batch that used this buffer before has been scored already
+                buffer = buffers[index % len(buffers)]
+                futures = [executor.submit(self._decode, data, buffer[row]) for row, (_, data) in enumerate(chunk)]
+                pending.append((names, futures, buffer))
+                if len(pending) > self.prefetch_batches:
+                    yield from self._score(*pending.popleft())
+
+            while pending:
+                yield from self._score(*pending.popleft())
+
+    def score_to_file(self, source: Path, output: Path, output_format: str = None) -> int:
+        output = Path(output)
+        output_format = output_format or output.suffix.lstrip(".").lower()
+        if output_format not in ("csv", "jsonl"):
+            raise ValueError(f"Unsupported output format: {output_format}")
+
+        os.makedirs(output.parent, exist_ok=True)
+        fieldnames = ["name", "image", *self.classifier.class_names, "error"]
+        count = 0
+        with open(output, "w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=fieldnames) if output_format == "csv" else None
+            if writer is not None:
+                writer.writeheader()
+            for result in self.iter_predictions(iter_image_source(source)):
+                if writer is not None:
+                    writer.writerow(result)
+                else:
+                    f.write(json.dumps(result) + "\n")
+                count += 1
+                if count % (self.batch_size * 10) == 0:
+                    logger.info(f"Scored {count} images from {source}")
+
+        logger.info(f"Scored {count} images from {source}, results written to: {output}")
+        return count
@@ -1,6 +1,13 @@
 import os
+import json
+import shutil
+import hashlib
+import threading
 import urllib.request as request
+from urllib.error import HTTPError
 import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse, unquote
 from cnnClassifier import logger
 from cnnClassifier.utils.common import get_size
 from cnnClassifier.entity.config_entity import DataIngestionConfig
@@ -8,30 +15,238 @@ from pathlib import Path
 
 
 class DataIngestion:
+    CHUNK_SIZE = 1 << 20
+
     def __init__(self, config: DataIngestionConfig):
         self.config = config
+        self.source_path = self._local_source(self.config.source_URL)
+
+
+    @staticmethod
+    def _local_source(source: str):
+        """Returns the local path of a file:// URL or a plain path, None for remote URLs."""
+        parsed = urlparse(str(source))
+        if parsed.scheme in ("http", "https", "ftp"):
+            return None
+        if parsed.scheme == "file":
+            return Path(unquote(parsed.path))
+        return Path(source)
+
+    @classmethod
+    def sha256(cls, path: Path) -> str:
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(cls.CHUNK_SIZE), b""):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    def _verify(self, path: Path) -> bool:
+        if not self.config.source_sha256:
+            return True
+        return self.sha256(path) == self.config.source_sha256.lower()
+
+    def _archive_path(self) -> Path:
+        # Local archives are read in place instead of being copied into artifacts
+        if self.source_path is not None:
+            return self.source_path
+        return Path(self.config.local_data_file)
+
 
 
-    
     def download_file(self):
-        if not os.path.exists(self.config.local_data_file):
-            filename, headers = request.urlretrieve(
-                url = self.config.source_URL,
-                filename = self.config.local_data_file
-            )
-            logger.info(f"{filename} download! with following info: \n{headers}")
-        else:
-            logger.info(f"File already exists of size: {get_size(Path(self.config.local_data_file))}")  
+        if self.source_path is not None:
+            if not self.source_path.exists():
+                raise FileNotFoundError(f"Data source not found: {self.source_path}")
+            if self.source_path.is_file() and not self._verify(self.source_path):
+                raise ValueError(f"sha256 mismatch for {self.source_path}")
+            logger.info(f"Using the local data source {self.source_path}")
+            return
+
+        local_data_file = Path(self.config.local_data_file)
+        if local_data_file.exists() and self._verify(local_data_file):
+            logger.info(f"File already exists of size: {get_size(local_data_file)}")
+            return
+
+        partial_file = local_data_file.with_name(local_data_file.name + ".part")
+        try:
+            headers = self._download(partial_file, resume=True)
+        except HTTPError as e:
+            if e.code != 416:
+                raise
+            # The range starts at or past the end: the partial file is complete, or the source shrank
+            if self.config.source_sha256 and self._verify(partial_file):
+                headers = e.headers
+            else:
+                logger.info("The partial download does not match the source, downloading from the start")
+                headers = self._download(partial_file, resume=False)
+
+        if not self._verify(partial_file):
+            partial_file.unlink()
+            raise ValueError(f"sha256 mismatch for {self.config.source_URL}, the download was discarded")
+        os.replace(partial_file, local_data_file)
+        self._validator_file(partial_file).unlink(missing_ok=True)
+        logger.info(f"{local_data_file} download! with following info: \n{headers}")
+
+    @staticmethod
+    def _validator_file(partial_file: Path) -> Path:
+        return partial_file.with_name(partial_file.name + ".json")
+
+    def _download(self, partial_file: Path, resume: bool):
+        """Downloads the source into ``partial_file``, resuming it when it is still the same version.
+
+        The ETag or Last-Modified of the source is stored next to the partial
+        file and sent back as If-Range, so a server whose archive changed
+        since the interruption answers with the whole new file instead of
+        the rest of it.
+        """
+        validator_file = self._validator_file(partial_file)
+        validator = None
+        if resume and partial_file.exists() and validator_file.exists():
+            with open(validator_file) as f:
+                stored = json.load(f)
+            if stored.get("url") == self.config.source_URL:
+                validator = stored.get("validator")
+        offset = partial_file.stat().st_size if validator else 0
+
+        req = request.Request(self.config.source_URL)
+        if offset:
+            # Resume an interrupted download where it stopped
+            req.add_header("Range", f"bytes={offset}-")
+            req.add_header("If-Range", validator)
+
+        with request.urlopen(req) as response:
+            content_range = response.headers.get("Content-Range", "")
+            resumed = offset and response.status == 206 and content_range.startswith(f"bytes {offset}-")
+            if offset and not resumed:
+                logger.info("The source changed or does not support resuming, downloading from the start")
+            if not resumed:
+                etag = response.headers.get("ETag")
+                # If-Range only accepts a strong ETag
+                validator = etag if etag and not etag.startswith("W/") else response.headers.get("Last-Modified")
+                validator_file.unlink(missing_ok=True)
+                if validator:
+                    with open(validator_file, "w") as f:
+                        json.dump({"url": self.config.source_URL, "validator": validator}, f)
+            with open(partial_file, "ab" if resumed else "wb") as f:
+                shutil.copyfileobj(response, f, self.CHUNK_SIZE)
+            return response.headers
+
+
+    def _load_manifest(self) -> dict:
+        manifest_file = Path(self.config.manifest_file)
+        if manifest_file.exists():
+            with open(manifest_file) as f:
+                return json.load(f)
+        return {"files": {}}
+
+    def _save_manifest(self, manifest: dict):
+        manifest_file = Path(self.config.manifest_file)
+        tmp_file = manifest_file.with_name(manifest_file.name + ".tmp")
+        with open(tmp_file, "w") as f:
+            json.dump(manifest, f)
+        os.replace(tmp_file, manifest_file)
+
+    @staticmethod
+    def _is_current(target: Path, entry: dict, previous: dict) -> bool:
+        return previous == entry and target.exists() and target.stat().st_size == entry["size"]
+
+    def _target(self, name: str) -> Path:
+        unzip_path = Path(self.config.unzip_dir).resolve()
+        target = (unzip_path / name).resolve()
+        if unzip_path not in target.parents:
+            raise ValueError(f"Archive entry escapes the extraction directory: {name}")
+        return target
+
+    @staticmethod
+    def _write_atomic(target: Path, source):
+        target.parent.mkdir(parents=True, exist_ok=True)
+        tmp_target = target.with_name(f".{target.name}.{threading.get_ident()}.tmp")
+        with open(tmp_target, "wb") as f:
+            shutil.copyfileobj(source, f, DataIngestion.CHUNK_SIZE)
+        os.replace(tmp_target, target)
+
+    def _sync(self, entries: dict, write_entry):
+        """Writes the new or changed ``entries`` and removes the ones that disappeared.
+
+        ``entries`` maps relative names to their content hash and size, the
+        manifest of the previous run tells which of them are already in place.
+        """
+        manifest = self._load_manifest()
+        previous = manifest["files"]
+
+        changed = [
+            name for name, entry in entries.items()
+            if not self._is_current(self._target(name), entry, previous.get(name))
+        ]
+        removed = [name for name in previous if name not in entries]
+
+        with ThreadPoolExecutor(max_workers=self.config.extract_workers) as executor:
+            # list() re-raises the first failed write
+            list(executor.map(write_entry, changed))
+
+        for name in removed:
+            target = self._target(name)
+            if target.exists():
+                target.unlink()
+
+        self._save_manifest({"source": str(self.config.source_URL), "files": entries})
+        logger.info(
+            f"{len(changed)} files extracted, {len(entries) - len(changed)} unchanged, "
+            f"{len(removed)} removed"
+        )
+
 
 
-    
     def extract_zip_file(self):
         """
         zip_file_path: str
-        Extracts the zip file into the data directory
+        Extracts the new or changed files of the zip file into the data directory
         Function returns None
         """
         unzip_path = self.config.unzip_dir
         os.makedirs(unzip_path, exist_ok=True)
-        with zipfile.ZipFile(self.config.local_data_file, 'r') as zip_ref:
-            zip_ref.extractall(unzip_path)
+
+        if self.source_path is not None and self.source_path.is_dir():
+            self._copy_directory(self.source_path)
+            return
+
+        archive_path = self._archive_path()
+        with zipfile.ZipFile(archive_path, 'r') as zip_ref:
+            # The central directory already holds a CRC32 and size per entry,
+            # so unchanged entries are found without decompressing anything
+            entries = {
+                info.filename: {"crc32": info.CRC, "size": info.file_size}
+                for info in zip_ref.infolist() if not info.is_dir()
+            }
+
+        # ZipFile handles are not safe to share, each worker thread opens its own
+        local = threading.local()
+        handles = []
+
+        def extract(name):
+            if not hasattr(local, "zip_ref"):
+                local.zip_ref = zipfile.ZipFile(archive_path, 'r')
+                handles.append(local.zip_ref)
+            with local.zip_ref.open(name) as source:
+                self._write_atomic(self._target(name), source)
+
+        try:
+            self._sync(entries, extract)
+        finally:
+            for handle in handles:
+                handle.close()
+
+    def _copy_directory(self, source_dir: Path):
+        # Files keep the source directory name, like the top-level folder of the archive
+        entries = {}
+        for path in sorted(source_dir.rglob("*")):
+            if path.is_file():
+                stat = path.stat()
+                name = (Path(source_dir.name) / path.relative_to(source_dir)).as_posix()
+                entries[name] = {"mtime_ns": stat.st_mtime_ns, "size": stat.st_size}
+
+        def copy(name):
+            with open(source_dir.parent / name, "rb") as source:
+                self._write_atomic(self._target(name), source)
+
+        self._sync(entries, copy)
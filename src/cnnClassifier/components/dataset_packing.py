@@ -0,0 +1,238 @@
+import hashlib
+import json
+import os
+import shutil
+from pathlib import Path
+import numpy as np
+import tensorflow as tf
+from cnnClassifier import logger
+from cnnClassifier.entity.config_entity import DatasetPackingConfig
+from cnnClassifier.components.input_pipeline import InputPipeline, AUTOTUNE
+from cnnClassifier.components.preprocessing import get_preprocessing_function, JPEG_DCT_METHOD
+
+
+MANIFEST_FILE = "manifest.json"
+LABELS_FILE = "labels.npy"
+
+
+class DatasetPacking:
+    """Packs the ingested images into a few large memory-mappable shards.
+
+    Images are decoded and resized once to IMAGE_SIZE and stored as uint8
+    ``.npy`` shards in the file order of InputPipeline (sorted classes, sorted
+    files), with the relative path of every image in the manifest. Readers
+    take the training and validation images of split_index.json through it.
+    Preprocessing is left to the reader and the shards do not depend on the
+    backbone. Only runs when INPUT_PIPELINE is packed.
+    """
+
+    def __init__(self, config: DatasetPackingConfig):
+        self.config = config
+
+    def _fingerprint(self, data_dir: Path, files: list) -> str:
+        digest = hashlib.sha1(f"{self.config.params_image_size[:-1]}:{JPEG_DCT_METHOD}".encode())
+        for file in files:
+            stat = os.stat(data_dir / file)
+            digest.update(f"{file}\0{stat.st_size}\0{stat.st_mtime_ns}\n".encode())
+        return digest.hexdigest()
+
+    def _is_current(self, fingerprint: str) -> bool:
+        manifest_file = Path(self.config.root_dir) / MANIFEST_FILE
+        if not manifest_file.exists():
+            return False
+        with open(manifest_file) as f:
+            manifest = json.load(f)
+        return manifest["fingerprint"] == fingerprint and all(
+            (Path(self.config.root_dir) / shard["file"]).exists() for shard in manifest["shards"]
+        )
+
+    def pack(self):
+        input_pipeline = InputPipeline(
+            data_dir=self.config.training_data,
+            image_size=self.config.params_image_size,
+            batch_size=self.config.params_batch_size,
+            validation_split=0.,
+            preprocessing="none"
+        )
+        data_dir = Path(self.config.training_data)
+        paths, labels = input_pipeline.list_files()
+        files = [Path(path).relative_to(data_dir).as_posix() for path in paths]
+
+        fingerprint = self._fingerprint(data_dir, files)
+        if self._is_current(fingerprint):
+            logger.info(f"Packed dataset at {self.config.root_dir} is up to date")
+            return
+
+        # Shards are written next to the old ones and swapped in at the end, so an
+        # interrupted run never leaves a half-written dataset behind
+        root_dir = Path(self.config.root_dir)
+        tmp_dir = root_dir.with_name(root_dir.name + ".tmp")
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        tmp_dir.mkdir(parents=True)
+
+        height, width = self.config.params_image_size[:2]
+        shard_size = self.config.shard_size
+        shards = []
+        for start in range(0, len(paths), shard_size):
+            count = min(shard_size, len(paths) - start)
+            shard_file = f"shard_{len(shards):05d}.npy"
+            shard = np.lib.format.open_memmap(
+                tmp_dir / shard_file, mode="w+", dtype=np.uint8, shape=(count, height, width, 3)
+            )
+            offset = 0
+            for batch in input_pipeline.images(paths[start:start + count]):
+                batch = np.clip(np.rint(batch.numpy()), 0, 255).astype(np.uint8)
+                shard[offset:offset + len(batch)] = batch
+                offset += len(batch)
+            shard.flush()
+            del shard
+            shards.append({"file": shard_file, "start": start, "count": count})
+
+        np.save(tmp_dir / LABELS_FILE, np.asarray(labels, dtype=np.int32))
+
+        class_ranges = {}
+        for index, label in enumerate(labels):
+            name = input_pipeline.class_names[label]
+            class_ranges.setdefault(name, [index, index])[1] = index + 1
+
+        manifest = {
+            "fingerprint": fingerprint,
+            "data_dir": str(data_dir),
+            "image_size": list(self.config.params_image_size[:2]),
+            "class_names": input_pipeline.class_names,
+            "num_images": len(paths),
+            "class_ranges": class_ranges,
+            "shards": shards,
+            "files": files
+        }
+        with open(tmp_dir / MANIFEST_FILE, "w") as f:
+            json.dump(manifest, f)
+
+        shutil.rmtree(root_dir, ignore_errors=True)
+        os.replace(tmp_dir, root_dir)
+        logger.info(f"Packed {len(paths)} images into {len(shards)} shards at {root_dir}")
+
+
+class PackedInputPipeline(InputPipeline):
+    """InputPipeline reading the shards written by DatasetPacking.
+
+    The shards are memory-mapped and batches are gathered from them with
+    plain array indexing, so an epoch reads a few large files instead of
+    opening and decoding every image.
+    """
+
+    def __init__(
+        self,
+        packed_dir: Path,
+        image_size: list,
+        batch_size: int,
+        validation_split: float = 0.,
+        preprocessing: str = "rescale",
+        split_index=None,
+        **kwargs
+    ):
+        # cache / cache_dir are accepted for compatibility, the shards are already decoded
+        self.packed_dir = Path(packed_dir)
+        with open(self.packed_dir / MANIFEST_FILE) as f:
+            self.manifest = json.load(f)
+
+        self.image_size = list(image_size[:-1])
+        if self.manifest["image_size"] != self.image_size:
+            raise ValueError(
+                f"Packed dataset has image size {self.manifest['image_size']}, expected "
+                f"{self.image_size}: re-run the dataset packing stage"
+            )
+        self.data_dir = Path(self.manifest["data_dir"])
+        self.batch_size = batch_size
+        self.validation_split = validation_split
+        self.split_index = split_index
+        self.cache = None
+        self.preprocessing = preprocessing
+        self.preprocess = get_preprocessing_function(preprocessing)
+        self.class_names = split_index.class_names if split_index is not None else self.manifest["class_names"]
+        self.class_indices = {name: i for i, name in enumerate(self.class_names)}
+
+        self.shards = [
+            np.load(self.packed_dir / shard["file"], mmap_mode="r") for shard in self.manifest["shards"]
+        ]
+        self.shard_starts = np.array([shard["start"] for shard in self.manifest["shards"]])
+        self.labels = np.load(self.packed_dir / LABELS_FILE)
+        self.paths = [str(self.data_dir / file) for file in self.manifest["files"]]
+        self._path_indices = {path: i for i, path in enumerate(self.paths)}
+
+    def subset_indices(self, subset: str = None):
+        """Indices into the packed images of ``subset``, split like InputPipeline.list_files."""
+        if self.split_index is not None:
+            file_indices = {file: i for i, file in enumerate(self.manifest["files"])}
+            files, _ = self.split_index.relative_files(subset)
+            missing = [file for file in files if file not in file_indices]
+            if missing:
+                raise ValueError(f"{len(missing)} images are not packed yet: re-run the dataset packing stage")
+            return np.asarray([file_indices[file] for file in files], dtype=np.int64)
+
+        if subset == "validation":
+            split = (0, self.validation_split)
+        elif subset == "training":
+            split = (self.validation_split, 1)
+        else:
+            split = (0, 1)
+
+        indices = []
+        for class_name in self.class_names:
+            first, last = self.manifest["class_ranges"].get(class_name, (0, 0))
+            count = last - first
+            indices.extend(range(first + int(split[0] * count), first + int(split[1] * count)))
+        return np.asarray(indices, dtype=np.int64)
+
+    def list_files(self, subset: str = None):
+        indices = self.subset_indices(subset)
+        return [self.paths[i] for i in indices], self.labels[indices].tolist()
+
+    def _gather(self, indices: np.ndarray) -> np.ndarray:
+        batch = np.empty((len(indices), *self.image_size, 3), dtype=np.uint8)
+        shard_ids = np.searchsorted(self.shard_starts, indices, side="right") - 1
+        for shard_id in np.unique(shard_ids):
+            mask = shard_ids == shard_id
+            batch[mask] = self.shards[shard_id][indices[mask] - self.shard_starts[shard_id]]
+        return batch
+
+    def _load_batch(self, indices):
+        images = tf.numpy_function(self._gather, [indices], tf.uint8, stateful=False)
+        images.set_shape([None, *self.image_size, 3])
+        return self.preprocess(tf.cast(images, tf.float32))
+
+    def images(self, paths: list):
+        """Packed images of ``paths`` in batches, in order."""
+        indices = np.asarray([self._path_indices[str(path)] for path in paths], dtype=np.int64)
+        ds = tf.data.Dataset.from_tensor_slices(indices).batch(self.batch_size)
+        return ds.map(self._load_batch, num_parallel_calls=AUTOTUNE).prefetch(AUTOTUNE)
+
+    def dataset(self, subset: str, shuffle: bool = False, augment: bool = False, repeat: bool = False,
+                num_shards: int = 1, shard_index: int = 0, seed: int = None):
+        indices = self.subset_indices(subset)
+        logger.info(f"Found {len(indices)} packed images belonging to {len(self.class_names)} classes ({subset})")
+
+        ds = tf.data.Dataset.from_tensor_slices((indices, self.labels[indices]))
+        if num_shards > 1:
+            ds = ds.shard(num_shards, shard_index)
+            options = tf.data.Options()
+            options.experimental_distribute.auto_shard_policy = tf.data.experimental.AutoShardPolicy.OFF
+            ds = ds.with_options(options)
+        if shuffle:
+            ds = ds.shuffle(len(indices), seed=seed, reshuffle_each_iteration=True)
+        if repeat:
+            ds = ds.repeat()
+        # Whole batches are gathered at once, which keeps the reads sequential when not shuffling
+        ds = ds.batch(self.batch_size)
+        ds = ds.map(
+            lambda i, y: (self._load_batch(i), tf.one_hot(y, depth=len(self.class_names))),
+            num_parallel_calls=AUTOTUNE
+        )
+        if augment:
+            augmentation = self._augmentation_layers()
+            ds = ds.map(
+                lambda x, y: (augmentation(x, training=True), y),
+                num_parallel_calls=AUTOTUNE
+            )
+        ds = ds.prefetch(AUTOTUNE)
+        return ds, len(indices)
@@ -0,0 +1,92 @@
+import json
+import os
+import subprocess
+import sys
+from functools import lru_cache
+import numpy as np
+import tensorflow as tf
+from cnnClassifier import logger
+from cnnClassifier.utils.common import free_port
+
+
+@lru_cache(maxsize=None)
+def get_strategy(name: str = None, num_cpu_replicas: int = 1) -> tf.distribute.Strategy:
+    """Returns the tf.distribute strategy selected in params.yaml.
+
+    Strategies are created once per process, as TensorFlow only allows the
+    device layout and the collective runtime to be configured once.
+    """
+    if not name:
+        return tf.distribute.get_strategy()
+
+    if name == "mirrored":
+        cpus = tf.config.list_physical_devices("CPU")
+        try:
+            tf.config.set_logical_device_configuration(
+                cpus[0], [tf.config.LogicalDeviceConfiguration()] * num_cpu_replicas
+            )
+        except RuntimeError:
+            logger.warning("TensorFlow is already initialized, using the existing CPU devices")
+        devices = [device.name for device in tf.config.list_logical_devices("CPU")]
+        strategy = tf.distribute.MirroredStrategy(devices=devices)
+    elif name == "multi_worker_mirrored":
+        # The cluster layout is read from the TF_CONFIG environment variable
+        strategy = tf.distribute.MultiWorkerMirroredStrategy()
+    else:
+        raise ValueError(f"Unknown distribution strategy: {name}")
+
+    logger.info(f"Using the {name} strategy with {strategy.num_replicas_in_sync} replicas")
+    return strategy
+
+
+def worker_info():
+    """Returns (num_workers, worker_index, is_chief) from TF_CONFIG.
+
+    A cluster with a chief task counts it as a worker and makes it the chief,
+    with the index 0 and the other workers after it; otherwise worker 0 is.
+    """
+    tf_config = json.loads(os.environ.get("TF_CONFIG", "{}"))
+    cluster = tf_config.get("cluster", {})
+    chiefs, workers = cluster.get("chief", []), cluster.get("worker", [])
+    task = tf_config.get("task", {})
+    task_type, index = task.get("type", "worker"), task.get("index", 0)
+
+    if task_type == "chief":
+        return len(chiefs) + len(workers), 0, True
+    if chiefs:
+        return len(chiefs) + len(workers), len(chiefs) + index, False
+    return max(len(workers), 1), index, index == 0
+
+
+def launch_local_workers(num_workers: int, module: str = "cnnClassifier.pipeline.stage_03_training") -> list:
+    """Runs ``module`` in ``num_workers`` localhost processes forming one cluster.
+
+    Each worker gets its TF_CONFIG and an even share of the CPU threads.
+    Returns the exit codes of the workers.
+    """
+    cluster = {"worker": [f"localhost:{free_port('localhost')}" for _ in range(num_workers)]}
+    threads = max((os.cpu_count() or 1) // num_workers, 1)
+
+    processes = []
+    for index in range(num_workers):
+        env = dict(
+            os.environ,
+            TF_CONFIG=json.dumps({"cluster": cluster, "task": {"type": "worker", "index": index}}),
+            TF_NUM_INTRAOP_THREADS=str(threads),
+            TF_NUM_INTEROP_THREADS="2"
+        )
+        processes.append(subprocess.Popen([sys.executable, "-m", module], env=env))
+        logger.info(f"Started worker {index} of {num_workers} ({cluster['worker'][index]})")
+
+    return [process.wait() for process in processes]
+
+
+def max_weight_difference(paths: list) -> float:
+    """Largest absolute difference between the weights of the models at ``paths``."""
+    reference = tf.keras.models.load_model(paths[0]).get_weights()
+    difference = 0.
+    for path in paths[1:]:
+        weights = tf.keras.models.load_model(path).get_weights()
+        for a, b in zip(reference, weights):
+            difference = max(difference, float(np.max(np.abs(a - b))) if a.size else 0.)
+    return difference
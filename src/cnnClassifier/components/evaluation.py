@@ -1,9 +1,21 @@
+import time
 import tensorflow as tf
 from pathlib import Path
+from cnnClassifier import logger
 from cnnClassifier.entity.config_entity import EvaluationConfig
-from cnnClassifier.utils.common import save_json
+from cnnClassifier.utils.common import save_json, append_json
+from cnnClassifier.components.input_pipeline import InputPipeline
+from cnnClassifier.components.dataset_packing import PackedInputPipeline
+from cnnClassifier.components.split_index import SplitIndex
+from cnnClassifier.components.preprocessing import image_data_generator_kwargs
+from cnnClassifier.components.inference_backend import load_backend
+from cnnClassifier.components.streaming_metrics import StreamingClassificationMetrics
 
 
+# Backends loaded by this process, keyed by the path, size and mtime of the
+# model file, so repeated evaluations of an unchanged model skip the reload
+_backends = {}
+
 
 class Evaluation:
     def __init__(self, config: EvaluationConfig):
@@ -11,45 +23,141 @@ class Evaluation:
 
     
     def _valid_generator(self):
+        # The held-out subset of the split index, never seen during training
+        split_index = SplitIndex.load(self.config.split_index_file, self.config.training_data)
+        self.class_names = split_index.class_names
 
-        datagenerator_kwargs = dict(
-            rescale = 1./255,
-            validation_split=0.30
-        )
+        if self.config.params_input_pipeline == "packed":
+            input_pipeline = PackedInputPipeline(
+                packed_dir=self.config.packed_data_dir,
+                image_size=self.config.params_image_size,
+                batch_size=self.config.params_batch_size,
+                preprocessing=self.config.params_preprocessing,
+                split_index=split_index
+            )
+            self.valid_generator, self.valid_samples = input_pipeline.dataset(subset="validation")
+            return
+
+        if self.config.params_input_pipeline == "tf_data":
+            input_pipeline = InputPipeline(
+                data_dir=self.config.training_data,
+                image_size=self.config.params_image_size,
+                batch_size=self.config.params_batch_size,
+                cache=self.config.params_data_cache,
+                cache_dir=self.config.data_cache_dir,
+                preprocessing=self.config.params_preprocessing,
+                split_index=split_index
+            )
+            self.valid_generator, self.valid_samples = input_pipeline.dataset(subset="validation")
+            return
+
+        datagenerator_kwargs = image_data_generator_kwargs(self.config.params_preprocessing)
 
         dataflow_kwargs = dict(
             target_size=self.config.params_image_size[:-1],
             batch_size=self.config.params_batch_size,
-            interpolation="bilinear"
+            interpolation="bilinear",
+            classes=split_index.class_names
         )
 
         valid_datagenerator = tf.keras.preprocessing.image.ImageDataGenerator(
             **datagenerator_kwargs
         )
 
-        self.valid_generator = valid_datagenerator.flow_from_directory(
-            directory=self.config.training_data,
-            subset="validation",
+        self.valid_generator = valid_datagenerator.flow_from_dataframe(
+            split_index.dataframe("validation"),
             shuffle=False,
             **dataflow_kwargs
         )
+        self.valid_samples = self.valid_generator.samples
 
     
-    @staticmethod
-    def load_model(path: Path) -> tf.keras.Model:
-        return tf.keras.models.load_model(path)
+    def _batches(self):
+        """Validation (images, labels) batches as numpy arrays, decoded once for all models."""
+        if isinstance(self.valid_generator, tf.data.Dataset):
+            yield from self.valid_generator.as_numpy_iterator()
+        else:
+            for index in range(len(self.valid_generator)):
+                yield self.valid_generator[index]
+
+    
+    def load_backend(self, path: Path):
+        stat = Path(path).stat()
+        key = (str(Path(path).resolve()), stat.st_size, stat.st_mtime_ns)
+        backend = _backends.get(key)
+        if backend is None:
+            backend = load_backend(path)
+            if self.config.params_jit_compile and hasattr(backend, "model") and hasattr(backend.model, "compile"):
+                backend.model.compile(jit_compile=True)
+            # Older versions of the same file are not needed anymore
+            for stale in [other for other in _backends if other[0] == key[0]]:
+                del _backends[stale]
+            _backends[key] = backend
+        return backend
     
 
     def evaluation(self):
-        model = self.load_model(self.config.path_of_model)
+        """Streams the validation set once through the trained model and the extra model artifacts.
+
+        Metrics are accumulated per batch, so no predictions are kept in memory.
+        """
         self._valid_generator()
-        self.score = model.evaluate(self.valid_generator)
+        paths = {"model": Path(self.config.path_of_model)}
+        for path in map(Path, self.config.extra_models):
+            if path.exists():
+                paths[path.name] = path
+            else:
+                logger.warning(f"Skipping the evaluation of {path}, it does not exist")
+        backends = {name: self.load_backend(path) for name, path in paths.items()}
+
+        metrics = {
+            name: StreamingClassificationMetrics(self.class_names, self.config.calibration_bins)
+            for name in backends
+        }
+        predict_time = dict.fromkeys(backends, 0.)
+        start = time.perf_counter()
+        for images, labels in self._batches():
+            for name, backend in backends.items():
+                predict_start = time.perf_counter()
+                probabilities = backend.predict_batch(images)
+                predict_time[name] += time.perf_counter() - predict_start
+                metrics[name].update(labels, probabilities)
+        elapsed = time.perf_counter() - start
+
+        self.results = {}
+        for name, path in paths.items():
+            self.results[name] = {
+                "path": str(path),
+                **metrics[name].result(),
+                "images_per_sec": self.valid_samples / max(predict_time[name], 1e-9)
+            }
+            logger.info(
+                f"{name}: accuracy {self.results[name]['accuracy']:.4f}, "
+                f"macro F1 {self.results[name]['macro_f1']:.4f}, ROC-AUC {self.results[name]['roc_auc']}"
+            )
+        self.score = [self.results["model"]["loss"], self.results["model"]["accuracy"]]
+
+        append_json(path=Path(self.config.performance_file), data={
+            "timestamp": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "jit_compile": self.config.params_jit_compile,
+            "batch_size": self.config.params_batch_size,
+            "models": list(paths),
+            "eval_time_s": elapsed,
+            "images_per_sec": self.valid_samples / elapsed
+        })
+        self.eval_time = elapsed
 
     
     def save_score(self):
-        scores = {"loss": self.score[0], "accuracy": self.score[1]}
+        # loss and accuracy of the trained model stay at the top level for the downstream stages
+        model_results = dict(self.results["model"])
+        del model_results["path"]
+        scores = {
+            **model_results,
+            "eval_time_s": self.eval_time,
+            "eval_images_per_sec": self.valid_samples / self.eval_time
+        }
+        extra = {name: results for name, results in self.results.items() if name != "model"}
+        if extra:
+            scores["models"] = extra
         save_json(path=Path("scores.json"), data=scores)
-
-    
-
-    
\ No newline at end of file
@@ -0,0 +1,169 @@
+import hashlib
+import json
+import os
+import shutil
+from contextlib import contextmanager
+from pathlib import Path
+import numpy as np
+import tensorflow as tf
+from cnnClassifier import logger
+from cnnClassifier.entity.config_entity import FeatureCacheConfig
+from cnnClassifier.components.input_pipeline import InputPipeline
+from cnnClassifier.components.preprocessing import JPEG_DCT_METHOD
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+
+class FeatureCache:
+    """Memory-mapped store of frozen-backbone activations.
+
+    Features are keyed by the content hash of each image and stored under a
+    directory named after the backbone weights fingerprint and image size, so
+    changing the backbone weights, IMAGE_SIZE or the preprocessing automatically starts a fresh
+    cache and removes the stale one, unless ``prune_stale`` is off. Processes
+    sharing ``root_dir``, e.g. the trials of a sweep, take turns extracting.
+    """
+
+    def __init__(self, config: FeatureCacheConfig):
+        self.config = config
+
+    @staticmethod
+    def split_model(model: tf.keras.Model):
+        """Splits a model into its frozen backbone and the trainable head layers."""
+        layers = [layer for layer in model.layers if not isinstance(layer, tf.keras.layers.InputLayer)]
+        n_frozen = 0
+        for layer in layers:
+            if layer.trainable:
+                break
+            n_frozen += 1
+
+        if n_frozen == 0:
+            raise ValueError("Model has no frozen backbone, bottleneck features cannot be cached")
+
+        backbone = tf.keras.models.Model(
+            inputs=model.inputs,
+            outputs=layers[n_frozen - 1].output
+        )
+        return backbone, layers[n_frozen:]
+
+    @staticmethod
+    def head_model(model: tf.keras.Model) -> tf.keras.Model:
+        """Builds a model over cached features that shares the head layers of ``model``."""
+        backbone, head_layers = FeatureCache.split_model(model)
+        features = tf.keras.Input(shape=backbone.output.shape[1:])
+        x = features
+        for layer in head_layers:
+            x = layer(x)
+        return tf.keras.models.Model(inputs=features, outputs=x)
+
+    @staticmethod
+    def weights_fingerprint(model: tf.keras.Model) -> str:
+        digest = hashlib.sha256()
+        # Features computed under a mixed precision policy differ from float32 ones
+        digest.update(str(model.compute_dtype).encode())
+        for weight in model.get_weights():
+            digest.update(np.ascontiguousarray(weight).tobytes())
+        return digest.hexdigest()
+
+    @staticmethod
+    def content_hash(path) -> str:
+        with open(path, "rb") as f:
+            return hashlib.sha1(f.read()).hexdigest()
+
+    def _store_dir(self, fingerprint: str) -> Path:
+        height, width = self.config.params_image_size[:-1]
+        return Path(self.config.root_dir) / (
+            f"{fingerprint[:16]}_{height}x{width}_{self.config.params_preprocessing}_{JPEG_DCT_METHOD.lower()}"
+        )
+
+    def _drop_stale_stores(self, store_dir: Path):
+        for entry in os.scandir(self.config.root_dir):
+            if entry.is_dir() and Path(entry.path) != store_dir:
+                logger.info(f"Removing stale feature cache: {entry.path}")
+                shutil.rmtree(entry.path)
+
+    @contextmanager
+    def _lock(self):
+        """Held while a process reads or extends the stores under ``root_dir``."""
+        if fcntl is None:
+            yield
+            return
+        with open(Path(self.config.root_dir) / ".lock", "w") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def load(self, model: tf.keras.Model, paths: list) -> np.ndarray:
+        """Returns the backbone features of ``paths``, extracting only uncached images."""
+        backbone, _ = self.split_model(model)
+        store_dir = self._store_dir(self.weights_fingerprint(backbone))
+        hashes = [self.content_hash(path) for path in paths]
+
+        os.makedirs(store_dir, exist_ok=True)
+        with self._lock():
+            if self.config.prune_stale:
+                self._drop_stale_stores(store_dir)
+
+            features_path = store_dir / "features.npy"
+            index_path = store_dir / "index.json"
+            index = {}
+            if features_path.exists() and index_path.exists():
+                with open(index_path) as f:
+                    index = json.load(f)
+
+            missing = {}
+            for path, content_hash in zip(paths, hashes):
+                if content_hash not in index and content_hash not in missing:
+                    missing[content_hash] = path
+
+            if missing:
+                logger.info(f"Extracting bottleneck features for {len(missing)} images")
+                self._extend(backbone, features_path, index, missing)
+                tmp_path = index_path.with_suffix(f".tmp{os.getpid()}")
+                with open(tmp_path, "w") as f:
+                    json.dump(index, f)
+                os.replace(tmp_path, index_path)
+            else:
+                logger.info(f"All {len(paths)} bottleneck features found in cache: {store_dir}")
+
+            features = np.load(features_path, mmap_mode="r")
+            return features[[index[content_hash] for content_hash in hashes]]
+
+    def _extend(self, backbone: tf.keras.Model, features_path: Path, index: dict, missing: dict):
+        feature_shape = tuple(backbone.output.shape[1:])
+        n_cached = len(index)
+        tmp_path = features_path.with_suffix(f".tmp{os.getpid()}.npy")
+        store = np.lib.format.open_memmap(
+            tmp_path, mode="w+", dtype=np.float32, shape=(n_cached + len(missing), *feature_shape)
+        )
+
+        if n_cached:
+            cached = np.load(features_path, mmap_mode="r")
+            for start in range(0, n_cached, self.config.params_batch_size):
+                stop = start + self.config.params_batch_size
+                store[start:stop] = cached[start:stop]
+            del cached
+
+        input_pipeline = InputPipeline(
+            data_dir=self.config.training_data,
+            image_size=self.config.params_image_size,
+            batch_size=self.config.params_batch_size,
+            validation_split=0.,
+            preprocessing=self.config.params_preprocessing
+        )
+        row = n_cached
+        for batch in input_pipeline.images(list(missing.values())):
+            features = np.asarray(backbone.predict_on_batch(batch))
+            store[row:row + len(features)] = features
+            row += len(features)
+
+        store.flush()
+        del store
+        os.replace(tmp_path, features_path)
+        for i, content_hash in enumerate(missing):
+            index[content_hash] = n_cached + i
@@ -0,0 +1,129 @@
+import threading
+from abc import ABC, abstractmethod
+from pathlib import Path
+import numpy as np
+from cnnClassifier import logger
+
+# TensorFlow is imported by the backends that need it, so importing the serving
+# code stays fast and health checks answer while the model loads
+
+
+class InferenceBackend(ABC):
+    """Common interface over the model formats the prediction pipeline can serve."""
+
+    @abstractmethod
+    def predict_batch(self, batch: np.ndarray) -> np.ndarray:
+        """Class probabilities of a batch of model inputs."""
+
+
+class KerasBackend(InferenceBackend):
+    def __init__(self, path: Path):
+        import tensorflow as tf
+
+        self.model = tf.keras.models.load_model(path)
+
+    def predict_batch(self, batch: np.ndarray) -> np.ndarray:
+        return np.asarray(self.model.predict_on_batch(batch))
+
+    def fuse_preprocessing(self, preprocess):
+        """Moves the uint8 to float32 conversion and ``preprocess`` into the model graph.
+
+        The model then takes uint8 batches, a quarter of the float32 bytes.
+        """
+        import tensorflow as tf
+
+        inputs = tf.keras.Input(shape=self.model.input_shape[1:], dtype="uint8")
+        x = tf.keras.layers.Lambda(lambda images: preprocess(tf.cast(images, tf.float32)))(inputs)
+        self.model = tf.keras.Model(inputs, self.model(x))
+
+
+class SavedModelBackend(InferenceBackend):
+    """Serves a SavedModel with a ``serve`` endpoint, as written by ``model.export``.
+
+    Its functions were traced when it was exported, so loading skips the
+    Keras deserialization and the tracing of the first batches.
+    """
+
+    def __init__(self, path: Path):
+        import tensorflow as tf
+
+        self.model = tf.saved_model.load(str(path))
+        self._serve = self.model.serve
+        self.input_dtype = self._serve.input_signature[0].dtype.as_numpy_dtype
+
+    def predict_batch(self, batch: np.ndarray) -> np.ndarray:
+        return np.asarray(self._serve(batch.astype(self.input_dtype, copy=False)))
+
+
+class TFLiteBackend(InferenceBackend):
+    def __init__(self, path: Path, num_threads: int = None):
+        import tensorflow as tf
+
+        self.interpreter = tf.lite.Interpreter(model_path=str(path), num_threads=num_threads)
+        self.interpreter.allocate_tensors()
+        self._refresh_details()
+        # A TFLite interpreter must not be invoked from several threads at once
+        self._lock = threading.Lock()
+
+    def _refresh_details(self):
+        self._input = self.interpreter.get_input_details()[0]
+        self._output = self.interpreter.get_output_details()[0]
+
+    @staticmethod
+    def _quantize(batch: np.ndarray, details: dict) -> np.ndarray:
+        scale, zero_point = details["quantization"]
+        if details["dtype"] in (np.int8, np.uint8) and scale:
+            info = np.iinfo(details["dtype"])
+            batch = np.clip(np.round(batch / scale + zero_point), info.min, info.max)
+        return batch.astype(details["dtype"])
+
+    @staticmethod
+    def _dequantize(output: np.ndarray, details: dict) -> np.ndarray:
+        scale, zero_point = details["quantization"]
+        if details["dtype"] in (np.int8, np.uint8) and scale:
+            return (output.astype(np.float32) - zero_point) * scale
+        return output
+
+    def predict_batch(self, batch: np.ndarray) -> np.ndarray:
+        with self._lock:
+            if tuple(self._input["shape"]) != batch.shape:
+                self.interpreter.resize_tensor_input(self._input["index"], batch.shape)
+                self.interpreter.allocate_tensors()
+                self._refresh_details()
+            self.interpreter.set_tensor(self._input["index"], self._quantize(batch, self._input))
+            self.interpreter.invoke()
+            output = self.interpreter.get_tensor(self._output["index"]).copy()
+        return self._dequantize(output, self._output)
+
+
+class OnnxBackend(InferenceBackend):
+    def __init__(self, path: Path, num_threads: int = None):
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+        self.session = ort.InferenceSession(str(path), options, providers=["CPUExecutionProvider"])
+        self._input_name = self.session.get_inputs()[0].name
+
+    def predict_batch(self, batch: np.ndarray) -> np.ndarray:
+        return self.session.run(None, {self._input_name: batch.astype(np.float32)})[0]
+
+
+def load_backend(path: Path, num_threads: int = None) -> InferenceBackend:
+    """Loads a model artifact with the backend matching its file extension."""
+    path = Path(path)
+    suffix = path.suffix.lower()
+    if suffix == ".tflite":
+        backend = TFLiteBackend(path, num_threads=num_threads)
+    elif suffix == ".onnx":
+        backend = OnnxBackend(path, num_threads=num_threads)
+    elif suffix in (".h5", ".keras"):
+        backend = KerasBackend(path)
+    elif (path / "saved_model.pb").exists():
+        backend = SavedModelBackend(path)
+    else:
+        raise ValueError(f"Unsupported model format: {path}")
+
+    logger.info(f"{type(backend).__name__} loaded from: {path}")
+    return backend
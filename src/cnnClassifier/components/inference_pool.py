@@ -0,0 +1,99 @@
+import asyncio
+import contextvars
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+
+
+class InferenceQueueFull(RuntimeError):
+    """Raised when a request arrives while ``max_pending`` requests are in flight."""
+
+
+class _Slot:
+    """An admitted request: held until the request is done and its pool jobs finished."""
+
+    def __init__(self):
+        self.jobs = 0
+        self.open = True
+
+
+# The slot of the request the current task serves, inherited by the task of wait_for
+_current_slot = contextvars.ContextVar("inference_slot", default=None)
+
+
+class InferencePool:
+    """Bounded thread pool running model work for an asyncio server.
+
+    Preprocessing and model calls run on ``num_workers`` threads so the event
+    loop never blocks on TensorFlow. At most ``max_pending`` requests are
+    admitted at a time; further requests are rejected right away with
+    InferenceQueueFull instead of queueing without bound, and every admitted
+    request is given ``timeout_s`` to finish. A request that timed out keeps
+    its slot until the pool jobs it started have finished, so abandoned work
+    still counts against ``max_pending``; its jobs that have not started yet
+    are cancelled.
+    """
+
+    def __init__(self, num_workers: int, max_pending: int, timeout_s: float):
+        self.max_pending = max_pending
+        self.timeout_s = timeout_s
+        self._executor = ThreadPoolExecutor(max_workers=num_workers, thread_name_prefix="inference")
+        self._lock = threading.Lock()
+        self.pending = 0
+        self.rejected = 0
+        self.timed_out = 0
+
+    @asynccontextmanager
+    async def slot(self):
+        """Admits one request, raising InferenceQueueFull when the pool is saturated."""
+        with self._lock:
+            if self.pending >= self.max_pending:
+                self.rejected += 1
+                raise InferenceQueueFull(f"{self.pending} requests already in flight")
+            self.pending += 1
+        slot = _Slot()
+        token = _current_slot.set(slot)
+        try:
+            yield
+        finally:
+            _current_slot.reset(token)
+            with self._lock:
+                slot.open = False
+                if not slot.jobs:
+                    self.pending -= 1
+
+    def _job_done(self, slot: _Slot):
+        with self._lock:
+            slot.jobs -= 1
+            if not slot.open and not slot.jobs:
+                self.pending -= 1
+
+    async def run(self, fn, *args):
+        slot = _current_slot.get()
+        future = self._executor.submit(fn, *args)
+        if slot is not None:
+            with self._lock:
+                slot.jobs += 1
+            future.add_done_callback(lambda _: self._job_done(slot))
+        # Cancelling the awaiting task cancels the job unless it already started
+        return await asyncio.wrap_future(future)
+
+    async def with_timeout(self, coroutine):
+        try:
+            return await asyncio.wait_for(coroutine, timeout=self.timeout_s)
+        except asyncio.TimeoutError:
+            with self._lock:
+                self.timed_out += 1
+            raise
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "pending": self.pending,
+                "max_pending": self.max_pending,
+                "rejected": self.rejected,
+                "timed_out": self.timed_out
+            }
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
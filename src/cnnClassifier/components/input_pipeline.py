@@ -0,0 +1,150 @@
+import hashlib
+import os
+from pathlib import Path
+import tensorflow as tf
+from cnnClassifier import logger
+from cnnClassifier.components.preprocessing import get_preprocessing_function, decode_and_resize, JPEG_DCT_METHOD
+
+
+AUTOTUNE = tf.data.AUTOTUNE
+IMAGE_EXTENSIONS = ("png", "jpg", "jpeg", "bmp", "ppm", "tif", "tiff")
+
+
+class InputPipeline:
+    """tf.data replacement for ImageDataGenerator.flow_from_directory.
+
+    With a SplitIndex the subsets are read from it, so every stage sees the
+    same training and validation files. Without one, files are listed and
+    split like the legacy generator (sorted class folders, sorted files,
+    validation taken from the head of each class). Decoding, resizing and
+    augmentation run in parallel and the decoded, un-augmented tensors can be
+    cached in memory or on disk.
+    """
+
+    def __init__(
+        self,
+        data_dir: Path,
+        image_size: list,
+        batch_size: int,
+        validation_split: float = 0.,
+        cache: str = None,
+        cache_dir: Path = None,
+        preprocessing: str = "rescale",
+        split_index=None
+    ):
+        self.data_dir = Path(data_dir)
+        self.image_size = list(image_size[:-1])
+        self.batch_size = batch_size
+        self.validation_split = validation_split
+        self.cache = cache
+        self.cache_dir = Path(cache_dir) if cache_dir is not None else None
+        self.preprocessing = preprocessing
+        self.preprocess = get_preprocessing_function(preprocessing)
+        self.split_index = split_index
+
+        if split_index is not None:
+            self.class_names = split_index.class_names
+        else:
+            self.class_names = sorted(
+                entry.name for entry in os.scandir(self.data_dir) if entry.is_dir()
+            )
+        self.class_indices = {name: i for i, name in enumerate(self.class_names)}
+
+    def _list_class_files(self, class_name: str) -> list:
+        files = []
+        for root, _, filenames in sorted(os.walk(self.data_dir / class_name), key=lambda x: x[0]):
+            for filename in sorted(filenames):
+                if filename.lower().endswith(IMAGE_EXTENSIONS):
+                    files.append(os.path.join(root, filename))
+        return files
+
+    def list_files(self, subset: str = None):
+        if self.split_index is not None:
+            return self.split_index.list_files(subset)
+
+        if subset == "validation":
+            split = (0, self.validation_split)
+        elif subset == "training":
+            split = (self.validation_split, 1)
+        else:
+            split = (0, 1)
+
+        paths, labels = [], []
+        for class_name in self.class_names:
+            files = self._list_class_files(class_name)
+            start, stop = int(split[0] * len(files)), int(split[1] * len(files))
+            paths.extend(files[start:stop])
+            labels.extend([self.class_indices[class_name]] * (stop - start))
+        return paths, labels
+
+    def _load_image(self, path, label):
+        image = decode_and_resize(tf.io.read_file(path), self.image_size)
+        image = self.preprocess(image)
+        return image, tf.one_hot(label, depth=len(self.class_names))
+
+    def images(self, paths: list):
+        """Decoded, resized and rescaled images of ``paths`` in batches, in order."""
+        ds = tf.data.Dataset.from_tensor_slices(paths)
+        ds = ds.map(lambda path: self._load_image(path, 0)[0], num_parallel_calls=AUTOTUNE)
+        return ds.batch(self.batch_size).prefetch(AUTOTUNE)
+
+    @staticmethod
+    def _augmentation_layers():
+        # Mirrors the ImageDataGenerator augmentation used by Training; shear has
+        # no Keras preprocessing layer equivalent and is left out.
+        return tf.keras.Sequential([
+            tf.keras.layers.RandomRotation(40 / 360, fill_mode="nearest"),
+            tf.keras.layers.RandomTranslation(0.2, 0.2, fill_mode="nearest"),
+            tf.keras.layers.RandomZoom(0.2, fill_mode="nearest"),
+            tf.keras.layers.RandomFlip("horizontal")
+        ])
+
+    def _cache_filename(self, subset: str, paths: list, shard_index: int = 0) -> str:
+        if self.cache == "memory":
+            return ""
+        # The files with their size and mtime and the image size are part of the
+        # name so a changed dataset never reads a stale cache, also when
+        # incremental ingestion rewrote an image in place
+        digest = hashlib.sha1(f"{self.image_size}\0{self.preprocessing}\0{JPEG_DCT_METHOD}\n".encode())
+        for path in paths:
+            stat = os.stat(path)
+            digest.update(f"{path}\0{stat.st_size}\0{stat.st_mtime_ns}\n".encode())
+        fingerprint = digest.hexdigest()[:12]
+        os.makedirs(self.cache_dir, exist_ok=True)
+        return str(self.cache_dir / f"{subset}_{fingerprint}_{shard_index}")
+
+    def dataset(self, subset: str, shuffle: bool = False, augment: bool = False, repeat: bool = False,
+                num_shards: int = 1, shard_index: int = 0, seed: int = None):
+        """Builds the dataset of ``subset``.
+
+        With ``num_shards`` > 1 only every ``num_shards``-th file starting at
+        ``shard_index`` is read, so each distributed worker decodes its own
+        part of the data. The returned sample count is the full subset size.
+        A ``seed`` makes the shuffled order reproducible.
+        """
+        paths, labels = self.list_files(subset)
+        logger.info(f"Found {len(paths)} images belonging to {len(self.class_names)} classes ({subset})")
+
+        ds = tf.data.Dataset.from_tensor_slices((paths, labels))
+        if num_shards > 1:
+            ds = ds.shard(num_shards, shard_index)
+            # The files are already sharded per worker, so tf.distribute must not shard again
+            options = tf.data.Options()
+            options.experimental_distribute.auto_shard_policy = tf.data.experimental.AutoShardPolicy.OFF
+            ds = ds.with_options(options)
+        ds = ds.map(self._load_image, num_parallel_calls=AUTOTUNE)
+        if self.cache:
+            ds = ds.cache(self._cache_filename(subset, paths, shard_index))
+        if shuffle:
+            ds = ds.shuffle(len(paths), seed=seed, reshuffle_each_iteration=True)
+        if repeat:
+            ds = ds.repeat()
+        ds = ds.batch(self.batch_size)
+        if augment:
+            augmentation = self._augmentation_layers()
+            ds = ds.map(
+                lambda x, y: (augmentation(x, training=True), y),
+                num_parallel_calls=AUTOTUNE
+            )
+        ds = ds.prefetch(AUTOTUNE)
+        return ds, len(paths)
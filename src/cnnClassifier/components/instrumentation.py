@@ -0,0 +1,332 @@
+import bisect
+import cProfile
+import os
+import random
+import shutil
+import threading
+import time
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from pathlib import Path
+from cnnClassifier import logger
+from cnnClassifier.entity.config_entity import InstrumentationConfig
+
+
+# Seconds; spans single decode steps up to whole pipeline stages
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1., 2.5, 5., 10., 30., 60., 300., 1800.)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: tuple, values: tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric(ABC):
+    """A metric family with one series per combination of label values."""
+
+    type = None
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels: dict) -> tuple:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects the labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(labels[name] for name in self.labelnames)
+
+    @abstractmethod
+    def samples(self):
+        """(suffix, label values, extra label, value) of every sample."""
+
+    def render(self) -> list:
+        samples = self.samples()
+        if not samples:
+            # Families without samples are left out, e.g. stage metrics in a server process
+            return []
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type}"]
+        for suffix, values, extra, value in samples:
+            lines.append(f"{self.name}{suffix}{_format_labels(self.labelnames, values, extra)} {_format_value(value)}")
+        return lines
+
+
+class Counter(Metric):
+    type = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._series[key] = self._series.get(key, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            return [("", key, "", value) for key, value in sorted(self._series.items())]
+
+
+class Gauge(Metric):
+    type = "gauge"
+
+    def set(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._series[key] = value
+
+    def samples(self):
+        with self._lock:
+            return [("", key, "", value) for key, value in sorted(self._series.items())]
+
+
+class Histogram(Metric):
+    type = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = (), buckets: tuple = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                # Per-bucket counts, the last one for +Inf, and the sum
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.]
+            series[0][index] += 1
+            series[1] += value
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def samples(self):
+        samples = []
+        with self._lock:
+            for key, (counts, total) in sorted(self._series.items()):
+                cumulative = 0
+                for bound, count in zip((*self.buckets, float("inf")), counts):
+                    cumulative += count
+                    samples.append(("_bucket", key, f'le="{_format_value(bound)}"', cumulative))
+                samples.append(("_sum", key, "", total))
+                samples.append(("_count", key, "", cumulative))
+        return samples
+
+
+class MetricsRegistry:
+    """Metrics of one process in the Prometheus text exposition format."""
+
+    def __init__(self, prefix: str = "cnnclassifier_"):
+        self.prefix = prefix
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _get_or_create(self, cls, name: str, documentation: str, labelnames: tuple, **kwargs):
+        name = self.prefix + name
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, documentation, labelnames, **kwargs)
+            elif not isinstance(metric, cls) or metric.labelnames != tuple(labelnames):
+                raise ValueError(f"Metric {name} is already registered with another type or labels")
+            return metric
+
+    def counter(self, name: str, documentation: str, labelnames: tuple = ()) -> Counter:
+        return self._get_or_create(Counter, name, documentation, labelnames)
+
+    def gauge(self, name: str, documentation: str, labelnames: tuple = ()) -> Gauge:
+        return self._get_or_create(Gauge, name, documentation, labelnames)
+
+    def histogram(self, name: str, documentation: str, labelnames: tuple = (),
+                  buckets: tuple = DEFAULT_BUCKETS) -> Histogram:
+        return self._get_or_create(Histogram, name, documentation, labelnames, buckets=buckets)
+
+    def render(self, families: list = None) -> str:
+        """All metrics, or only ``families``, in the text exposition format."""
+        if families is None:
+            with self._lock:
+                families = list(self._metrics.values())
+        lines = []
+        for metric in families:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+    def write(self, path: Path, families: list = None):
+        """Writes the metrics atomically, e.g. for the textfile collector of the node exporter."""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(path.name + ".tmp")
+        tmp_path.write_text(self.render(families))
+        os.replace(tmp_path, path)
+
+
+# Shared by everything in the process
+metrics = MetricsRegistry()
+
+
+def _process_start_time() -> float:
+    """Start time of this process since the epoch, the import time where /proc is not available."""
+    try:
+        with open("/proc/self/stat") as f:
+            # The command name may hold spaces, the fields after it do not
+            start_ticks = int(f.read().rsplit(")", 1)[1].split()[19])
+        with open("/proc/stat") as f:
+            boot_time = next(int(line.split()[1]) for line in f if line.startswith("btime"))
+        return boot_time + start_ticks / os.sysconf("SC_CLK_TCK")
+    except (OSError, ValueError, IndexError, StopIteration):
+        return time.time()
+
+
+PROCESS_START_TIME = metrics.gauge("process_start_time_seconds", "Start time of the process since the epoch")
+PROCESS_START_TIME.set(_process_start_time())
+COLD_START = metrics.gauge(
+    "cold_start_seconds", "Seconds from the process start until the model was ready and until the first prediction",
+    ("phase",)
+)
+_first_prediction = threading.Event()
+
+
+def seconds_since_start() -> float:
+    return time.time() - PROCESS_START_TIME.samples()[0][3]
+
+
+def mark_first_prediction():
+    if not _first_prediction.is_set():
+        _first_prediction.set()
+        COLD_START.set(seconds_since_start(), phase="first_prediction")
+
+
+STAGE_DURATION = metrics.gauge(
+    "pipeline_stage_duration_seconds", "Wall time of the last run of a pipeline stage", ("stage",)
+)
+STAGE_RUNS = metrics.counter("pipeline_stage_runs_total", "Pipeline stage runs by outcome", ("stage", "status"))
+PIPELINE_LAST_RUN = metrics.gauge("pipeline_last_run_timestamp_seconds", "End time of the last pipeline run")
+TRAINING_STEP_DURATION = metrics.histogram("training_step_seconds", "Time between consecutive training steps")
+TRAINING_IMAGES = metrics.counter("training_images_total", "Images consumed by training steps")
+# Written by pipeline runs to a file that the servers add to /metrics
+PIPELINE_FAMILIES = [STAGE_DURATION, STAGE_RUNS, PIPELINE_LAST_RUN, TRAINING_STEP_DURATION, TRAINING_IMAGES]
+
+PREDICTION_STEP_DURATION = metrics.histogram(
+    "prediction_step_seconds", "Time per step of the prediction path", ("step",)
+)
+PREDICTION_IMAGES = metrics.counter("prediction_images_total", "Images run through the model")
+PREDICTION_BATCH_SIZE = metrics.histogram(
+    "prediction_batch_size", "Images per forward pass", buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256)
+)
+MODEL_LOAD_DURATION = metrics.gauge(
+    "model_load_seconds", "Time to load and warm up a served model", ("model",)
+)
+MODEL_LOADS = metrics.counter("model_loads_total", "Served models loaded")
+ACTIVE_MODEL = metrics.gauge("active_model_info", "The served model", ("model",))
+
+HTTP_REQUEST_DURATION = metrics.histogram(
+    "http_request_duration_seconds", "Latency of HTTP requests", ("route", "method", "status")
+)
+HTTP_REQUESTS = metrics.counter("http_requests_total", "HTTP requests", ("route", "method", "status"))
+
+
+def observe_request(route: str, method: str, status: int, duration: float):
+    HTTP_REQUEST_DURATION.observe(duration, route=route, method=method, status=status)
+    HTTP_REQUESTS.inc(route=route, method=method, status=status)
+
+
+PROFILES = metrics.counter("profiles_total", "Profiles captured of sampled requests and training steps", ("target",))
+
+
+class SampledProfiler:
+    """Opt-in profiling of a sampled fraction of requests and training steps.
+
+    ``cprofile`` dumps a ``.prof`` file per sampled call, which only covers the
+    calling thread; ``tf_profiler`` captures a TensorFlow trace of all threads
+    for TensorBoard, one at a time. Only the newest ``max_profiles`` profiles
+    are kept.
+    """
+
+    def __init__(self, config: InstrumentationConfig):
+        self.config = config
+        self.enabled = self.config.profiler is not None and self.config.profile_sample_rate > 0
+        if self.config.profiler not in (None, "cprofile", "tf_profiler"):
+            raise ValueError(f"Unknown profiler: {self.config.profiler}, expected cprofile or tf_profiler")
+        # TensorFlow supports a single trace per process
+        self._tf_trace = threading.Lock()
+        self._count = 0
+        self._count_lock = threading.Lock()
+
+    def sample(self) -> bool:
+        return self.enabled and random.random() < self.config.profile_sample_rate
+
+    def _path(self, target: str) -> Path:
+        with self._count_lock:
+            self._count += 1
+            count = self._count
+        name = f"{target}_{time.strftime('%Y%m%d-%H%M%S')}_{os.getpid()}_{count}"
+        return Path(self.config.profile_dir) / name
+
+    def _prune(self):
+        profiles = sorted(Path(self.config.profile_dir).iterdir(), key=lambda path: path.stat().st_mtime)
+        for path in profiles[:-self.config.max_profiles]:
+            if path.is_dir():
+                shutil.rmtree(path, ignore_errors=True)
+            else:
+                path.unlink(missing_ok=True)
+
+    def start(self, target: str):
+        """Starts a profile; returns a handle for ``stop``, None when nothing was started."""
+        path = self._path(target)
+        Path(self.config.profile_dir).mkdir(parents=True, exist_ok=True)
+        if self.config.profiler == "cprofile":
+            profile = cProfile.Profile()
+            profile.enable()
+            return target, path, profile
+
+        if not self._tf_trace.acquire(blocking=False):
+            return None
+        import tensorflow as tf
+        try:
+            tf.profiler.experimental.start(str(path))
+        except Exception as e:
+            self._tf_trace.release()
+            logger.warning(f"Could not start the TensorFlow profiler: {e}")
+            return None
+        return target, path, None
+
+    def stop(self, handle):
+        if handle is None:
+            return
+        target, path, profile = handle
+        if profile is not None:
+            profile.disable()
+            profile.dump_stats(path.with_suffix(".prof"))
+        else:
+            import tensorflow as tf
+            try:
+                tf.profiler.experimental.stop()
+            finally:
+                self._tf_trace.release()
+        PROFILES.inc(target=target)
+        self._prune()
+
+    @contextmanager
+    def profile(self, target: str):
+        handle = self.start(target)
+        try:
+            yield
+        finally:
+            self.stop(handle)
@@ -0,0 +1,114 @@
+import queue
+import threading
+import time
+from collections import Counter
+from concurrent.futures import Future
+import numpy as np
+from cnnClassifier import logger
+
+
+class MicroBatcher:
+    """Coalesces single-image requests into batched forward passes.
+
+    Requests are queued and a worker thread drains the queue into a batch of
+    at most ``max_batch_size`` items, waiting no longer than ``max_wait_ms``
+    after the first item arrived. Each caller gets its own row of the batched
+    result back through a Future.
+    """
+
+    def __init__(self, predict_fn, max_batch_size: int, max_wait_ms: float):
+        self.predict_fn = predict_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.
+
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._batch_sizes = Counter()
+        self._total_batches = 0
+        self._total_items = 0
+        self._max_queue_depth = 0
+
+        # Batches are stacked into one reused buffer, only touched by the worker thread
+        self._buffer = None
+
+        self._running = True
+        self._worker = threading.Thread(target=self._run, name="micro-batcher", daemon=True)
+        self._worker.start()
+
+    def submit(self, array: np.ndarray) -> Future:
+        if not self._running:
+            raise RuntimeError("MicroBatcher is closed")
+        future = Future()
+        self._queue.put((array, future))
+        depth = self._queue.qsize()
+        with self._lock:
+            self._max_queue_depth = max(self._max_queue_depth, depth)
+        return future
+
+    def predict(self, array: np.ndarray, timeout: float = None) -> np.ndarray:
+        return self.submit(array).result(timeout=timeout)
+
+    def _collect(self):
+        items = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(items) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                items.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return [item for item in items if item is not None]
+
+    def _stack(self, arrays) -> np.ndarray:
+        first = arrays[0]
+        if self._buffer is None or self._buffer.shape[1:] != first.shape or self._buffer.dtype != first.dtype:
+            self._buffer = np.empty((self.max_batch_size, *first.shape), dtype=first.dtype)
+        return np.stack(arrays, out=self._buffer[:len(arrays)])
+
+    def _run(self):
+        # Requests queued before close() are still served
+        while self._running or not self._queue.empty():
+            # Requests whose caller gave up (e.g. timed out) are dropped; the
+            # others are marked running so they can no longer be cancelled
+            items = [item for item in self._collect() if item[1].set_running_or_notify_cancel()]
+            if not items:
+                continue
+
+            arrays, futures = zip(*items)
+            try:
+                outputs = self.predict_fn(self._stack(arrays))
+            except Exception as e:
+                logger.exception(e)
+                for future in futures:
+                    future.set_exception(e)
+                continue
+
+            for future, output in zip(futures, outputs):
+                future.set_result(output)
+
+            with self._lock:
+                self._batch_sizes[len(items)] += 1
+                self._total_batches += 1
+                self._total_items += len(items)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "queue_depth": self._queue.qsize(),
+                "max_queue_depth": self._max_queue_depth,
+                "total_batches": self._total_batches,
+                "total_items": self._total_items,
+                "mean_batch_size": (self._total_items / self._total_batches
+                                    if self._total_batches else 0.),
+                "batch_size_histogram": dict(sorted(self._batch_sizes.items())),
+                "max_batch_size": self.max_batch_size,
+                "max_wait_ms": self.max_wait * 1000.
+            }
+
+    def close(self):
+        self._running = False
+        # Wake the worker up if it is blocked on an empty queue
+        self._queue.put(None)
+        self._worker.join()
@@ -0,0 +1,138 @@
+import os
+import random
+import time
+from pathlib import Path
+import numpy as np
+import tensorflow as tf
+from cnnClassifier import logger
+from cnnClassifier.entity.config_entity import ModelExportConfig
+from cnnClassifier.components.input_pipeline import InputPipeline
+from cnnClassifier.components.split_index import SplitIndex
+from cnnClassifier.components.inference_backend import load_backend
+from cnnClassifier.utils.common import save_json, load_json
+
+
+class ModelExport:
+    def __init__(self, config: ModelExportConfig):
+        self.config = config
+        self.input_pipeline = InputPipeline(
+            data_dir=self.config.training_data,
+            image_size=self.config.params_image_size,
+            batch_size=self.config.params_batch_size,
+            preprocessing=self.config.params_preprocessing,
+            split_index=SplitIndex.load(self.config.split_index_file, self.config.training_data)
+        )
+        self.artifacts = {"keras": Path(self.config.path_of_model)}
+
+    def _representative_dataset(self):
+        # Calibration samples are drawn from the training subset only
+        paths, _ = self.input_pipeline.list_files("training")
+        sample = random.Random(42).sample(paths, min(len(paths), self.config.params_representative_samples))
+        for batch in self.input_pipeline.images(sample).unbatch().batch(1):
+            yield [batch]
+
+    def export_saved_model(self):
+        model = tf.keras.models.load_model(self.config.path_of_model)
+        model.export(str(self.config.saved_model_dir), verbose=False)
+        logger.info(f"SavedModel exported to: {self.config.saved_model_dir}")
+
+    def _convert_tflite(self, quantization: str) -> bytes:
+        converter = tf.lite.TFLiteConverter.from_saved_model(str(self.config.saved_model_dir))
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+        if quantization == "float16":
+            converter.target_spec.supported_types = [tf.float16]
+        elif quantization == "int8":
+            converter.representative_dataset = self._representative_dataset
+            converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+        elif quantization != "dynamic_range":
+            raise ValueError(f"Unknown quantization: {quantization}")
+        return converter.convert()
+
+    def _export_onnx(self, path: Path):
+        try:
+            import tf2onnx
+        except ImportError:
+            logger.warning("tf2onnx is not installed, skipping the ONNX export")
+            return None
+
+        model = tf.keras.models.load_model(self.config.path_of_model)
+        input_signature = [tf.TensorSpec([None, *self.config.params_image_size], tf.float32, name="input")]
+        tf2onnx.convert.from_keras(model, input_signature=input_signature, output_path=str(path))
+        return path
+
+    def export(self):
+        self.export_saved_model()
+        for variant in self.config.params_variants:
+            if variant == "onnx":
+                path = self._export_onnx(Path(self.config.root_dir) / "model.onnx")
+                if path is not None:
+                    self.artifacts[variant] = path
+                continue
+
+            path = Path(self.config.root_dir) / f"model_{variant}.tflite"
+            with open(path, "wb") as f:
+                f.write(self._convert_tflite(variant))
+            self.artifacts[variant] = path
+            logger.info(f"{variant} TFLite model exported to: {path}")
+
+    def _latency_ms(self, backend) -> float:
+        sample = np.zeros((1, *self.config.params_image_size), dtype=np.float32)
+        backend.predict_batch(sample)
+        timings = []
+        for _ in range(self.config.params_benchmark_runs):
+            start = time.perf_counter()
+            backend.predict_batch(sample)
+            timings.append((time.perf_counter() - start) * 1000.)
+        return float(np.median(timings))
+
+    def _accuracy(self, backend, validation) -> float:
+        correct = 0
+        for images, labels in validation:
+            predictions = backend.predict_batch(images)
+            correct += int(np.sum(np.argmax(predictions, axis=1) == labels))
+        return correct / max(sum(len(labels) for _, labels in validation), 1)
+
+    def benchmark(self):
+        """Records size, single-image latency and accuracy delta against scores.json."""
+        paths, labels = self.input_pipeline.list_files("validation")
+        labels = np.asarray(labels)
+        # Decode the validation set once and reuse it for every variant
+        validation, start = [], 0
+        for images in self.input_pipeline.images(paths):
+            images = images.numpy()
+            validation.append((images, labels[start:start + len(images)]))
+            start += len(images)
+
+        baseline_accuracy = None
+        if os.path.exists(self.config.scores_file):
+            baseline_accuracy = load_json(Path(self.config.scores_file)).accuracy
+
+        variants = {}
+        for variant, path in self.artifacts.items():
+            backend = load_backend(path, num_threads=self.config.params_num_threads)
+            accuracy = self._accuracy(backend, validation)
+            variants[variant] = {
+                "path": str(path),
+                "size_bytes": os.path.getsize(path),
+                "latency_ms_p50": self._latency_ms(backend),
+                "accuracy": accuracy,
+                "accuracy_delta": (accuracy - baseline_accuracy
+                                   if baseline_accuracy is not None else None)
+            }
+            logger.info(f"{variant}: {variants[variant]}")
+
+        # The fastest variant whose accuracy stays within the budget of the baseline
+        reference = baseline_accuracy if baseline_accuracy is not None else variants["keras"]["accuracy"]
+        eligible = [
+            variant for variant, report in variants.items()
+            if reference - report["accuracy"] <= self.config.params_accuracy_budget
+        ]
+        selected = min(eligible or ["keras"], key=lambda variant: variants[variant]["latency_ms_p50"])
+
+        self.report = {
+            "baseline_accuracy": baseline_accuracy,
+            "accuracy_budget": self.config.params_accuracy_budget,
+            "selected": selected,
+            "variants": variants
+        }
+        save_json(path=Path(self.config.report_file), data=self.report)
@@ -0,0 +1,164 @@
+import hashlib
+import json
+import os
+import shutil
+import stat
+import threading
+import time
+from pathlib import Path
+from cnnClassifier import logger
+from cnnClassifier.entity.config_entity import ModelRegistryConfig
+
+
+METADATA_FILE = "metadata.json"
+SERVING_FILE = "serving.json"
+
+
+class ModelRegistry:
+    """Local registry of immutable, numbered model versions.
+
+    Every version is a ``vNNNN`` folder holding a read-only copy of the model
+    and its metadata (source, sha256, scores.json, image size and
+    preprocessing). ``serving.json`` names the version to serve and the one
+    served before it, which is what a rollback goes back to. Both files are
+    replaced atomically, so a server polling the registry never reads a
+    half-written version.
+    """
+
+    def __init__(self, config: ModelRegistryConfig):
+        self.config = config
+        self.root_dir = Path(self.config.root_dir)
+        self.root_dir.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _sha256(path: Path) -> str:
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    @staticmethod
+    def _write_json(path: Path, data: dict):
+        tmp_path = path.with_name(path.name + ".tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(data, f, indent=4)
+        os.replace(tmp_path, path)
+
+    def _version_dir(self, version: str) -> Path:
+        return self.root_dir / version
+
+    def versions(self) -> list:
+        """Metadata of every version, oldest first."""
+        versions = []
+        for version_dir in sorted(self.root_dir.glob("v[0-9][0-9][0-9][0-9]")):
+            metadata_file = version_dir / METADATA_FILE
+            if metadata_file.exists():
+                with open(metadata_file) as f:
+                    versions.append(json.load(f))
+        return versions
+
+    def get(self, version: str) -> dict:
+        metadata_file = self._version_dir(version) / METADATA_FILE
+        if not version.isalnum() or not metadata_file.exists():
+            raise KeyError(version)
+        with open(metadata_file) as f:
+            return json.load(f)
+
+    def model_path(self, version: str) -> Path:
+        return self._version_dir(version) / self.get(version)["model_file"]
+
+    def serving(self) -> dict:
+        serving_file = self.root_dir / SERVING_FILE
+        if not serving_file.exists():
+            return {"current": None, "previous": None, "updated": None}
+        with open(serving_file) as f:
+            return json.load(f)
+
+    def register(self, model_path: Path, scores_file: Path = None, source: str = None) -> dict:
+        """Adds ``model_path`` as a new version, or returns the version already holding it."""
+        model_path = Path(model_path)
+        sha256 = self._sha256(model_path)
+        with self._lock:
+            versions = self.versions()
+            for metadata in versions:
+                if metadata["sha256"] == sha256:
+                    logger.info(f"{model_path} is already registered as {metadata['version']}")
+                    return metadata
+
+            number = int(versions[-1]["version"][1:]) + 1 if versions else 1
+            version = f"v{number:04d}"
+            scores = None
+            if scores_file is not None and Path(scores_file).exists():
+                with open(scores_file) as f:
+                    scores = json.load(f)
+
+            metadata = {
+                "version": version,
+                "created": time.strftime("%Y-%m-%d %H:%M:%S"),
+                "source": source or str(model_path),
+                "model_file": f"model{model_path.suffix}",
+                "sha256": sha256,
+                "size_bytes": model_path.stat().st_size,
+                "scores": scores,
+                "image_size": list(self.config.params_image_size),
+                "preprocessing": self.config.params_preprocessing
+            }
+
+            # The version only becomes visible once it is complete
+            tmp_dir = self.root_dir / f".{version}.tmp"
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            tmp_dir.mkdir()
+            shutil.copy2(model_path, tmp_dir / metadata["model_file"])
+            self._write_json(tmp_dir / METADATA_FILE, metadata)
+            for path in tmp_dir.iterdir():
+                path.chmod(stat.S_IRUSR | stat.S_IRGRP | stat.S_IROTH)
+            os.replace(tmp_dir, self._version_dir(version))
+
+        logger.info(f"Registered {model_path} as model version {version}")
+        return metadata
+
+    def promote(self, version: str) -> dict:
+        """Makes ``version`` the served version, keeping the current one for rollback."""
+        self.get(version)
+        with self._lock:
+            serving = self.serving()
+            if serving["current"] == version:
+                return serving
+            serving = {
+                "current": version,
+                "previous": serving["current"],
+                "updated": time.strftime("%Y-%m-%d %H:%M:%S")
+            }
+            self._write_json(self.root_dir / SERVING_FILE, serving)
+        logger.info(f"Model version {version} promoted (previous: {serving['previous']})")
+        return serving
+
+    def rollback(self) -> dict:
+        """Serves the previous version again; rolling back twice undoes the rollback."""
+        with self._lock:
+            serving = self.serving()
+            if serving["previous"] is None:
+                raise ValueError("There is no previous model version to roll back to")
+            serving = {
+                "current": serving["previous"],
+                "previous": serving["current"],
+                "updated": time.strftime("%Y-%m-%d %H:%M:%S")
+            }
+            self._write_json(self.root_dir / SERVING_FILE, serving)
+        logger.info(f"Model rolled back to version {serving['current']}")
+        return serving
+
+    def prune(self):
+        """Deletes the oldest versions beyond ``keep_versions``, never the served or previous one."""
+        serving = self.serving()
+        keep = {serving["current"], serving["previous"]}
+        versions = [metadata["version"] for metadata in self.versions()]
+        for version in versions[:max(len(versions) - self.config.keep_versions, 0)]:
+            if version not in keep:
+                version_dir = self._version_dir(version)
+                for path in version_dir.iterdir():
+                    path.chmod(stat.S_IRUSR | stat.S_IWUSR)
+                shutil.rmtree(version_dir)
+                logger.info(f"Pruned model version {version}")
@@ -0,0 +1,148 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from cnnClassifier.entity.config_entity import PredictionCacheConfig
+
+
+class PredictionCache:
+    """LRU + TTL cache of prediction results keyed by image content and model.
+
+    Keys combine a blake2b hash of the uploaded image bytes with the tag of
+    the model that produced the result, so a hot-swapped model never serves
+    results of the previous one. The in-memory LRU holds at most
+    ``max_entries`` results; with ``sqlite_path`` results are also written to
+    a SQLite file shared by all server processes, which is consulted on a
+    memory miss.
+    """
+
+    # Expired and surplus rows of the SQLite store are pruned every this many writes
+    PRUNE_EVERY = 256
+
+    def __init__(self, config: PredictionCacheConfig):
+        self.config = config
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._writes = 0
+        self.counters = {"hits": 0, "disk_hits": 0, "misses": 0, "evictions": 0, "expired": 0, "invalidations": 0}
+
+        if self.shared:
+            Path(self.config.sqlite_path).parent.mkdir(parents=True, exist_ok=True)
+            with self._connection() as connection:
+                connection.execute(
+                    "CREATE TABLE IF NOT EXISTS predictions (key TEXT PRIMARY KEY, value TEXT, expires REAL)"
+                )
+
+    def _connection(self) -> sqlite3.Connection:
+        # sqlite3 connections must not be shared between threads
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.config.sqlite_path, timeout=5)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+        return connection
+
+    @staticmethod
+    def key(image_bytes: bytes, model_tag: str) -> str:
+        return f"{model_tag}:{hashlib.blake2b(image_bytes, digest_size=16).hexdigest()}"
+
+    def _count(self, counter: str):
+        with self._lock:
+            self.counters[counter] += 1
+
+    def _remember(self, key: str, value, expires: float):
+        with self._lock:
+            self._entries[key] = (value, expires)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.config.max_entries:
+                self._entries.popitem(last=False)
+                self.counters["evictions"] += 1
+
+    @property
+    def shared(self) -> bool:
+        return self.config.sqlite_path is not None
+
+    def get(self, key: str):
+        """Cached result of ``key``, or None."""
+        value = self.get_memory(key)
+        if value is None and self.shared:
+            value = self.get_shared(key)
+        return value
+
+    def get_memory(self, key: str):
+        """Result of ``key`` in the in-memory LRU, or None; never blocks, e.g. on an event loop.
+
+        On a miss with a shared store, ``get_shared`` is to be consulted next.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[1] > time.time():
+                    self._entries.move_to_end(key)
+                    self.counters["hits"] += 1
+                    return entry[0]
+                del self._entries[key]
+                self.counters["expired"] += 1
+            if not self.shared:
+                self.counters["misses"] += 1
+        return None
+
+    def get_shared(self, key: str):
+        """Result of ``key`` in the SQLite store shared by the server processes, or None."""
+        row = self._connection().execute(
+            "SELECT value, expires FROM predictions WHERE key = ? AND expires > ?", (key, time.time())
+        ).fetchone()
+        if row is None:
+            self._count("misses")
+            return None
+        value = json.loads(row[0])
+        self._remember(key, value, row[1])
+        self._count("disk_hits")
+        return value
+
+    def put(self, key: str, value):
+        expires = time.time() + self.config.ttl_s
+        self._remember(key, value, expires)
+        if not self.shared:
+            return
+
+        connection = self._connection()
+        with connection:
+            connection.execute(
+                "INSERT OR REPLACE INTO predictions (key, value, expires) VALUES (?, ?, ?)",
+                (key, json.dumps(value), expires)
+            )
+        with self._lock:
+            self._writes += 1
+            prune = self._writes % self.PRUNE_EVERY == 0
+        if prune:
+            with connection:
+                connection.execute("DELETE FROM predictions WHERE expires <= ?", (time.time(),))
+                connection.execute(
+                    "DELETE FROM predictions WHERE key IN (SELECT key FROM predictions "
+                    "ORDER BY expires DESC LIMIT -1 OFFSET ?)", (self.config.max_entries,)
+                )
+
+    def invalidate(self):
+        """Drops the in-memory entries, e.g. after a model swap; their keys can no longer match."""
+        with self._lock:
+            self._entries.clear()
+            self.counters["invalidations"] += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.counters["hits"] + self.counters["disk_hits"] + self.counters["misses"]
+            return {
+                "enabled": True,
+                **self.counters,
+                "hit_rate": (self.counters["hits"] + self.counters["disk_hits"]) / lookups if lookups else 0.,
+                "entries": len(self._entries),
+                "max_entries": self.config.max_entries,
+                "ttl_s": self.config.ttl_s,
+                "shared": self.shared
+            }
@@ -2,28 +2,103 @@ import os
 import urllib.request as request
 from zipfile import ZipFile
 import tensorflow as tf
+from cnnClassifier import logger
 from cnnClassifier.entity.config_entity import PrepareBaseModelConfig
+from cnnClassifier.utils.common import get_size
+from cnnClassifier.components.distribution import get_strategy
 from pathlib import Path
 
 class PrepareBaseModel:
+    # Backbones selectable through BACKBONE in params.yaml
+    BACKBONES = {
+        "VGG16": tf.keras.applications.VGG16,
+        "MobileNetV2": tf.keras.applications.MobileNetV2,
+        "MobileNetV3Small": tf.keras.applications.MobileNetV3Small,
+        "MobileNetV3Large": tf.keras.applications.MobileNetV3Large,
+        "EfficientNetB0": tf.keras.applications.EfficientNetB0
+    }
+
+    # Head architectures: the layer that reduces the backbone feature map to a vector
+    HEADS = {
+        "flatten": tf.keras.layers.Flatten,
+        "global_average": tf.keras.layers.GlobalAveragePooling2D,
+        "global_max": tf.keras.layers.GlobalMaxPooling2D
+    }
+
     def __init__(self, config: PrepareBaseModelConfig):
         self.config = config
+        self.strategy = get_strategy(
+            self.config.params_distribution_strategy,
+            self.config.params_num_cpu_replicas
+        )
 
 
     
     def get_base_model(self):
-        self.model = tf.keras.applications.vgg16.VGG16(
-            input_shape=self.config.params_image_size,
-            weights=self.config.params_weights,
-            include_top=self.config.params_include_top
+        if self.config.params_backbone not in self.BACKBONES:
+            raise ValueError(
+                f"Unknown backbone: {self.config.params_backbone}, expected one of {list(self.BACKBONES)}"
+            )
+
+        with self.strategy.scope():
+            self.model = self.BACKBONES[self.config.params_backbone](
+                input_shape=self.config.params_image_size,
+                weights=self.config.params_weights,
+                include_top=self.config.params_include_top
+            )
+
+        logger.info(
+            f"{self.config.params_backbone} backbone: {self.model.count_params()} parameters, "
+            f"{self.count_flops(self.model) / 1e9:.2f} GFLOPs per image"
         )
 
         self.save_model(path=self.config.base_model_path, model=self.model)
 
+    @staticmethod
+    def count_flops(model: tf.keras.Model) -> int:
+        """Floating point operations of one forward pass on a single image."""
+        from tensorflow.python.framework.convert_to_constants import convert_variables_to_constants_v2
+
+        forward = tf.function(model).get_concrete_function(
+            tf.TensorSpec([1, *model.input_shape[1:]], tf.float32)
+        )
+        graph = convert_variables_to_constants_v2(forward).graph
+        options = tf.compat.v1.profiler.ProfileOptionBuilder(
+            tf.compat.v1.profiler.ProfileOptionBuilder.float_operation()
+        ).with_empty_output().build()
+        profile = tf.compat.v1.profiler.profile(
+            graph=graph,
+            run_meta=tf.compat.v1.RunMetadata(),
+            cmd="op",
+            options=options
+        )
+        return profile.total_float_ops
+
 
     
     @staticmethod
-    def _prepare_full_model(model, classes, freeze_all, freeze_till, learning_rate):
+    def _build_head(features, classes, head_type, hidden_units, dropout):
+        if head_type not in PrepareBaseModel.HEADS:
+            raise ValueError(
+                f"Unknown head type: {head_type}, expected one of {list(PrepareBaseModel.HEADS)}"
+            )
+
+        x = PrepareBaseModel.HEADS[head_type]()(features)
+        for units in hidden_units:
+            if dropout:
+                x = tf.keras.layers.Dropout(dropout)(x)
+            x = tf.keras.layers.Dense(units=units, activation="relu")(x)
+        if dropout:
+            x = tf.keras.layers.Dropout(dropout)(x)
+
+        return tf.keras.layers.Dense(
+            units=classes,
+            activation="softmax"
+        )(x)
+
+    @staticmethod
+    def _prepare_full_model(model, classes, freeze_all, freeze_till, learning_rate,
+                            head_type="flatten", hidden_units=(), dropout=0.):
         if freeze_all:
             for layer in model.layers:
                 model.trainable = False
@@ -31,11 +106,13 @@ class PrepareBaseModel:
             for layer in model.layers[:-freeze_till]:
                 model.trainable = False
 
-        flatten_in = tf.keras.layers.Flatten()(model.output)
-        prediction = tf.keras.layers.Dense(
-            units=classes,
-            activation="softmax"
-        )(flatten_in)
+        prediction = PrepareBaseModel._build_head(
+            features=model.output,
+            classes=classes,
+            head_type=head_type,
+            hidden_units=hidden_units,
+            dropout=dropout
+        )
 
         full_model = tf.keras.models.Model(
             inputs=model.input,
@@ -53,16 +130,27 @@ class PrepareBaseModel:
     
 
     def update_base_model(self):
-        self.full_model = self._prepare_full_model(
-            model=self.model,
-            classes=self.config.params_classes,
-            freeze_all=True,
-            freeze_till=None,
-            learning_rate=self.config.params_learning_rate
-        )
+        with self.strategy.scope():
+            self.full_model = self._prepare_full_model(
+                model=self.model,
+                classes=self.config.params_classes,
+                freeze_all=True,
+                freeze_till=None,
+                learning_rate=self.config.params_learning_rate,
+                head_type=self.config.params_head_type,
+                hidden_units=self.config.params_head_hidden_units,
+                dropout=self.config.params_head_dropout
+            )
 
         self.save_model(path=self.config.updated_base_model_path, model=self.full_model)
 
+        head_params = self.full_model.count_params() - self.model.count_params()
+        logger.info(
+            f"{self.config.params_head_type} head: {head_params} parameters, "
+            f"full model: {self.full_model.count_params()} parameters, "
+            f"saved size: {get_size(Path(self.config.updated_base_model_path))}"
+        )
+
     
     @staticmethod
     def save_model(path: Path, model: tf.keras.Model):
@@ -1,9 +1,13 @@
 import os
+import json
 import urllib.request as request
 from zipfile import ZipFile
 import tensorflow as tf
 import time
+from cnnClassifier import logger
 from cnnClassifier.entity.config_entity import PrepareCallbacksConfig
+from cnnClassifier.components.instrumentation import SampledProfiler, TRAINING_STEP_DURATION, TRAINING_IMAGES
+from cnnClassifier.components.training_checkpoint import TrainingCheckpoints
 
 
 class PrepareCallback:
@@ -26,8 +30,136 @@ class PrepareCallback:
             save_best_only=True
         )
 
+    @property
+    def _create_progress_callback(self):
+        return ProgressCallback(progress_file=self.config.progress_file)
+
     def get_tb_ckpt_callbacks(self):
         return [
             self._create_tb_callback,
-            self._create_ckpt_callback
+            self._create_ckpt_callback,
+            self._create_progress_callback
         ]
+
+
+class PerformanceCallback(tf.keras.callbacks.Callback):
+    """Records per-epoch wall time, mean step time and training throughput."""
+
+    def __init__(self, batch_size: int, steps_per_epoch: int = None):
+        super().__init__()
+        self.batch_size = batch_size
+        self.steps_per_epoch = steps_per_epoch
+        self.epochs = []
+
+    def on_epoch_begin(self, epoch, logs=None):
+        self._epoch_start = time.perf_counter()
+        self._steps = 0
+
+    def on_train_batch_end(self, batch, logs=None):
+        # With steps_per_execution > 1 this is only called once per execution,
+        # so the step count is taken from the batch index instead of the calls
+        self._steps = batch + 1
+
+    def on_epoch_end(self, epoch, logs=None):
+        epoch_time = time.perf_counter() - self._epoch_start
+        steps = self.steps_per_epoch or self._steps
+        self.epochs.append({
+            "epoch": epoch + 1,
+            "epoch_time_s": epoch_time,
+            "step_time_ms": epoch_time / max(steps, 1) * 1000.,
+            "images_per_sec": steps * self.batch_size / epoch_time
+        })
+
+    def summary(self) -> dict:
+        if not self.epochs:
+            return {"epochs": []}
+        # The first epoch includes tracing and XLA compilation
+        steady = self.epochs[1:] or self.epochs
+        return {
+            "epochs": self.epochs,
+            "steady_state_step_time_ms": sum(e["step_time_ms"] for e in steady) / len(steady),
+            "steady_state_images_per_sec": sum(e["images_per_sec"] for e in steady) / len(steady)
+        }
+
+
+class ProgressCallback(tf.keras.callbacks.Callback):
+    """Writes the epoch reached and the latest metrics to a JSON file.
+
+    The file is replaced atomically after every epoch, so a process polling it
+    (e.g. the training job manager behind /train) always reads a complete record.
+    """
+
+    def __init__(self, progress_file: str):
+        super().__init__()
+        self.progress_file = progress_file
+        # Epochs a resumed run trained before it was interrupted
+        self.initial_history = []
+        self.history = []
+
+    def _write(self, data: dict):
+        os.makedirs(os.path.dirname(self.progress_file) or ".", exist_ok=True)
+        tmp_file = f"{self.progress_file}.tmp"
+        with open(tmp_file, "w") as f:
+            json.dump({**data, "updated": time.strftime("%Y-%m-%d %H:%M:%S")}, f)
+        os.replace(tmp_file, self.progress_file)
+
+    def on_train_begin(self, logs=None):
+        self.history = list(self.initial_history)
+        epoch = self.history[-1]["epoch"] if self.history else 0
+        self._write({"epoch": epoch, "epochs": self.params.get("epochs"), "history": self.history})
+
+    def on_epoch_end(self, epoch, logs=None):
+        self.history.append({"epoch": epoch + 1, **{k: float(v) for k, v in (logs or {}).items()}})
+        self._write({"epoch": epoch + 1, "epochs": self.params.get("epochs"), "history": self.history})
+
+
+class BackupCallback(tf.keras.callbacks.Callback):
+    """Backs up the model and optimizer every ``every_n_epochs`` epochs and after the last one.
+
+    ``history`` holds the metrics of the epochs a resumed run already
+    trained, ``state`` is stored along, e.g. the shuffle seed of the input.
+    """
+
+    def __init__(self, checkpoints: TrainingCheckpoints, every_n_epochs: int = 1, history: list = None,
+                 state: dict = None):
+        super().__init__()
+        self.checkpoints = checkpoints
+        self.every_n_epochs = max(every_n_epochs, 1)
+        self.history = list(history or [])
+        self.state = state or {}
+
+    def on_epoch_end(self, epoch, logs=None):
+        self.history.append({"epoch": epoch + 1, **{k: float(v) for k, v in (logs or {}).items()}})
+        if (epoch + 1) % self.every_n_epochs == 0 or epoch + 1 == self.params.get("epochs"):
+            path = self.checkpoints.save(self.model, epoch + 1, {**self.state, "history": self.history})
+            logger.info(f"Training backed up after epoch {epoch + 1} to: {path}")
+
+
+class InstrumentationCallback(tf.keras.callbacks.Callback):
+    """Feeds training step times to the metrics and profiles sampled steps.
+
+    Step times are taken between consecutive steps, so they include waiting
+    for input; validation at the end of an epoch is left out.
+    """
+
+    def __init__(self, batch_size: int, profiler: SampledProfiler = None):
+        super().__init__()
+        self.batch_size = batch_size
+        self.profiler = profiler
+        self._profile = None
+
+    def on_epoch_begin(self, epoch, logs=None):
+        self._last = time.perf_counter()
+
+    def on_train_batch_begin(self, batch, logs=None):
+        if self.profiler is not None and self.profiler.sample():
+            self._profile = self.profiler.start("training_step")
+
+    def on_train_batch_end(self, batch, logs=None):
+        if self._profile is not None:
+            self.profiler.stop(self._profile)
+            self._profile = None
+        now = time.perf_counter()
+        TRAINING_STEP_DURATION.observe(now - self._last)
+        TRAINING_IMAGES.inc(self.batch_size)
+        self._last = now
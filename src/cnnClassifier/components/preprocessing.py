@@ -0,0 +1,116 @@
+import io
+import numpy as np
+from PIL import Image
+
+
+def _rescale(x):
+    return x / 255.
+
+
+def _mobilenet_v2(x):
+    return x / 127.5 - 1.
+
+
+def _identity(x):
+    return x
+
+
+def _vgg16(x):
+    # TensorFlow is only imported when a model actually needs it, which keeps serving imports fast
+    import tensorflow as tf
+    return tf.keras.applications.vgg16.preprocess_input(x)
+
+
+# Per-backbone input preprocessing, applied to float RGB images in [0, 255].
+# The functions work on NumPy arrays and tf tensors alike.
+PREPROCESSING_FUNCTIONS = {
+    "rescale": _rescale,
+    "vgg16": _vgg16,
+    "mobilenet_v2": _mobilenet_v2,
+    # MobileNetV3 and EfficientNet models carry their own preprocessing layers
+    "none": _identity
+}
+
+
+def get_preprocessing_function(name: str):
+    if name not in PREPROCESSING_FUNCTIONS:
+        raise ValueError(
+            f"Unknown preprocessing: {name}, expected one of {list(PREPROCESSING_FUNCTIONS)}"
+        )
+    return PREPROCESSING_FUNCTIONS[name]
+
+
+# libjpeg's accurate integer IDCT, which PIL uses as well (serving and the legacy
+# ImageDataGenerator); tf's default fast IDCT is about one gray level off.
+# Caches of decoded images include it in their fingerprints.
+JPEG_DCT_METHOD = "INTEGER_ACCURATE"
+
+# JPEGs are decoded at the smallest DCT scale (1/2, 1/4 or 1/8) that keeps at
+# least this many source pixels per output pixel, which leaves the bilinear
+# resize enough input to stay close to the full-resolution result
+DRAFT_OVERSAMPLE = 2
+
+
+def decode_and_resize(contents: "tf.Tensor", image_size: list) -> "tf.Tensor":
+    """Training-time decoding: full-resolution decode and antialiased bilinear resize.
+
+    Returns a float32 tensor in [0, 255]. InputPipeline uses it for every
+    image, so it is the reference the serving path is checked against.
+    """
+    import tensorflow as tf
+
+    image = tf.cond(
+        tf.io.is_jpeg(contents),
+        lambda: tf.io.decode_jpeg(contents, channels=3, dct_method=JPEG_DCT_METHOD),
+        lambda: tf.io.decode_image(contents, channels=3, expand_animations=False)
+    )
+    return tf.image.resize(image, image_size[:2], method="bilinear", antialias=True)
+
+
+def decode_image(image_bytes: bytes, image_size: list, draft: bool = True, out: np.ndarray = None) -> np.ndarray:
+    """Decodes an encoded image to a uint8 RGB array of ``image_size``.
+
+    With ``draft``, JPEGs are downscaled by libjpeg while decoding, so a phone
+    photo is never decoded at full resolution. The result is written to
+    ``out`` when given, e.g. a row of a preallocated batch.
+    """
+    height, width = image_size[:2]
+    with Image.open(io.BytesIO(image_bytes)) as img:
+        if draft and img.format == "JPEG":
+            img.draft("RGB", (width * DRAFT_OVERSAMPLE, height * DRAFT_OVERSAMPLE))
+        img = img.convert("RGB")
+        if img.size != (width, height):
+            # Pillow's bilinear filter widens with the scale factor, i.e. it is antialiased like tf.image.resize
+            img = img.resize((width, height), Image.BILINEAR)
+        array = np.asarray(img)
+    if out is None:
+        return array
+    out[...] = array
+    return out
+
+
+def to_model_input(images: np.ndarray, preprocessing: str = "rescale") -> np.ndarray:
+    """uint8 images (one or a batch) to the float32 input of the backbone."""
+    return get_preprocessing_function(preprocessing)(images.astype(np.float32))
+
+
+def load_image(image_bytes: bytes, image_size: list, preprocessing: str = "rescale", draft: bool = False) -> np.ndarray:
+    """Decodes an encoded image and prepares it like the training pipeline does.
+
+    Args:
+        image_bytes (bytes): Encoded image (JPEG, PNG, ...).
+        image_size (list): Model input size as [height, width, channels].
+        preprocessing (str): Name of the backbone preprocessing function.
+        draft (bool): Decode JPEGs at a reduced size, see decode_image.
+
+    Returns:
+        np.ndarray: float32 array of shape (height, width, 3).
+    """
+    return to_model_input(decode_image(image_bytes, image_size, draft=draft), preprocessing)
+
+
+def image_data_generator_kwargs(preprocessing: str) -> dict:
+    """Preprocessing arguments for the legacy ImageDataGenerator."""
+    if preprocessing == "rescale":
+        return dict(rescale=1./255)
+    return dict(preprocessing_function=get_preprocessing_function(preprocessing))
@@ -0,0 +1,152 @@
+import hashlib
+import json
+import os
+from pathlib import Path
+import pandas as pd
+from cnnClassifier import logger
+from cnnClassifier.entity.config_entity import SplitIndexConfig
+from cnnClassifier.components.input_pipeline import IMAGE_EXTENSIONS
+
+
+class SplitIndex:
+    """Train/validation assignment of every image, shared by all stages.
+
+    Within each class the files are ordered by a seeded hash of their name
+    and the first ``validation_split`` of them form the validation subset, so
+    the split is stratified and reproducible. When the dataset changes, files
+    keep their subset and only new files are drawn into validation to top it
+    up, so images a model was validated on never move into training. The
+    index is stored as compact JSON together with a
+    fingerprint of the directory mtimes, which lets a stage tell whether the
+    data changed without listing every file.
+    """
+
+    def __init__(self, data_dir: Path, class_names: list, files: dict, validation: dict,
+                 validation_split: float, seed: int, fingerprint: str):
+        self.data_dir = Path(data_dir)
+        self.class_names = class_names
+        self.class_indices = {name: i for i, name in enumerate(class_names)}
+        # Per class: sorted file names relative to the class folder, and the
+        # positions of the validation files in that list
+        self.files = files
+        self.validation = {name: set(indices) for name, indices in validation.items()}
+        self.validation_split = validation_split
+        self.seed = seed
+        self.fingerprint = fingerprint
+
+    @staticmethod
+    def directory_fingerprint(data_dir: Path) -> str:
+        # Adding, removing or renaming a file updates the mtime of its folder
+        digest = hashlib.sha1()
+        for root, dirs, _ in os.walk(data_dir):
+            dirs.sort()
+            digest.update(f"{os.path.relpath(root, data_dir)}\0{os.stat(root).st_mtime_ns}\n".encode())
+        return digest.hexdigest()
+
+    @classmethod
+    def build(cls, data_dir: Path, validation_split: float, seed: int,
+              previous: "SplitIndex" = None) -> "SplitIndex":
+        """Splits the files of ``data_dir``, keeping the assignment of the files already in ``previous``."""
+        data_dir = Path(data_dir)
+        fingerprint = cls.directory_fingerprint(data_dir)
+        class_names = sorted(entry.name for entry in os.scandir(data_dir) if entry.is_dir())
+
+        files, validation = {}, {}
+        for class_name in class_names:
+            class_dir = data_dir / class_name
+            names = sorted(
+                os.path.relpath(os.path.join(root, filename), class_dir).replace(os.sep, "/")
+                for root, _, filenames in os.walk(class_dir)
+                for filename in filenames
+                if filename.lower().endswith(IMAGE_EXTENSIONS)
+            )
+            known = {}
+            if previous is not None and class_name in previous.files:
+                previous_validation = previous.validation[class_name]
+                known = {name: i in previous_validation for i, name in enumerate(previous.files[class_name])}
+            kept = [i for i, name in enumerate(names) if known.get(name)]
+            order = sorted(
+                (i for i, name in enumerate(names) if name not in known),
+                key=lambda i: hashlib.sha1(f"{seed}:{class_name}/{names[i]}".encode()).digest()
+            )
+            files[class_name] = names
+            validation[class_name] = sorted(kept + order[:max(int(validation_split * len(names)) - len(kept), 0)])
+
+        logger.info(
+            f"Split index built: {sum(len(v) for v in validation.values())} validation and "
+            f"{sum(len(f) for f in files.values()) - sum(len(v) for v in validation.values())} training images"
+        )
+        return cls(data_dir, class_names, files, validation, validation_split, seed, fingerprint)
+
+    def save(self, path: Path):
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(path.name + ".tmp")
+        with open(tmp_path, "w") as f:
+            json.dump({
+                "fingerprint": self.fingerprint,
+                "seed": self.seed,
+                "validation_split": self.validation_split,
+                "class_names": self.class_names,
+                "files": self.files,
+                "validation": {name: sorted(indices) for name, indices in self.validation.items()}
+            }, f, separators=(",", ":"))
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: Path, data_dir: Path) -> "SplitIndex":
+        """Loads the index at ``path``, updating it with the same seed if the data changed."""
+        if not Path(path).exists():
+            raise FileNotFoundError(f"Split index not found at {path}, run the data ingestion stage first")
+        with open(path) as f:
+            stored = json.load(f)
+
+        if stored["fingerprint"] != cls.directory_fingerprint(data_dir):
+            logger.info(f"{data_dir} changed since the split index was built, updating it")
+            previous = cls(
+                data_dir, stored["class_names"], stored["files"], stored["validation"],
+                stored["validation_split"], stored["seed"], stored["fingerprint"]
+            )
+            split_index = cls.build(data_dir, stored["validation_split"], stored["seed"], previous=previous)
+            split_index.save(path)
+            return split_index
+
+        return cls(
+            data_dir, stored["class_names"], stored["files"], stored["validation"],
+            stored["validation_split"], stored["seed"], stored["fingerprint"]
+        )
+
+    @classmethod
+    def from_config(cls, config: SplitIndexConfig) -> "SplitIndex":
+        """Loads the index of ``config``, building it when missing or when the split params changed."""
+        if Path(config.index_file).exists():
+            split_index = cls.load(config.index_file, config.training_data)
+            if (split_index.validation_split, split_index.seed) == (config.params_validation_split, config.params_seed):
+                return split_index
+
+        split_index = cls.build(config.training_data, config.params_validation_split, config.params_seed)
+        split_index.save(config.index_file)
+        return split_index
+
+    def relative_files(self, subset: str = None):
+        """Paths relative to the data directory and labels of ``subset``, grouped by class."""
+        paths, labels = [], []
+        for class_name in self.class_names:
+            validation = self.validation[class_name]
+            for i, name in enumerate(self.files[class_name]):
+                if subset is None or (i in validation) == (subset == "validation"):
+                    paths.append(f"{class_name}/{name}")
+                    labels.append(self.class_indices[class_name])
+        return paths, labels
+
+    def list_files(self, subset: str = None):
+        paths, labels = self.relative_files(subset)
+        return [str(self.data_dir / path) for path in paths], labels
+
+    def dataframe(self, subset: str = None):
+        """``subset`` as a DataFrame for ImageDataGenerator.flow_from_dataframe."""
+        paths, labels = self.list_files(subset)
+        return pd.DataFrame({
+            "filename": paths,
+            "class": [self.class_names[label] for label in labels]
+        })
@@ -0,0 +1,116 @@
+import numpy as np
+
+
+# Score histogram resolution of the ROC-AUC; ties within a bin count half
+AUC_BINS = 1000
+EPSILON = 1e-7
+
+
+class StreamingClassificationMetrics:
+    """Classification metrics accumulated batch by batch in constant memory.
+
+    Keeps a confusion matrix, per-class histograms of the predicted
+    probabilities of positive and negative samples, from which the one-vs-rest
+    ROC-AUC follows, and per-bin confidence and accuracy sums for the
+    calibration, instead of the predictions themselves.
+    """
+
+    def __init__(self, class_names: list, calibration_bins: int = 10):
+        self.class_names = list(class_names)
+        num_classes = len(self.class_names)
+        self.calibration_bins = calibration_bins
+        self.confusion = np.zeros((num_classes, num_classes), dtype=np.int64)
+        self.positive_scores = np.zeros((num_classes, AUC_BINS), dtype=np.int64)
+        self.negative_scores = np.zeros((num_classes, AUC_BINS), dtype=np.int64)
+        self.bin_counts = np.zeros(calibration_bins, dtype=np.int64)
+        self.bin_confidence = np.zeros(calibration_bins)
+        self.bin_correct = np.zeros(calibration_bins)
+        self.loss_sum = 0.
+        self.brier_sum = 0.
+        self.count = 0
+
+    def update(self, labels: np.ndarray, probabilities: np.ndarray):
+        """Adds a batch of one-hot (or class index) ``labels`` and predicted ``probabilities``."""
+        probabilities = np.asarray(probabilities, dtype=np.float64)
+        num_classes = len(self.class_names)
+        labels = np.asarray(labels)
+        if labels.ndim == 2:
+            labels = np.argmax(labels, axis=1)
+        one_hot = np.eye(num_classes)[labels]
+        predicted = np.argmax(probabilities, axis=1)
+
+        np.add.at(self.confusion, (labels, predicted), 1)
+        self.loss_sum -= float(np.sum(np.log(np.clip(probabilities[np.arange(len(labels)), labels], EPSILON, 1.))))
+        self.brier_sum += float(np.sum((probabilities - one_hot) ** 2))
+        self.count += len(labels)
+
+        score_bins = np.clip((probabilities * AUC_BINS).astype(np.int64), 0, AUC_BINS - 1)
+        for index in range(num_classes):
+            positive = labels == index
+            self.positive_scores[index] += np.bincount(score_bins[positive, index], minlength=AUC_BINS)
+            self.negative_scores[index] += np.bincount(score_bins[~positive, index], minlength=AUC_BINS)
+
+        confidence = probabilities[np.arange(len(labels)), predicted]
+        bins = np.clip((confidence * self.calibration_bins).astype(np.int64), 0, self.calibration_bins - 1)
+        self.bin_counts += np.bincount(bins, minlength=self.calibration_bins)
+        self.bin_confidence += np.bincount(bins, weights=confidence, minlength=self.calibration_bins)
+        self.bin_correct += np.bincount(bins, weights=predicted == labels, minlength=self.calibration_bins)
+
+    def _roc_auc(self, index: int):
+        positives, negatives = self.positive_scores[index], self.negative_scores[index]
+        if not positives.sum() or not negatives.sum():
+            return None
+        # Positives scored above each bin, from the highest bin down
+        positives_above = np.cumsum(positives[::-1])[::-1] - positives
+        wins = np.sum(negatives * (positives_above + positives / 2.))
+        return float(wins / (positives.sum() * negatives.sum()))
+
+    def result(self) -> dict:
+        count = max(self.count, 1)
+        true_positives = np.diag(self.confusion).astype(np.float64)
+        predicted_counts = self.confusion.sum(axis=0)
+        support = self.confusion.sum(axis=1)
+        precision = np.divide(true_positives, predicted_counts, out=np.zeros_like(true_positives),
+                              where=predicted_counts > 0)
+        recall = np.divide(true_positives, support, out=np.zeros_like(true_positives), where=support > 0)
+        f1 = np.divide(2 * precision * recall, precision + recall, out=np.zeros_like(true_positives),
+                       where=precision + recall > 0)
+
+        per_class = {
+            name: {
+                "precision": float(precision[index]),
+                "recall": float(recall[index]),
+                "f1": float(f1[index]),
+                "support": int(support[index]),
+                "roc_auc": self._roc_auc(index)
+            }
+            for index, name in enumerate(self.class_names)
+        }
+        aucs = [metrics["roc_auc"] for metrics in per_class.values() if metrics["roc_auc"] is not None]
+
+        calibration = [
+            {
+                "confidence": float(self.bin_confidence[index] / self.bin_counts[index]),
+                "accuracy": float(self.bin_correct[index] / self.bin_counts[index]),
+                "count": int(self.bin_counts[index])
+            }
+            for index in range(self.calibration_bins) if self.bin_counts[index]
+        ]
+        expected_calibration_error = sum(
+            bin_["count"] * abs(bin_["accuracy"] - bin_["confidence"]) for bin_ in calibration
+        ) / count
+
+        return {
+            "loss": self.loss_sum / count,
+            "accuracy": float(true_positives.sum() / count),
+            "macro_precision": float(precision.mean()),
+            "macro_recall": float(recall.mean()),
+            "macro_f1": float(f1.mean()),
+            "roc_auc": float(np.mean(aucs)) if aucs else None,
+            "expected_calibration_error": float(expected_calibration_error),
+            "brier_score": self.brier_sum / count,
+            "images": self.count,
+            "per_class": per_class,
+            "confusion_matrix": self.confusion.tolist(),
+            "calibration": calibration
+        }
@@ -0,0 +1,445 @@
+import copy
+import csv
+import hashlib
+import itertools
+import json
+import math
+import os
+import queue
+import random
+import statistics
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+import yaml
+from cnnClassifier import logger
+from cnnClassifier.entity.config_entity import SweepConfig
+from cnnClassifier.utils.common import path_fingerprint
+
+
+# Upstream stages whose outputs the trials share -> the config.yaml sections
+# pointing at them. Each is built once per distinct value of its dvc params;
+# the feature cache of a base model sits next to it, keyed by its weights.
+SHARED_STAGES = {
+    "dataset_packing": ["dataset_packing"],
+    "prepare_base_model": ["prepare_base_model", "feature_cache"]
+}
+# Read by every trial from the project's own artifacts
+PROJECT_SECTIONS = ["data_ingestion", "split_index"]
+# Trials that must have reached an epoch before the median rule compares against them
+MEDIAN_MIN_TRIALS = 2
+
+
+def get_param(params: dict, key: str):
+    for part in key.split("."):
+        params = params[part]
+    return params
+
+
+def set_param(params: dict, key: str, value):
+    *parents, name = key.split(".")
+    for part in parents:
+        params = params[part]
+    if name not in params:
+        raise KeyError(key)
+    params[name] = value
+
+
+def sample_trials(space: dict, search: str = "random", num_trials: int = None, seed: int = 0) -> list:
+    """Param overrides of the trials, one dict per trial.
+
+    A dimension is a list of values or a ``{min, max, log}`` range. The grid
+    search takes every combination of the lists, up to ``num_trials``; the
+    random search draws ``num_trials`` points, integer ranges giving integers.
+    """
+    if search == "grid":
+        ranges = [key for key, values in space.items() if isinstance(values, dict)]
+        if ranges:
+            raise ValueError(f"The grid search needs a list of values for {ranges}")
+        trials = [dict(zip(space, values)) for values in itertools.product(*space.values())]
+        return trials[:num_trials] if num_trials else trials
+    if search != "random":
+        raise ValueError(f"Unknown search: {search}, expected random or grid")
+
+    rng = random.Random(seed)
+
+    def draw(values):
+        if not isinstance(values, dict):
+            return copy.deepcopy(rng.choice(values))
+        low, high = values["min"], values["max"]
+        if values.get("log"):
+            value = math.exp(rng.uniform(math.log(low), math.log(high)))
+        else:
+            value = rng.uniform(low, high)
+        return round(value) if isinstance(low, int) and isinstance(high, int) else value
+
+    return [{key: draw(values) for key, values in space.items()} for _ in range(num_trials)]
+
+
+@dataclass
+class Trial:
+    trial_id: str
+    overrides: dict
+    params: dict
+    workspace: Path
+    shared: dict = field(default_factory=dict)
+    status: str = "pending"  # pending, running, completed, stopped or failed
+    history: list = field(default_factory=list)
+    accuracy: float = None
+    loss: float = None
+    training_time_s: float = 0.
+    latency_ms: float = None
+    error: str = None
+
+    @property
+    def max_epochs(self) -> int:
+        return self.params["EPOCHS"]
+
+    @property
+    def epochs(self) -> int:
+        return self.history[-1]["epoch"] if self.history else 0
+
+    def best_val_accuracy(self, until_epoch: int = None) -> float:
+        values = [
+            epoch["val_accuracy"] for epoch in self.history
+            if "val_accuracy" in epoch and (until_epoch is None or epoch["epoch"] <= until_epoch)
+        ]
+        return max(values) if values else float("-inf")
+
+
+class HyperparameterSweep:
+    """Trains and evaluates trials over a search space of params.yaml in parallel.
+
+    Every trial runs the training and evaluation stages in a workspace of its
+    own under ``root_dir/<name>``, as a subprocess pinned to its share of the
+    CPUs. The data ingestion output of the project is shared by all trials,
+    and prepared base models and packed datasets are built once per distinct
+    value of their dvc params under ``shared_dir``, where later sweeps reuse
+    them along with the bottleneck features cached for each base model. Early
+    stopping is either successive halving, whose rungs continue the promoted
+    trials from their training backups, or the median rule, which stops a
+    trial whose best validation accuracy falls below the median of the other
+    trials at the same epoch. The result is a leaderboard of accuracy against
+    training time and single-image inference latency.
+    """
+
+    def __init__(self, config: SweepConfig, name: str = None):
+        self.config = config
+        self.name = name or time.strftime("%Y%m%d-%H%M%S")
+        self.sweep_dir = Path(self.config.root_dir) / self.name
+        self.project_dir = Path.cwd()
+        self.all_config = self.config.all_config.to_dict()
+        self.all_params = self.config.all_params.to_dict()
+        with open(self.config.dvc_file) as f:
+            self.dvc_stages = yaml.safe_load(f)["stages"]
+
+        if self.config.early_stopping not in (None, "successive_halving", "median"):
+            raise ValueError(
+                f"Unknown early stopping: {self.config.early_stopping}, expected successive_halving, median or null"
+            )
+        if self.config.early_stopping == "successive_halving" and self.config.reduction_factor < 2:
+            raise ValueError("successive_halving needs a reduction_factor of at least 2")
+
+        cpus = sorted(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else list(range(os.cpu_count()))
+        threads = self.config.threads_per_trial or max(len(cpus) // self.config.max_parallel, 1)
+        # One CPU set per concurrent trial; they only overlap when there are more threads than CPUs
+        self._slots = queue.Queue()
+        for index in range(self.config.max_parallel):
+            start = index * threads % len(cpus)
+            self._slots.put([cpus[(start + i) % len(cpus)] for i in range(min(threads, len(cpus)))])
+        self.trials = []
+
+    # ------------------------------------------------------------------
+    # Workspaces
+
+    def _relocate(self, section: dict, root: Path) -> dict:
+        """``section`` with its artifact paths made absolute under ``root``."""
+        prefix = f"{self.all_config['artifacts_root']}/"
+        return {
+            key: str(root / value) if isinstance(value, str) and value.startswith(prefix) else value
+            for key, value in section.items()
+        }
+
+    def _workspace_config(self, shared: dict) -> dict:
+        config = copy.deepcopy(self.all_config)
+        for section in PROJECT_SECTIONS:
+            config[section] = self._relocate(config[section], self.project_dir)
+        for stage, path in shared.items():
+            for section in SHARED_STAGES[stage]:
+                config[section] = self._relocate(config[section], path)
+        return config
+
+    @staticmethod
+    def _write_workspace(workspace: Path, config: dict, params: dict):
+        (workspace / "config").mkdir(parents=True, exist_ok=True)
+        with open(workspace / "config" / "config.yaml", "w") as f:
+            yaml.safe_dump(config, f, sort_keys=False)
+        with open(workspace / "params.yaml", "w") as f:
+            yaml.safe_dump(params, f, sort_keys=False)
+
+    def _shared_dir(self, stage: str, params: dict) -> Path:
+        dvc_stage = self.dvc_stages[stage]
+        key = json.dumps({
+            "params": {param: get_param(params, param) for param in dvc_stage.get("params", [])},
+            "config": {section: self.all_config.get(section) for section in SHARED_STAGES[stage]},
+            # The stage code and its input data
+            "deps": {
+                dep: path_fingerprint(self.project_dir / dep)
+                for dep in dvc_stage.get("deps", []) if Path(dep) != Path("config/config.yaml")
+            }
+        }, sort_keys=True, default=str)
+        return Path(self.config.shared_dir).resolve() / f"{stage}-{hashlib.sha256(key.encode()).hexdigest()[:12]}"
+
+    def _create_trials(self) -> list:
+        for key in self.config.space:
+            try:
+                get_param(self.all_params, key)
+            except (KeyError, TypeError):
+                raise ValueError(f"The search space key {key} is not in {self.config.params_file}")
+            if key.split(".")[0] in self.dvc_stages["data_ingestion"].get("params", []):
+                raise ValueError(f"{key} sets the data split, which all trials share")
+
+        trials = []
+        for index, overrides in enumerate(sample_trials(
+                self.config.space, self.config.search, self.config.num_trials, self.config.seed)):
+            params = copy.deepcopy(self.all_params)
+            for key, value in overrides.items():
+                set_param(params, key, value)
+            trial = Trial(
+                trial_id=f"trial_{index:03d}",
+                overrides=overrides,
+                params=params,
+                workspace=self.sweep_dir / "trials" / f"trial_{index:03d}"
+            )
+            trial.shared = {
+                stage: self._shared_dir(stage, params) for stage in SHARED_STAGES
+                if stage != "dataset_packing" or params["INPUT_PIPELINE"] == "packed"
+            }
+
+            config = self._workspace_config(trial.shared)
+            # Successive halving continues promoted trials from their last backup
+            config["training"]["backup_clear_on_completion"] = self.config.early_stopping != "successive_halving"
+            config["training"]["backup_keep"] = 1
+            # Trials training under another dtype policy keep their features in the same cache
+            config["feature_cache"]["prune_stale"] = False
+            self._write_workspace(trial.workspace, config, params)
+            trials.append(trial)
+        return trials
+
+    # ------------------------------------------------------------------
+    # Subprocesses
+
+    def _run_child(self, workspace: Path, stages: list, latency_runs: int = 0, should_stop=None) -> tuple:
+        """Runs ``stages`` in ``workspace`` on a free CPU slot; returns (status, result, wall time)."""
+        cpus = self._slots.get()
+        start = time.perf_counter()
+        try:
+            env = dict(os.environ)
+            package_root = str(Path(__file__).resolve().parents[2])
+            env["PYTHONPATH"] = os.pathsep.join(filter(None, [package_root, env.get("PYTHONPATH")]))
+            env["OMP_NUM_THREADS"] = str(len(cpus))
+            command = [
+                sys.executable, "-m", "cnnClassifier.pipeline.sweep_trial", *stages,
+                "--cpus", ",".join(map(str, cpus)), "--latency-runs", str(latency_runs)
+            ]
+            result_file = workspace / "result.json"
+            result_file.unlink(missing_ok=True)
+            with open(workspace / "trial.log", "a") as log:
+                process = subprocess.Popen(command, cwd=workspace, env=env, stdout=log, stderr=subprocess.STDOUT)
+                stopped = False
+                while process.poll() is None:
+                    time.sleep(1)
+                    if should_stop is not None and not stopped and should_stop():
+                        stopped = True
+                        process.terminate()
+                process.wait()
+        finally:
+            self._slots.put(cpus)
+
+        wall_time = time.perf_counter() - start
+        if stopped:
+            return "stopped", None, wall_time
+        if process.returncode != 0:
+            return "failed", None, wall_time
+        with open(result_file) as f:
+            return "completed", json.load(f), wall_time
+
+    def _prepare_shared(self):
+        """Builds the shared stage outputs the trials need and that do not exist yet."""
+        # The project's own data ingestion, up to date like main.py leaves it
+        subprocess.run([sys.executable, "main.py", "data_ingestion"], cwd=self.project_dir, check=True)
+
+        pending = {}
+        for trial in self.trials:
+            for stage, path in trial.shared.items():
+                if not (path / "done.json").exists():
+                    pending[path] = (stage, trial.params)
+
+        def build(item):
+            path, (stage, params) = item
+            logger.info(f"Preparing the shared {stage} output in {path}")
+            self._write_workspace(path, self._workspace_config({}), params)
+            status, result, _ = self._run_child(path, [stage])
+            if status != "completed":
+                raise RuntimeError(f"The shared {stage} stage failed, see {path / 'trial.log'}")
+            with open(path / "done.json", "w") as f:
+                json.dump({"stage": stage, **result}, f)
+
+        with ThreadPoolExecutor(max_workers=self.config.max_parallel) as executor:
+            list(executor.map(build, pending.items()))
+
+    # ------------------------------------------------------------------
+    # Trials
+
+    def _read_history(self, trial: Trial):
+        progress_file = trial.workspace / self.all_config["prepare_callbacks"]["progress_file"]
+        try:
+            with open(progress_file) as f:
+                trial.history = json.load(f)["history"]
+        except (OSError, ValueError, KeyError):
+            pass
+
+    def _median_should_stop(self, trial: Trial):
+        last_epoch = [0]
+
+        def should_stop() -> bool:
+            self._read_history(trial)
+            epoch = trial.epochs
+            if epoch == last_epoch[0] or epoch < self.config.min_epochs:
+                return False
+            last_epoch[0] = epoch
+            others = [
+                other.best_val_accuracy(epoch) for other in self.trials
+                if other is not trial and other.epochs >= epoch
+            ]
+            if len(others) < MEDIAN_MIN_TRIALS:
+                return False
+            stop = trial.best_val_accuracy(epoch) < statistics.median(others)
+            if stop:
+                logger.info(f"{trial.trial_id} stopped after epoch {epoch}, below the median of {len(others)} trials")
+            return stop
+
+        return should_stop
+
+    def _run_trial(self, trial: Trial, epochs: int):
+        """Trains ``trial`` up to ``epochs``, evaluating it once it reaches its own EPOCHS."""
+        final = epochs >= trial.max_epochs
+        params = {**trial.params, "EPOCHS": epochs}
+        with open(trial.workspace / "params.yaml", "w") as f:
+            yaml.safe_dump(params, f, sort_keys=False)
+
+        trial.status = "running"
+        should_stop = self._median_should_stop(trial) if self.config.early_stopping == "median" else None
+        status, result, wall_time = self._run_child(
+            trial.workspace,
+            ["training", "evaluation"] if final else ["training"],
+            latency_runs=self.config.latency_runs if final else 0,
+            should_stop=should_stop
+        )
+        self._read_history(trial)
+        # Stopped and failed runs count with their wall time
+        trial.training_time_s += result["stages"]["training"] if result is not None else wall_time
+        if status == "failed":
+            trial.status, trial.error = "failed", f"see {trial.workspace / 'trial.log'}"
+            logger.warning(f"{trial.trial_id} failed, see {trial.workspace / 'trial.log'}")
+        elif status == "stopped":
+            trial.status = "stopped"
+        elif final:
+            with open(trial.workspace / "scores.json") as f:
+                scores = json.load(f)
+            trial.accuracy, trial.loss = scores["accuracy"], scores["loss"]
+            trial.latency_ms = result["latency_ms"]
+            trial.status = "completed"
+            logger.info(f"{trial.trial_id} completed: accuracy {trial.accuracy:.4f} with {trial.overrides}")
+
+    def _run_all(self, trials: list, epochs_of):
+        with ThreadPoolExecutor(max_workers=self.config.max_parallel) as executor:
+            list(executor.map(lambda trial: self._run_trial(trial, epochs_of(trial)), trials))
+
+    def _successive_halving(self):
+        active = list(self.trials)
+        rung_epochs = self.config.min_epochs
+        while active:
+            logger.info(f"Successive halving rung of {rung_epochs} epochs with {len(active)} trials")
+            self._run_all(active, lambda trial: min(rung_epochs, trial.max_epochs))
+            ranked = sorted(
+                [trial for trial in active if trial.status != "failed"],
+                key=Trial.best_val_accuracy, reverse=True
+            )
+            promoted = ranked[:math.ceil(len(active) / self.config.reduction_factor)]
+            for trial in ranked:
+                if trial.status == "running" and trial not in promoted:
+                    trial.status = "stopped"
+            active = [trial for trial in promoted if trial.status == "running"]
+            rung_epochs *= self.config.reduction_factor
+
+    # ------------------------------------------------------------------
+    # Leaderboard
+
+    def leaderboard(self) -> list:
+        rows = []
+        for trial in self.trials:
+            rows.append({
+                "trial": trial.trial_id,
+                "status": trial.status,
+                "epochs": trial.epochs,
+                # Stopped trials were never evaluated, their validation accuracy stands in
+                "accuracy": trial.accuracy if trial.accuracy is not None else (
+                    trial.best_val_accuracy() if trial.history else None
+                ),
+                "val_accuracy": trial.best_val_accuracy() if trial.history else None,
+                "loss": trial.loss,
+                "training_time_s": trial.training_time_s,
+                "latency_ms": trial.latency_ms,
+                **{f"param.{key}": value for key, value in trial.overrides.items()}
+            })
+
+        completed = [row for row in rows if row["status"] == "completed"]
+        for row in rows:
+            # Not beaten by another trial on accuracy, training time and latency at once
+            row["pareto"] = row["status"] == "completed" and not any(
+                other is not row
+                and other["accuracy"] >= row["accuracy"]
+                and other["training_time_s"] <= row["training_time_s"]
+                and (other["latency_ms"] or 0) <= (row["latency_ms"] or 0)
+                and (other["accuracy"], other["training_time_s"], other["latency_ms"])
+                != (row["accuracy"], row["training_time_s"], row["latency_ms"])
+                for other in completed
+            )
+        order = {"completed": 0, "stopped": 1}
+        rows.sort(key=lambda row: (
+            order.get(row["status"], 2), -(row["accuracy"] if row["accuracy"] is not None else float("-inf"))
+        ))
+        return rows
+
+    def _write_leaderboard(self, rows: list):
+        with open(self.sweep_dir / "leaderboard.json", "w") as f:
+            json.dump(rows, f, indent=4)
+        fieldnames = list(dict.fromkeys(key for row in rows for key in row))
+        with open(self.sweep_dir / "leaderboard.csv", "w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=fieldnames)
+            writer.writeheader()
+            writer.writerows(rows)
+        logger.info(f"Leaderboard written to {self.sweep_dir / 'leaderboard.csv'}")
+        for row in rows[:5]:
+            logger.info(", ".join(f"{key}={value}" for key, value in row.items()))
+
+    def run(self) -> list:
+        self.sweep_dir.mkdir(parents=True, exist_ok=True)
+        self.trials = self._create_trials()
+        logger.info(f"Sweep {self.name}: {len(self.trials)} trials, {self.config.max_parallel} at a time")
+        self._prepare_shared()
+
+        start = time.perf_counter()
+        if self.config.early_stopping == "successive_halving":
+            self._successive_halving()
+        else:
+            self._run_all(self.trials, lambda trial: trial.max_epochs)
+        logger.info(f"Sweep {self.name} finished in {time.perf_counter() - start:.1f}s")
+
+        rows = self.leaderboard()
+        self._write_leaderboard(rows)
+        return rows
@@ -1,5 +1,20 @@
 from zipfile import ZipFile
 from cnnClassifier.entity.config_entity import TrainingConfig
+from cnnClassifier.components.input_pipeline import InputPipeline
+from cnnClassifier.components.dataset_packing import PackedInputPipeline
+from cnnClassifier.components.split_index import SplitIndex
+from cnnClassifier.components.preprocessing import image_data_generator_kwargs
+from cnnClassifier.components.feature_cache import FeatureCache
+from cnnClassifier.components.prepare_callbacks import PerformanceCallback, ProgressCallback, BackupCallback
+from cnnClassifier.components.training_checkpoint import TrainingCheckpoints
+from cnnClassifier.components.distribution import get_strategy, worker_info
+from cnnClassifier.utils.common import append_json
+from cnnClassifier import logger
+import dataclasses
+import hashlib
+import random
+import time
+import numpy as np
 import tensorflow as tf
 from tensorflow.keras.optimizers import Adam # type: ignore
 from pathlib import Path
@@ -11,38 +26,197 @@ class Training:
         self.train_generator = None
         self.valid_generator = None
 
-    def get_base_model(self):
-        # Load the model from the specified path
-        self.model = tf.keras.models.load_model(
-            self.config.updated_base_model_path
+        self.strategy = get_strategy(
+            self.config.params_distribution_strategy,
+            self.config.params_num_cpu_replicas
         )
-        
+        # BATCH_SIZE is the per-replica batch, the global batch grows with the replicas
+        self.global_batch_size = self.config.params_batch_size * self.strategy.num_replicas_in_sync
+        self.num_workers, self.worker_index, self.is_chief = worker_info()
+        self.split_index = SplitIndex.load(self.config.split_index_file, self.config.training_data)
+
+        self.checkpoints = None
+        if self.config.resume:
+            self.checkpoints = TrainingCheckpoints(
+                self.config.backup_dir, self._fingerprint(), keep=self.config.backup_keep
+            )
+        self.initial_epoch = 0
+        self.history = []
+        self.shuffle_seed = random.randrange(2 ** 31)
+
+    def _fingerprint(self) -> str:
+        """Identifies the run a backup belongs to; more epochs may be added on resume."""
+        settings = {
+            key: value for key, value in dataclasses.asdict(self.config).items()
+            if key != "params_epochs" and not key.startswith("backup_")
+        }
+        inputs = [
+            f"{path}:{path.stat().st_size}:{path.stat().st_mtime_ns}"
+            for path in map(Path, (self.config.updated_base_model_path, self.config.split_index_file))
+            if path.exists()
+        ]
+        key = f"{sorted(settings.items())}{inputs}{self.num_workers}"
+        return hashlib.sha256(key.encode()).hexdigest()[:16]
+
+    def get_base_model(self):
+        # Variables and the optimizer must be created under the strategy scope
+        with self.strategy.scope():
+            # Load the model from the specified path
+            self.model = tf.keras.models.load_model(
+                self.config.updated_base_model_path
+            )
+
+            if self.config.params_mixed_precision:
+                self.model = self._with_dtype_policy(self.model, self.config.params_mixed_precision)
+
+            self._compile(self.model)
+
+        # Training on cached features backs up the head model, it is restored once that is built
+        if self.checkpoints is not None and not self.config.params_use_feature_cache:
+            self._restore_backup(self.model)
+
+    def _restore_backup(self, model: tf.keras.Model):
+        backup = self.checkpoints.latest()
+        if backup is None:
+            return
+        weights_file, state = backup
+        # The optimizer variables must exist before its state can be restored
+        with self.strategy.scope():
+            model.optimizer.build(model.trainable_variables)
+        model.load_weights(weights_file)
+        self.initial_epoch = state["epoch"]
+        self.history = state["history"]
+        self.shuffle_seed = state["shuffle_seed"]
+        logger.info(f"Resuming training after epoch {self.initial_epoch} from the backup {weights_file.parent}")
+
+    @staticmethod
+    def _with_dtype_policy(model: tf.keras.Model, policy: str) -> tf.keras.Model:
+        """Rebuilds ``model`` under a mixed precision policy, keeping its weights.
+
+        The output layer stays in float32 so the softmax and the loss are
+        computed at full precision. The global policy only applies while the
+        model is cloned, as layers without a dtype in their config (e.g. Add)
+        take it from there; models built later in the process, e.g. by the
+        stages the runner runs in the same interpreter, stay in float32.
+        """
+        output_layer = model.layers[-1]
+
+        def clone_layer(layer):
+            layer_config = layer.get_config()
+            layer_config.pop("dtype", None)
+            if layer is output_layer:
+                layer_config["dtype"] = "float32"
+            return layer.__class__.from_config(layer_config)
+
+        previous_policy = tf.keras.mixed_precision.global_policy()
+        tf.keras.mixed_precision.set_global_policy(policy)
+        try:
+            mixed_model = tf.keras.models.clone_model(model, clone_function=clone_layer)
+        finally:
+            tf.keras.mixed_precision.set_global_policy(previous_policy)
+        mixed_model.set_weights(model.get_weights())
+        logger.info(f"Training with the {policy} dtype policy")
+        return mixed_model
+
+    def _compile(self, model: tf.keras.Model):
         # Compile the model with a new optimizer to avoid the variable error
-        self.model.compile(
-            optimizer=Adam(learning_rate=0.001),  # Instantiate a new optimizer
+        optimizer = Adam(learning_rate=self.config.params_learning_rate)
+        if self.config.params_mixed_precision == "mixed_float16":
+            # float16 gradients underflow without loss scaling; bfloat16 does not need it
+            optimizer = tf.keras.mixed_precision.LossScaleOptimizer(optimizer)
+
+        model.compile(
+            optimizer=optimizer,
             loss='categorical_crossentropy',  # Adjust the loss function based on your task
-            metrics=['accuracy']  # You can add more metrics if needed
+            metrics=['accuracy'],  # You can add more metrics if needed
+            jit_compile=self.config.params_jit_compile,
+            steps_per_execution=self.config.params_steps_per_execution
         )
 
+    def _record_performance(self, performance: PerformanceCallback, mode: str):
+        if not self.is_chief:
+            return
+        append_json(path=Path(self.config.performance_file), data={
+            "timestamp": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "mode": mode,
+            "jit_compile": self.config.params_jit_compile,
+            "mixed_precision": self.config.params_mixed_precision,
+            "steps_per_execution": self.config.params_steps_per_execution,
+            "batch_size": self.global_batch_size,
+            "distribution_strategy": self.config.params_distribution_strategy,
+            "num_replicas": self.strategy.num_replicas_in_sync,
+            **performance.summary()
+        })
+
     def train_valid_generator(self):
-        datagenerator_kwargs = dict(
-            rescale=1. / 255,
-            validation_split=0.20
+        if self.config.params_input_pipeline in ("tf_data", "packed"):
+            self._train_valid_dataset()
+        else:
+            self._train_valid_flow_from_dataframe()
+
+        self.steps_per_epoch = self.train_samples // self.global_batch_size
+        self.validation_steps = self.valid_samples // self.global_batch_size
+
+    def _input_pipeline(self) -> InputPipeline:
+        if self.config.params_input_pipeline == "packed":
+            return PackedInputPipeline(
+                packed_dir=self.config.packed_data_dir,
+                image_size=self.config.params_image_size,
+                batch_size=self.global_batch_size // self.num_workers,
+                preprocessing=self.config.params_preprocessing,
+                split_index=self.split_index
+            )
+        return InputPipeline(
+            data_dir=self.config.training_data,
+            image_size=self.config.params_image_size,
+            # Each worker reads its own shard, so it only batches its share of the global batch
+            batch_size=self.global_batch_size // self.num_workers,
+            cache=self.config.params_data_cache,
+            cache_dir=self.config.data_cache_dir,
+            preprocessing=self.config.params_preprocessing,
+            split_index=self.split_index
+        )
+
+    def _train_valid_dataset(self):
+        input_pipeline = self._input_pipeline()
+        shards = dict(num_shards=self.num_workers, shard_index=self.worker_index)
+
+        # Both datasets repeat so that steps_per_epoch / validation_steps can be
+        # honoured across epochs, matching the legacy generator behaviour
+        self.valid_generator, self.valid_samples = input_pipeline.dataset(
+            subset="validation",
+            repeat=True,
+            **shards
+        )
+        self.train_generator, self.train_samples = input_pipeline.dataset(
+            subset="training",
+            shuffle=True,
+            augment=self.config.params_is_augmentation,
+            repeat=True,
+            # A resumed run continues with an order of its own, reproducible from the backup
+            seed=self.shuffle_seed + self.initial_epoch,
+            **shards
         )
 
+    def _train_valid_flow_from_dataframe(self):
+        if self.num_workers > 1:
+            raise ValueError("Multi-worker training needs INPUT_PIPELINE: tf_data to shard the input")
+
+        datagenerator_kwargs = image_data_generator_kwargs(self.config.params_preprocessing)
+
         dataflow_kwargs = dict(
             target_size=self.config.params_image_size[:-1],
-            batch_size=self.config.params_batch_size,
-            interpolation="bilinear"
+            batch_size=self.global_batch_size,
+            interpolation="bilinear",
+            classes=self.split_index.class_names
         )
 
         valid_datagenerator = tf.keras.preprocessing.image.ImageDataGenerator(
             **datagenerator_kwargs
         )
 
-        self.valid_generator = valid_datagenerator.flow_from_directory(
-            directory=self.config.training_data,
-            subset="validation",
+        self.valid_generator = valid_datagenerator.flow_from_dataframe(
+            self.split_index.dataframe("validation"),
             shuffle=False,
             **dataflow_kwargs
         )
@@ -60,31 +234,191 @@ class Training:
         else:
             train_datagenerator = valid_datagenerator
 
-        self.train_generator = train_datagenerator.flow_from_directory(
-            directory=self.config.training_data,
-            subset="training",
+        self.train_generator = train_datagenerator.flow_from_dataframe(
+            self.split_index.dataframe("training"),
             shuffle=True,
+            seed=self.shuffle_seed + self.initial_epoch,
             **dataflow_kwargs
         )
 
+        self.train_samples = self.train_generator.samples
+        self.valid_samples = self.valid_generator.samples
+
     @staticmethod
     def save_model(path: Path, model: tf.keras.Model):
         model.save(path)
 
+    def _save_trained_model(self):
+        if self.is_chief:
+            path = self.config.trained_model_path
+        else:
+            # Other workers keep their copy apart, it is only used to check they converged
+            path = Path(self.config.root_dir) / f"worker_{self.worker_index}" / Path(self.config.trained_model_path).name
+            path.parent.mkdir(parents=True, exist_ok=True)
+        self.save_model(path=path, model=self.model)
+
+    def _worker_callbacks(self, callback_list: list) -> list:
+        if self.is_chief:
+            return callback_list
+        # Only the chief writes checkpoints, TensorBoard logs and progress
+        return [
+            callback for callback in callback_list
+            if not isinstance(callback, (tf.keras.callbacks.ModelCheckpoint, tf.keras.callbacks.TensorBoard, ProgressCallback))
+        ]
+
+    def _resume_callbacks(self, callback_list: list):
+        """Carries the epochs trained before a resume over to the callbacks."""
+        for callback in callback_list:
+            if isinstance(callback, ProgressCallback):
+                callback.initial_history = self.history
+            # Otherwise the first epoch after resuming would replace the best checkpoint of the run
+            if isinstance(callback, tf.keras.callbacks.ModelCheckpoint) and callback.save_best_only:
+                values = [epoch[callback.monitor] for epoch in self.history if callback.monitor in epoch]
+                higher_is_better = callback.mode == "max" or (callback.mode == "auto" and "acc" in callback.monitor)
+                if values:
+                    callback.best = max(values) if higher_is_better else min(values)
+
+    def _backup_callbacks(self) -> list:
+        if self.checkpoints is None or not self.is_chief:
+            return []
+        return [BackupCallback(
+            self.checkpoints,
+            every_n_epochs=self.config.backup_every_epochs,
+            history=self.history,
+            state={"shuffle_seed": self.shuffle_seed}
+        )]
+
     def train(self, callback_list: list):
-        self.steps_per_epoch = self.train_generator.samples // self.train_generator.batch_size
-        self.validation_steps = self.valid_generator.samples // self.valid_generator.batch_size
+        performance = PerformanceCallback(
+            batch_size=self.global_batch_size,
+            steps_per_epoch=self.steps_per_epoch
+        )
 
-        self.model.fit(
-            self.train_generator,
-            epochs=self.config.params_epochs,
-            steps_per_epoch=self.steps_per_epoch,
-            validation_steps=self.validation_steps,
-            validation_data=self.valid_generator,
-            callbacks=callback_list
+        if self.history:
+            self._resume_callbacks(callback_list)
+        callbacks = [*self._worker_callbacks(callback_list), *self._backup_callbacks(), performance]
+        if self.num_workers > 1:
+            self._fit_multi_worker(callbacks)
+        else:
+            self.model.fit(
+                self.train_generator,
+                epochs=self.config.params_epochs,
+                initial_epoch=self.initial_epoch,
+                steps_per_epoch=self.steps_per_epoch,
+                validation_steps=self.validation_steps,
+                validation_data=self.valid_generator,
+                callbacks=callbacks
+            )
+        self._record_performance(performance, mode="full_model")
+
+        self._save_trained_model()
+        if self.checkpoints is not None and self.is_chief and self.config.backup_clear_on_completion:
+            self.checkpoints.clear()
+
+    def _fit_multi_worker(self, callbacks: list):
+        """Equivalent of ``model.fit`` for MultiWorkerMirroredStrategy.
+
+        Keras cannot symbolically build a model from multi-worker batches, so
+        the steps are run with ``strategy.run`` and the loss and accuracy are
+        summed over all replicas of the cluster.
+        """
+        model = self.model
+        strategy = self.strategy
+        train_data = iter(strategy.experimental_distribute_dataset(self.train_generator))
+        valid_data = iter(strategy.experimental_distribute_dataset(self.valid_generator))
+
+        with strategy.scope():
+            model.optimizer.build(model.trainable_variables)
+        loss_fn = tf.keras.losses.CategoricalCrossentropy(reduction="none")
+
+        def batch_totals(y, y_pred):
+            losses = loss_fn(y, tf.cast(y_pred, tf.float32))
+            correct = tf.cast(tf.equal(tf.argmax(y, axis=-1), tf.argmax(y_pred, axis=-1)), tf.float32)
+            return losses, tf.stack([tf.reduce_sum(losses), tf.reduce_sum(correct), tf.cast(tf.size(correct), tf.float32)])
+
+        def train_step(x, y):
+            with tf.GradientTape() as tape:
+                losses, totals = batch_totals(y, model(x, training=True))
+                loss = tf.nn.compute_average_loss(losses, global_batch_size=self.global_batch_size)
+                scaled_loss = model.optimizer.scale_loss(loss)
+            gradients = tape.gradient(scaled_loss, model.trainable_variables)
+            model.optimizer.apply_gradients(zip(gradients, model.trainable_variables))
+            return totals
+
+        def test_step(x, y):
+            return batch_totals(y, model(x, training=False))[1]
+
+        @tf.function(jit_compile=self.config.params_jit_compile)
+        def distributed_step(step_fn, iterator):
+            totals = strategy.run(step_fn, args=next(iterator))
+            return strategy.reduce("SUM", totals, axis=None)
+
+        def run_epoch(step_fn, iterator, steps, callback_list=None):
+            totals = np.zeros(3)
+            for step in range(steps):
+                totals += distributed_step(step_fn, iterator).numpy()
+                if callback_list:
+                    callback_list.on_train_batch_end(step)
+            return {"loss": float(totals[0] / max(totals[2], 1)), "accuracy": float(totals[1] / max(totals[2], 1))}
+
+        callback_list = tf.keras.callbacks.CallbackList(
+            callbacks, model=model, epochs=self.config.params_epochs, steps=self.steps_per_epoch
         )
+        callback_list.on_train_begin()
+        for epoch in range(self.initial_epoch, self.config.params_epochs):
+            callback_list.on_epoch_begin(epoch)
+            logs = run_epoch(train_step, train_data, self.steps_per_epoch, callback_list)
+            valid_logs = run_epoch(test_step, valid_data, self.validation_steps)
+            logs.update({f"val_{name}": value for name, value in valid_logs.items()})
+            logger.info(f"Epoch {epoch + 1}/{self.config.params_epochs}: {logs}")
+            callback_list.on_epoch_end(epoch, logs)
+        callback_list.on_train_end()
+
+    def train_on_cached_features(self, feature_cache: FeatureCache, callback_list: list):
+        if self.num_workers > 1:
+            raise ValueError("The feature cache is not shared between workers, disable FEATURE_CACHE")
+
+        input_pipeline = self._input_pipeline()
+        train_paths, train_labels = input_pipeline.list_files("training")
+        valid_paths, valid_labels = input_pipeline.list_files("validation")
+        n_classes = len(input_pipeline.class_names)
 
-        self.save_model(
-            path=self.config.trained_model_path,
-            model=self.model
+        train_features = feature_cache.load(self.model, train_paths)
+        valid_features = feature_cache.load(self.model, valid_paths)
+
+        # The head model shares its layers with self.model, so training it
+        # updates the full model that is saved afterwards
+        with self.strategy.scope():
+            head = FeatureCache.head_model(self.model)
+            self._compile(head)
+        # Backups hold the head and its optimizer, e.g. for a sweep that continues the trial with more epochs
+        if self.checkpoints is not None:
+            self._restore_backup(head)
+
+        # Checkpoints would only capture the head, so they are left to the full-model path
+        callback_list = [
+            callback for callback in callback_list
+            if not isinstance(callback, tf.keras.callbacks.ModelCheckpoint)
+        ]
+        if self.history:
+            self._resume_callbacks(callback_list)
+        performance = PerformanceCallback(
+            batch_size=self.global_batch_size,
+            steps_per_epoch=-(-len(train_paths) // self.global_batch_size)
         )
+
+        head.fit(
+            train_features,
+            np.eye(n_classes, dtype=np.float32)[train_labels],
+            batch_size=self.global_batch_size,
+            epochs=self.config.params_epochs,
+            initial_epoch=self.initial_epoch,
+            shuffle=True,
+            validation_data=(valid_features, np.eye(n_classes, dtype=np.float32)[valid_labels]),
+            callbacks=[*callback_list, *self._backup_callbacks(), performance]
+        )
+        self._record_performance(performance, mode="cached_features")
+
+        self._save_trained_model()
+        if self.checkpoints is not None and self.config.backup_clear_on_completion:
+            self.checkpoints.clear()
@@ -0,0 +1,80 @@
+import json
+import os
+import shutil
+import time
+from pathlib import Path
+from cnnClassifier import logger
+
+
+class TrainingCheckpoints:
+    """Epoch-level backups of a training run, for resuming it after an interruption.
+
+    A backup holds the model weights together with the optimizer state and a
+    ``state.json`` with the epoch reached, the metrics history and the shuffle
+    seed of the input pipeline. Each one is written to a temporary directory
+    and renamed into place, so an interrupted write never leaves a partial
+    backup behind, and only the newest ``keep`` are kept. Backups record a
+    fingerprint of the run, so a changed configuration starts over instead
+    of resuming.
+    """
+
+    WEIGHTS_FILE = "model.weights.h5"
+    STATE_FILE = "state.json"
+
+    def __init__(self, backup_dir: Path, fingerprint: str, keep: int = 2):
+        self.backup_dir = Path(backup_dir)
+        self.fingerprint = fingerprint
+        self.keep = max(keep, 1)
+
+    def _backups(self) -> list:
+        """Complete backups, oldest first."""
+        if not self.backup_dir.exists():
+            return []
+        return sorted(
+            path for path in self.backup_dir.iterdir()
+            if path.name.startswith("epoch_") and (path / self.STATE_FILE).exists()
+        )
+
+    def save(self, model, epoch: int, state: dict) -> Path:
+        """Backs up ``model`` after ``epoch`` epochs (1-based)."""
+        path = self.backup_dir / f"epoch_{epoch:05d}"
+        tmp_path = self.backup_dir / f".{path.name}.tmp{os.getpid()}"
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        tmp_path.mkdir(parents=True)
+        model.save_weights(tmp_path / self.WEIGHTS_FILE)
+        with open(tmp_path / self.STATE_FILE, "w") as f:
+            json.dump({
+                **state,
+                "epoch": epoch,
+                "fingerprint": self.fingerprint,
+                "updated": time.strftime("%Y-%m-%d %H:%M:%S")
+            }, f)
+        shutil.rmtree(path, ignore_errors=True)
+        os.replace(tmp_path, path)
+        self.prune()
+        return path
+
+    def latest(self):
+        """(weights file, state) of the newest backup of this run, None when there is none."""
+        for path in reversed(self._backups()):
+            with open(path / self.STATE_FILE) as f:
+                state = json.load(f)
+            if state.get("fingerprint") == self.fingerprint:
+                return path / self.WEIGHTS_FILE, state
+            logger.info(f"Ignoring the training backup {path}, it was made with another configuration")
+            return None
+        return None
+
+    def prune(self):
+        backups = self._backups()
+        for path in backups[:-self.keep]:
+            shutil.rmtree(path, ignore_errors=True)
+        # Temporary directories of writes that were interrupted
+        if self.backup_dir.exists():
+            for path in self.backup_dir.glob(".epoch_*.tmp*"):
+                if not path.name.endswith(f".tmp{os.getpid()}"):
+                    shutil.rmtree(path, ignore_errors=True)
+
+    def clear(self):
+        """Removes all backups, once the run they belong to completed."""
+        shutil.rmtree(self.backup_dir, ignore_errors=True)
@@ -0,0 +1,206 @@
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+import uuid
+from pathlib import Path
+from cnnClassifier import logger
+from cnnClassifier.entity.config_entity import TrainingJobsConfig
+
+
+class TrainingJobRunning(RuntimeError):
+    """Raised when a training job is submitted while another one is running."""
+
+    def __init__(self, job_id: str):
+        super().__init__(f"Training job {job_id} is already running")
+        self.job_id = job_id
+
+
+class TrainingJobManager:
+    """Runs the training pipeline in a background subprocess.
+
+    Jobs are recorded as JSON files under ``root_dir`` and a lock file
+    holding the running job id makes sure only one job runs at a time, even
+    across the worker processes of a gunicorn server. The lock is hard-linked
+    into place from a file that already holds the id, so it is never seen
+    empty; it is cleared once its job ended or the server running it died. Each job writes its
+    output to a log file and the per-epoch progress is read from the file
+    written by ProgressCallback. ``on_model_updated`` is called with the job
+    record when a job produced a new trained model.
+    """
+
+    # Seconds after which a lock that cannot be read is considered stale
+    UNREADABLE_LOCK_TIMEOUT_S = 60
+
+    def __init__(self, config: TrainingJobsConfig, on_model_updated=None):
+        self.config = config
+        self.on_model_updated = on_model_updated
+        self.root_dir = Path(self.config.root_dir)
+        self.lock_file = self.root_dir / "running.lock"
+        self._lock = threading.Lock()
+
+    def _job_file(self, job_id: str) -> Path:
+        return self.root_dir / f"{job_id}.json"
+
+    def _save_job(self, job: dict):
+        job_file = self._job_file(job["job_id"])
+        tmp_file = job_file.with_name(job_file.name + ".tmp")
+        with open(tmp_file, "w") as f:
+            json.dump(job, f, indent=4)
+        os.replace(tmp_file, job_file)
+
+    def _load_job(self, job_id: str) -> dict:
+        with open(self._job_file(job_id)) as f:
+            return json.load(f)
+
+    def _model_mtime(self):
+        path = Path(self.config.trained_model_path)
+        return path.stat().st_mtime_ns if path.exists() else None
+
+    def _clear_lock(self, job_id: str):
+        # Only the lock of that job, not one another server took in the meantime
+        try:
+            if self.lock_file.read_text().strip() == job_id:
+                self.lock_file.unlink()
+        except FileNotFoundError:
+            pass
+
+    def running_job_id(self):
+        """Id of the job holding the lock, None when there is none.
+
+        Clears the lock of a job that ended or whose server died. A lock whose
+        content cannot be read counts as held, until it is older than
+        ``UNREADABLE_LOCK_TIMEOUT_S``.
+        """
+        try:
+            job_id = self.lock_file.read_text().strip()
+            lock_age = time.time() - self.lock_file.stat().st_mtime
+        except FileNotFoundError:
+            return None
+        except (OSError, UnicodeDecodeError):
+            job_id, lock_age = "", 0.
+
+        if not job_id:
+            if lock_age < self.UNREADABLE_LOCK_TIMEOUT_S:
+                return "unknown"
+            logger.warning(f"Removing the unreadable training lock {self.lock_file}")
+            self.lock_file.unlink(missing_ok=True)
+            return None
+
+        try:
+            job = self._load_job(job_id)
+            os.kill(job["server_pid"], 0)
+        except PermissionError:
+            # The server runs as another user, but it is alive
+            pass
+        except (OSError, ValueError, KeyError):
+            # The server that owned the job is gone, so nothing will ever release the lock
+            self._clear_lock(job_id)
+            return None
+        if job["status"] not in ("queued", "running"):
+            self._clear_lock(job_id)
+            return None
+        return job_id
+
+    def _acquire(self, job_id: str):
+        tmp_file = self.lock_file.with_name(f"{self.lock_file.name}.{job_id}.tmp")
+        tmp_file.write_text(job_id)
+        try:
+            for attempt in range(2):
+                try:
+                    os.link(tmp_file, self.lock_file)
+                    return
+                except FileExistsError:
+                    running = self.running_job_id()
+                    if running is not None or attempt:
+                        raise TrainingJobRunning(running or "unknown")
+                    # The stale lock was cleared, try once more
+        finally:
+            tmp_file.unlink(missing_ok=True)
+
+    def submit(self, stages: list = None) -> dict:
+        """Starts a pipeline run and returns its job record right away."""
+        with self._lock:
+            job_id = uuid.uuid4().hex[:12]
+            job = {
+                "job_id": job_id,
+                "status": "queued",
+                "stages": [str(stage) for stage in stages or []],
+                "submitted": time.strftime("%Y-%m-%d %H:%M:%S"),
+                "started": None,
+                "finished": None,
+                "return_code": None,
+                "model_updated": False,
+                "server_pid": os.getpid(),
+                "log_file": str(self.root_dir / f"{job_id}.log")
+            }
+            self._save_job(job)
+            try:
+                self._acquire(job_id)
+            except TrainingJobRunning:
+                self._job_file(job_id).unlink()
+                raise
+
+        threading.Thread(target=self._run, args=(job,), daemon=True).start()
+        return job
+
+    def _run(self, job: dict):
+        model_mtime = self._model_mtime()
+        # Progress of a previous run must not be reported for this one
+        Path(self.config.progress_file).unlink(missing_ok=True)
+        try:
+            with open(job["log_file"], "w") as log:
+                process = subprocess.Popen(
+                    [sys.executable, *self.config.command, *job["stages"]],
+                    stdout=log,
+                    stderr=subprocess.STDOUT
+                )
+                job.update(status="running", started=time.strftime("%Y-%m-%d %H:%M:%S"), pid=process.pid)
+                self._save_job(job)
+                logger.info(f"Training job {job['job_id']} started (pid {process.pid})")
+                return_code = process.wait()
+
+            job.update(
+                status="succeeded" if return_code == 0 else "failed",
+                return_code=return_code,
+                model_updated=return_code == 0 and self._model_mtime() != model_mtime
+            )
+            logger.info(f"Training job {job['job_id']} {job['status']}")
+
+            if job["model_updated"] and self.on_model_updated is not None:
+                self.on_model_updated(job)
+        except Exception as e:
+            logger.exception(e)
+            job.update(status="failed", error=str(e))
+        finally:
+            job["finished"] = time.strftime("%Y-%m-%d %H:%M:%S")
+            self._save_job(job)
+            self._clear_lock(job["job_id"])
+
+    def status(self, job_id: str) -> dict:
+        """Job record with the training progress of the running or last job."""
+        if not job_id.isalnum() or not self._job_file(job_id).exists():
+            raise KeyError(job_id)
+        job = self._load_job(job_id)
+
+        job["progress"] = None
+        progress_file = Path(self.config.progress_file)
+        if job["started"] is not None and progress_file.exists():
+            # The progress file only belongs to this job if it was written while the job ran
+            mtime = progress_file.stat().st_mtime
+            started = time.mktime(time.strptime(job["started"], "%Y-%m-%d %H:%M:%S"))
+            finished = (time.mktime(time.strptime(job["finished"], "%Y-%m-%d %H:%M:%S")) + 1
+                        if job["finished"] else float("inf"))
+            if started <= mtime <= finished:
+                with open(progress_file) as f:
+                    job["progress"] = json.load(f)
+        return job
+
+    def jobs(self) -> list:
+        records = []
+        for job_file in sorted(self.root_dir.glob("*.json"), key=os.path.getmtime, reverse=True):
+            with open(job_file) as f:
+                records.append(json.load(f))
+        return records
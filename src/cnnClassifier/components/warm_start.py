@@ -0,0 +1,95 @@
+import hashlib
+import json
+import os
+import shutil
+from pathlib import Path
+from cnnClassifier import logger
+from cnnClassifier.components.inference_backend import KerasBackend
+from cnnClassifier.components.preprocessing import get_preprocessing_function
+
+
+def _process_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except (PermissionError, ValueError, OverflowError):
+        pass
+    return pid > 0
+
+
+class WarmStartCache:
+    """Pre-traced SavedModels of the Keras model files that get served.
+
+    Loading a ``.keras`` file deserializes the model and traces its predict
+    function again on the first batches of every server start. The exported
+    SavedModel holds already traced functions and loads faster. Entries are
+    keyed by the path, size and mtime of the model file, so a replaced file
+    never hits a stale entry, and entries whose model file changed or
+    disappeared are pruned. With ``preprocessing`` the SavedModel takes uint8
+    images and applies that preprocessing itself, like a fused Keras model.
+    """
+
+    SOURCE_FILE = "source.json"
+
+    def __init__(self, root_dir: Path):
+        self.root_dir = Path(root_dir)
+
+    @staticmethod
+    def _fingerprint(model_path: Path, preprocessing: str = None) -> str:
+        stat = Path(model_path).stat()
+        key = f"{Path(model_path).resolve()}\0{stat.st_size}\0{stat.st_mtime_ns}\0{preprocessing}"
+        return hashlib.sha256(key.encode()).hexdigest()[:16]
+
+    def path(self, model_path: Path, preprocessing: str = None) -> Path:
+        return self.root_dir / f"{Path(model_path).stem}-{self._fingerprint(model_path, preprocessing)}"
+
+    def get(self, model_path: Path, preprocessing: str = None):
+        """SavedModel directory of ``model_path``, None when it was not exported yet."""
+        path = self.path(model_path, preprocessing)
+        # The source file is written last, so its presence marks a complete export
+        return path if (path / self.SOURCE_FILE).exists() else None
+
+    def export(self, model_path: Path, preprocessing: str = None) -> Path:
+        """Exports the SavedModel of ``model_path`` unless it already exists."""
+        path = self.get(model_path, preprocessing)
+        if path is not None:
+            return path
+
+        path = self.path(model_path, preprocessing)
+        tmp_path = path.with_name(f"{path.name}.tmp{os.getpid()}")
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        backend = KerasBackend(model_path)
+        if preprocessing is not None:
+            backend.fuse_preprocessing(get_preprocessing_function(preprocessing))
+        backend.model.export(str(tmp_path), verbose=False)
+        with open(tmp_path / self.SOURCE_FILE, "w") as f:
+            json.dump({"model_path": str(Path(model_path).resolve()), "preprocessing": preprocessing}, f)
+        try:
+            os.replace(tmp_path, path)
+        except OSError:
+            # Another process exported the same model in the meantime
+            shutil.rmtree(tmp_path, ignore_errors=True)
+        logger.info(f"Warm-start SavedModel of {model_path} exported to: {path}")
+        self.prune()
+        return path
+
+    def prune(self):
+        """Removes the entries whose model file was replaced or deleted."""
+        if not self.root_dir.exists():
+            return
+        for path in self.root_dir.iterdir():
+            if ".tmp" in path.name:
+                # Left behind by an export whose process died, otherwise still being exported
+                if not _process_alive(int(path.name.rsplit(".tmp", 1)[1] or 0)):
+                    shutil.rmtree(path, ignore_errors=True)
+                continue
+            source_file = path / self.SOURCE_FILE
+            if not source_file.exists():
+                continue
+            with open(source_file) as f:
+                source = json.load(f)
+            model_path = Path(source["model_path"])
+            if not model_path.exists() or self.path(model_path, source["preprocessing"]) != path:
+                shutil.rmtree(path, ignore_errors=True)
+                logger.info(f"Removed the stale warm-start SavedModel {path}")
@@ -2,11 +2,24 @@ from cnnClassifier.constants import *
 import os
 from pathlib import Path
 from cnnClassifier.utils.common import read_yaml, create_directories
+from cnnClassifier import logger
 from cnnClassifier.entity.config_entity import (DataIngestionConfig,
+                                                SplitIndexConfig,
                                                 PrepareBaseModelConfig,
                                                 PrepareCallbacksConfig,
                                                 TrainingConfig,
-                                                EvaluationConfig)
+                                                DatasetPackingConfig,
+                                                FeatureCacheConfig,
+                                                EvaluationConfig,
+                                                ModelExportConfig,
+                                                PredictionConfig,
+                                                PredictionCacheConfig,
+                                                ServingConfig,
+                                                ModelRegistryConfig,
+                                                PipelineRunnerConfig,
+                                                InstrumentationConfig,
+                                                TrainingJobsConfig,
+                                                SweepConfig)
 
 
 
@@ -16,12 +29,20 @@ class ConfigurationManager:
         config_filepath = CONFIG_FILE_PATH,
         params_filepath = PARAMS_FILE_PATH):
 
+        self.config_filepath = config_filepath
+        self.params_filepath = params_filepath
         self.config = read_yaml(config_filepath)
         self.params = read_yaml(params_filepath)
 
         create_directories([self.config.artifacts_root])
 
 
+    @property
+    def backbone_params(self):
+        # Settings of the backbone selected by BACKBONE, e.g. the VGG16 section
+        return self.params[self.params.BACKBONE]
+
+
     
     def get_data_ingestion_config(self) -> DataIngestionConfig:
         config = self.config.data_ingestion
@@ -32,10 +53,28 @@ class ConfigurationManager:
             root_dir=config.root_dir,
             source_URL=config.source_URL,
             local_data_file=config.local_data_file,
-            unzip_dir=config.unzip_dir 
+            unzip_dir=config.unzip_dir,
+            source_sha256=config.source_sha256,
+            manifest_file=config.manifest_file,
+            extract_workers=config.extract_workers
         )
 
         return data_ingestion_config
+
+
+
+    def get_split_index_config(self) -> SplitIndexConfig:
+        config = self.config.split_index
+        training_data = os.path.join(self.config.data_ingestion.unzip_dir, "Chicken-fecal-images")
+
+        split_index_config = SplitIndexConfig(
+            index_file=Path(config.index_file),
+            training_data=Path(training_data),
+            params_validation_split=self.params.VALIDATION_SPLIT,
+            params_seed=self.params.SPLIT_SEED
+        )
+
+        return split_index_config
     
 
 
@@ -51,9 +90,15 @@ class ConfigurationManager:
             updated_base_model_path=Path(config.updated_base_model_path),
             params_image_size=self.params.IMAGE_SIZE,
             params_learning_rate=self.params.LEARNING_RATE,
-            params_include_top=self.params.INCLUDE_TOP,
-            params_weights=self.params.WEIGHTS,
-            params_classes=self.params.CLASSES
+            params_include_top=self.backbone_params.include_top,
+            params_weights=self.backbone_params.weights,
+            params_classes=self.backbone_params.classes,
+            params_head_type=self.params.HEAD.TYPE,
+            params_head_hidden_units=list(self.params.HEAD.HIDDEN_UNITS),
+            params_head_dropout=self.params.HEAD.DROPOUT,
+            params_backbone=self.params.BACKBONE,
+            params_distribution_strategy=self.params.DISTRIBUTION.STRATEGY,
+            params_num_cpu_replicas=self.params.DISTRIBUTION.NUM_CPU_REPLICAS
         )
 
         return prepare_base_model_config
@@ -71,7 +116,8 @@ class ConfigurationManager:
         prepare_callback_config = PrepareCallbacksConfig(
             root_dir=Path(config.root_dir),
             tensorboard_root_log_dir=Path(config.tensorboard_root_log_dir),
-            checkpoint_model_filepath=Path(config.checkpoint_model_filepath)
+            checkpoint_model_filepath=Path(config.checkpoint_model_filepath),
+            progress_file=Path(config.progress_file)
         )
 
         return prepare_callback_config
@@ -86,6 +132,9 @@ class ConfigurationManager:
         create_directories([
             Path(training.root_dir)
         ])
+        if params.FEATURE_CACHE and params.AUGMENTATION:
+            # Augmented images differ every epoch, so their features cannot be cached
+            logger.warning("FEATURE_CACHE is ignored because AUGMENTATION is on, training the full model")
 
         training_config = TrainingConfig(
             root_dir=Path(training.root_dir),
@@ -94,23 +143,263 @@ class ConfigurationManager:
             training_data=Path(training_data),
             params_epochs=params.EPOCHS,
             params_batch_size=params.BATCH_SIZE,
+            params_learning_rate=params.LEARNING_RATE,
             params_is_augmentation=params.AUGMENTATION,
-            params_image_size=params.IMAGE_SIZE
+            params_image_size=params.IMAGE_SIZE,
+            params_input_pipeline=params.INPUT_PIPELINE,
+            params_data_cache=params.DATA_CACHE,
+            data_cache_dir=Path(self.config.input_pipeline.cache_dir),
+            params_use_feature_cache=params.FEATURE_CACHE and not params.AUGMENTATION,
+            params_preprocessing=self.backbone_params.preprocessing,
+            performance_file=Path(training.performance_file),
+            params_jit_compile=params.PERFORMANCE.JIT_COMPILE,
+            params_mixed_precision=params.PERFORMANCE.MIXED_PRECISION,
+            params_steps_per_execution=params.PERFORMANCE.STEPS_PER_EXECUTION,
+            params_distribution_strategy=params.DISTRIBUTION.STRATEGY,
+            params_num_cpu_replicas=params.DISTRIBUTION.NUM_CPU_REPLICAS,
+            packed_data_dir=Path(self.config.dataset_packing.root_dir),
+            split_index_file=Path(self.config.split_index.index_file),
+            resume=training.resume,
+            backup_dir=Path(training.backup_dir),
+            backup_every_epochs=training.backup_every_epochs,
+            backup_keep=training.backup_keep,
+            backup_clear_on_completion=training.backup_clear_on_completion
         )
 
         return training_config
+
+
+
+    def get_dataset_packing_config(self) -> DatasetPackingConfig:
+        config = self.config.dataset_packing
+        training_data = os.path.join(self.config.data_ingestion.unzip_dir, "Chicken-fecal-images")
+        create_directories([config.root_dir])
+
+        dataset_packing_config = DatasetPackingConfig(
+            root_dir=Path(config.root_dir),
+            training_data=Path(training_data),
+            params_image_size=self.params.IMAGE_SIZE,
+            params_batch_size=self.params.BATCH_SIZE,
+            params_input_pipeline=self.params.INPUT_PIPELINE,
+            shard_size=config.shard_size
+        )
+
+        return dataset_packing_config
+
+
+
+    def get_feature_cache_config(self) -> FeatureCacheConfig:
+        config = self.config.feature_cache
+        training_data = os.path.join(self.config.data_ingestion.unzip_dir, "Chicken-fecal-images")
+        create_directories([config.root_dir])
+
+        feature_cache_config = FeatureCacheConfig(
+            root_dir=Path(config.root_dir),
+            training_data=Path(training_data),
+            params_image_size=self.params.IMAGE_SIZE,
+            params_batch_size=self.params.BATCH_SIZE,
+            params_preprocessing=self.backbone_params.preprocessing,
+            prune_stale=config.prune_stale
+        )
+
+        return feature_cache_config
     
 
 
 
     def get_validation_config(self) -> EvaluationConfig:
+        config = self.config.evaluation
+        create_directories([config.root_dir])
+
         eval_config = EvaluationConfig(
-            path_of_model=Path("artifacts/training/model.h5"),
-            training_data=Path("artifacts/data_ingestion/Chicken-fecal-images"),
+            path_of_model=Path(self.config.training.trained_model_path),
+            training_data=Path(os.path.join(self.config.data_ingestion.unzip_dir, "Chicken-fecal-images")),
             all_params=self.params,
             params_image_size=self.params.IMAGE_SIZE,
-            params_batch_size=self.params.BATCH_SIZE
+            params_batch_size=self.params.BATCH_SIZE,
+            params_input_pipeline=self.params.INPUT_PIPELINE,
+            params_data_cache=self.params.DATA_CACHE,
+            data_cache_dir=Path(self.config.input_pipeline.cache_dir),
+            params_preprocessing=self.backbone_params.preprocessing,
+            performance_file=Path(config.performance_file),
+            params_jit_compile=self.params.PERFORMANCE.JIT_COMPILE,
+            packed_data_dir=Path(self.config.dataset_packing.root_dir),
+            split_index_file=Path(self.config.split_index.index_file),
+            extra_models=[Path(path) for path in config.extra_models],
+            calibration_bins=config.calibration_bins
         )
         return eval_config
 
-      
\ No newline at end of file
+
+
+    def get_model_export_config(self) -> ModelExportConfig:
+        config = self.config.model_export
+        params = self.params.EXPORT
+        create_directories([config.root_dir])
+
+        model_export_config = ModelExportConfig(
+            root_dir=Path(config.root_dir),
+            saved_model_dir=Path(config.saved_model_dir),
+            report_file=Path(config.report_file),
+            path_of_model=Path(self.config.training.trained_model_path),
+            training_data=Path(os.path.join(self.config.data_ingestion.unzip_dir, "Chicken-fecal-images")),
+            scores_file=Path("scores.json"),
+            params_image_size=self.params.IMAGE_SIZE,
+            params_batch_size=self.params.BATCH_SIZE,
+            params_variants=params.VARIANTS,
+            params_representative_samples=params.REPRESENTATIVE_SAMPLES,
+            params_benchmark_runs=params.BENCHMARK_RUNS,
+            params_num_threads=params.NUM_THREADS,
+            params_accuracy_budget=params.ACCURACY_BUDGET,
+            params_preprocessing=self.backbone_params.preprocessing,
+            split_index_file=Path(self.config.split_index.index_file)
+        )
+
+        return model_export_config
+
+
+
+    def get_prediction_config(self) -> PredictionConfig:
+        config = self.config.prediction
+
+        prediction_config = PredictionConfig(
+            path_of_model=Path(config.model_path),
+            num_threads=config.num_threads,
+            enable_batching=config.enable_batching,
+            max_batch_size=config.max_batch_size,
+            max_wait_ms=config.max_wait_ms,
+            bulk_batch_size=config.bulk_batch_size,
+            decode_workers=config.decode_workers,
+            draft_decode=config.draft_decode,
+            fuse_preprocessing=config.fuse_preprocessing,
+            use_registry=config.use_registry,
+            registry_poll_s=config.registry_poll_s,
+            warm_start=config.warm_start,
+            warm_start_dir=Path(config.warm_start_dir),
+            params_image_size=self.params.IMAGE_SIZE,
+            params_preprocessing=self.backbone_params.preprocessing
+        )
+        return prediction_config
+
+
+
+    def get_prediction_cache_config(self) -> PredictionCacheConfig:
+        config = self.config.prediction_cache
+
+        prediction_cache_config = PredictionCacheConfig(
+            enabled=config.enabled,
+            max_entries=config.max_entries,
+            ttl_s=config.ttl_s,
+            sqlite_path=Path(config.sqlite_path) if config.sqlite_path else None
+        )
+        return prediction_cache_config
+
+
+
+    def get_serving_config(self) -> ServingConfig:
+        config = self.config.serving
+
+        serving_config = ServingConfig(
+            host=config.host,
+            port=config.port,
+            inference_workers=config.inference_workers,
+            max_pending=config.max_pending,
+            request_timeout_s=config.request_timeout_s,
+            retry_after_s=config.retry_after_s,
+            max_upload_mb=config.max_upload_mb
+        )
+        return serving_config
+
+
+
+    def get_model_registry_config(self) -> ModelRegistryConfig:
+        config = self.config.model_registry
+        create_directories([config.root_dir])
+
+        model_registry_config = ModelRegistryConfig(
+            root_dir=Path(config.root_dir),
+            trained_model_path=Path(self.config.training.trained_model_path),
+            scores_file=Path("scores.json"),
+            auto_promote=config.auto_promote,
+            keep_versions=config.keep_versions,
+            params_image_size=self.params.IMAGE_SIZE,
+            params_preprocessing=self.backbone_params.preprocessing
+        )
+
+        return model_registry_config
+
+
+
+    def get_pipeline_runner_config(self) -> PipelineRunnerConfig:
+        config = self.config.pipeline_runner
+        create_directories([config.root_dir])
+
+        pipeline_runner_config = PipelineRunnerConfig(
+            dvc_file=Path(config.dvc_file),
+            config_file=Path(self.config_filepath),
+            state_file=Path(config.state_file),
+            runs_file=Path(config.runs_file),
+            metrics_file=Path(config.metrics_file),
+            max_workers=config.max_workers,
+            all_config=self.config,
+            all_params=self.params
+        )
+
+        return pipeline_runner_config
+
+
+
+    def get_instrumentation_config(self) -> InstrumentationConfig:
+        config = self.config.instrumentation
+
+        instrumentation_config = InstrumentationConfig(
+            pipeline_metrics_file=Path(self.config.pipeline_runner.metrics_file),
+            profiler=config.profiler,
+            profile_sample_rate=config.profile_sample_rate,
+            profile_dir=Path(config.profile_dir),
+            max_profiles=config.max_profiles
+        )
+
+        return instrumentation_config
+
+
+
+    def get_training_jobs_config(self) -> TrainingJobsConfig:
+        config = self.config.training_jobs
+        create_directories([config.root_dir])
+
+        training_jobs_config = TrainingJobsConfig(
+            root_dir=Path(config.root_dir),
+            progress_file=Path(self.config.prepare_callbacks.progress_file),
+            trained_model_path=Path(self.config.training.trained_model_path),
+            command=list(config.command)
+        )
+
+        return training_jobs_config
+
+
+
+    def get_sweep_config(self) -> SweepConfig:
+        config = self.config.sweep
+        create_directories([config.root_dir, config.shared_dir])
+
+        sweep_config = SweepConfig(
+            root_dir=Path(config.root_dir),
+            shared_dir=Path(config.shared_dir),
+            space=config.space.to_dict(),
+            search=config.search,
+            num_trials=config.num_trials,
+            seed=config.seed,
+            max_parallel=config.max_parallel,
+            threads_per_trial=config.threads_per_trial,
+            early_stopping=config.early_stopping,
+            min_epochs=config.min_epochs,
+            reduction_factor=config.reduction_factor,
+            latency_runs=config.latency_runs,
+            dvc_file=Path(self.config.pipeline_runner.dvc_file),
+            params_file=Path(self.params_filepath),
+            all_config=self.config,
+            all_params=self.params
+        )
+
+        return sweep_config
@@ -7,6 +7,17 @@ class DataIngestionConfig:
     source_URL: str         # URL to the data source
     local_data_file: Path   # Path to the local data file
     unzip_dir: Path         # Directory where data will be 
+    source_sha256: str      # Expected sha256 of the archive, not checked when None
+    manifest_file: Path     # Per-file hashes and sizes of the extracted data
+    extract_workers: int    # Number of threads extracting files in parallel
+
+
+@dataclass(frozen=True)
+class SplitIndexConfig:
+    index_file: Path
+    training_data: Path
+    params_validation_split: float
+    params_seed: int
 
 
 # Decorator to define a data class that is immutable (frozen)
@@ -29,6 +40,18 @@ class PrepareBaseModelConfig:
     params_weights: str  
     # Number of output classes for the classification task
     params_classes: int  
+    # Head architecture put on top of the backbone (see PrepareBaseModel.HEADS)
+    params_head_type: str
+    # Sizes of the optional hidden Dense layers of the head
+    params_head_hidden_units: list
+    # Dropout rate applied before each Dense layer of the head
+    params_head_dropout: float
+    # Backbone architecture (see PrepareBaseModel.BACKBONES)
+    params_backbone: str
+    # tf.distribute strategy the model is built under, None for the default
+    params_distribution_strategy: str
+    # Number of logical CPU replicas used by the mirrored strategy
+    params_num_cpu_replicas: int
 
 
 @dataclass(frozen=True)
@@ -36,6 +59,7 @@ class PrepareCallbacksConfig:
     root_dir: Path
     tensorboard_root_log_dir: Path
     checkpoint_model_filepath: Path
+    progress_file: Path
 
     from dataclasses import dataclass
 from pathlib import Path
@@ -49,8 +73,47 @@ class TrainingConfig:
     training_data: Path
     params_epochs: int
     params_batch_size: int
+    params_learning_rate: float
     params_is_augmentation: bool
     params_image_size: list
+    params_input_pipeline: str
+    params_data_cache: str
+    data_cache_dir: Path
+    params_use_feature_cache: bool
+    params_preprocessing: str
+    performance_file: Path
+    params_jit_compile: bool
+    params_mixed_precision: str
+    params_steps_per_execution: int
+    params_distribution_strategy: str
+    params_num_cpu_replicas: int
+    packed_data_dir: Path
+    split_index_file: Path
+    resume: bool
+    backup_dir: Path
+    backup_every_epochs: int
+    backup_keep: int
+    backup_clear_on_completion: bool
+
+
+@dataclass(frozen=True)
+class DatasetPackingConfig:
+    root_dir: Path
+    training_data: Path
+    params_image_size: list
+    params_batch_size: int
+    params_input_pipeline: str
+    shard_size: int
+
+
+@dataclass(frozen=True)
+class FeatureCacheConfig:
+    root_dir: Path
+    training_data: Path
+    params_image_size: list
+    params_batch_size: int
+    params_preprocessing: str
+    prune_stale: bool
 
 
 @dataclass(frozen=True)
@@ -59,4 +122,131 @@ class EvaluationConfig:
     training_data: Path
     all_params: dict
     params_image_size: list
-    params_batch_size: int
\ No newline at end of file
+    params_batch_size: int
+    params_input_pipeline: str
+    params_data_cache: str
+    data_cache_dir: Path
+    params_preprocessing: str
+    performance_file: Path
+    params_jit_compile: bool
+    packed_data_dir: Path
+    split_index_file: Path
+    extra_models: list
+    calibration_bins: int
+
+
+@dataclass(frozen=True)
+class ModelExportConfig:
+    root_dir: Path
+    saved_model_dir: Path
+    report_file: Path
+    path_of_model: Path
+    training_data: Path
+    scores_file: Path
+    params_image_size: list
+    params_batch_size: int
+    params_variants: list
+    params_representative_samples: int
+    params_benchmark_runs: int
+    params_num_threads: int
+    params_accuracy_budget: float
+    params_preprocessing: str
+    split_index_file: Path
+
+
+@dataclass(frozen=True)
+class PredictionConfig:
+    path_of_model: Path
+    num_threads: int
+    enable_batching: bool
+    max_batch_size: int
+    max_wait_ms: float
+    bulk_batch_size: int
+    decode_workers: int
+    draft_decode: bool
+    fuse_preprocessing: bool
+    use_registry: bool
+    registry_poll_s: float
+    warm_start: bool
+    warm_start_dir: Path
+    params_image_size: list
+    params_preprocessing: str
+
+
+@dataclass(frozen=True)
+class PredictionCacheConfig:
+    enabled: bool
+    max_entries: int
+    ttl_s: float
+    sqlite_path: Path
+
+
+@dataclass(frozen=True)
+class ServingConfig:
+    host: str
+    port: int
+    inference_workers: int
+    max_pending: int
+    request_timeout_s: float
+    retry_after_s: int
+    max_upload_mb: float
+
+
+@dataclass(frozen=True)
+class ModelRegistryConfig:
+    root_dir: Path
+    trained_model_path: Path
+    scores_file: Path
+    auto_promote: bool
+    keep_versions: int
+    params_image_size: list
+    params_preprocessing: str
+
+
+@dataclass(frozen=True)
+class PipelineRunnerConfig:
+    dvc_file: Path
+    config_file: Path
+    state_file: Path
+    runs_file: Path
+    metrics_file: Path
+    max_workers: int
+    all_config: dict
+    all_params: dict
+
+
+@dataclass(frozen=True)
+class TrainingJobsConfig:
+    root_dir: Path
+    progress_file: Path
+    trained_model_path: Path
+    command: list
+
+
+@dataclass(frozen=True)
+class InstrumentationConfig:
+    pipeline_metrics_file: Path
+    profiler: str  # None, cprofile or tf_profiler
+    profile_sample_rate: float
+    profile_dir: Path
+    max_profiles: int
+
+
+@dataclass(frozen=True)
+class SweepConfig:
+    root_dir: Path
+    shared_dir: Path
+    space: dict
+    search: str  # random or grid
+    num_trials: int
+    seed: int
+    max_parallel: int
+    threads_per_trial: int
+    early_stopping: str  # None, successive_halving or median
+    min_epochs: int
+    reduction_factor: int
+    latency_runs: int
+    dvc_file: Path
+    params_file: Path
+    all_config: dict
+    all_params: dict
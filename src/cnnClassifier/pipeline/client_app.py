@@ -0,0 +1,182 @@
+import contextlib
+import threading
+from cnnClassifier import logger
+from cnnClassifier.config.configuration import ConfigurationManager
+from cnnClassifier.pipeline.model_server import ModelServer
+from cnnClassifier.components.model_registry import ModelRegistry
+from cnnClassifier.components.prediction_cache import PredictionCache
+from cnnClassifier.components.training_jobs import TrainingJobManager, TrainingJobRunning
+from cnnClassifier.components.instrumentation import metrics, SampledProfiler, COLD_START, seconds_since_start
+
+
+class ModelNotReady(RuntimeError):
+    """The served model is still loading or failed to load."""
+
+
+class ClientApp:
+    """Serving state shared by the Flask and the ASGI front ends.
+
+    Besides the served model it implements the management endpoints, which
+    return a ``(payload, status code)`` pair so both front ends stay thin.
+    The model loads on a background thread, so the server is live at once
+    and ready when ``ready`` is set; until then model endpoints raise
+    ``ModelNotReady``.
+    """
+
+    # Requests that picked up the previous model get this long to finish after a swap
+    SWAP_GRACE_S = 30
+
+    def __init__(self):
+        self.config = ConfigurationManager()
+        self.instrumentation_config = self.config.get_instrumentation_config()
+        self.profiler = SampledProfiler(self.instrumentation_config)
+        cache_config = self.config.get_prediction_cache_config()
+        self.prediction_cache = PredictionCache(cache_config) if cache_config.enabled else None
+        self.training_jobs = TrainingJobManager(
+            config=self.config.get_training_jobs_config(),
+            on_model_updated=self.reload_model
+        )
+
+        self._model_server = None
+        self._load_lock = threading.Lock()
+        self.load_error = None
+        self.ready = threading.Event()
+        self.load_model_in_background()
+
+    def load_model_in_background(self):
+        threading.Thread(target=self._load_model, name="model-loader", daemon=True).start()
+
+    def _load_model(self):
+        with self._load_lock:
+            if self._model_server is not None:
+                return
+            self.load_error = None
+            try:
+                # The served model is shared by every request and swapped by the registry watcher
+                self._model_server = ModelServer(
+                    config=self.config.get_prediction_config(),
+                    registry=ModelRegistry(self.config.get_model_registry_config()),
+                    swap_grace_s=self.SWAP_GRACE_S,
+                    on_swap=self._on_model_swap
+                ).start()
+            except Exception as e:
+                # Kept until a training job or a reload brings a model
+                self.load_error = f"{type(e).__name__}: {e}"
+                logger.exception(e)
+                return
+        COLD_START.set(seconds_since_start(), phase="ready")
+        self.ready.set()
+        logger.info("Serving model ready")
+
+    @property
+    def model_server(self) -> ModelServer:
+        if self._model_server is None:
+            raise ModelNotReady(
+                f"Model failed to load: {self.load_error}" if self.load_error else "Model is still loading"
+            )
+        return self._model_server
+
+    def readiness(self):
+        """(payload, status code) of the readiness probe."""
+        if not self.ready.is_set():
+            return {"ready": False, "error": self.load_error}, 503
+        cold_start = {phase: value for _, (phase,), _, value in COLD_START.samples()}
+        return {"ready": True, "model": self.model_server.active.tag, "cold_start_s": cold_start}, 200
+
+    def stop(self):
+        if self._model_server is not None:
+            self._model_server.stop()
+
+    @property
+    def classifier(self):
+        return self.model_server.active.classifier
+
+    @property
+    def bulk_scorer(self):
+        return self.model_server.active.bulk_scorer
+
+    def _on_model_swap(self, served):
+        if self.prediction_cache is not None:
+            self.prediction_cache.invalidate()
+
+    def cache_key(self, image_bytes: bytes, served=None):
+        """Prediction cache key of ``image_bytes`` for the served model, None when caching is off."""
+        if self.prediction_cache is None:
+            return None
+        served = served or self.model_server.active
+        return self.prediction_cache.key(image_bytes, served.tag)
+
+    def predict(self, image_bytes: bytes, profile: bool = None):
+        """Prediction for ``image_bytes``; ``profile`` defaults to the sampling of the profiler."""
+        if profile is None:
+            profile = self.profiler.sample()
+        with self.profiler.profile("predict") if profile else contextlib.nullcontext():
+            # The model is picked once so a hot swap never mixes two versions in one request
+            served = self.model_server.active
+            key = self.cache_key(image_bytes, served)
+            if key is not None:
+                result = self.prediction_cache.get(key)
+                if result is not None:
+                    return result
+
+            result = served.classifier.predict(image_bytes)
+            if key is not None:
+                self.prediction_cache.put(key, result)
+            return result
+
+    def cache_stats(self) -> dict:
+        if self.prediction_cache is None:
+            return {"enabled": False}
+        return self.prediction_cache.stats()
+
+    def metrics(self) -> str:
+        """Metrics of this process and of the last pipeline run in the Prometheus text format."""
+        text = metrics.render()
+        pipeline_metrics_file = self.instrumentation_config.pipeline_metrics_file
+        if pipeline_metrics_file.exists():
+            text += pipeline_metrics_file.read_text()
+        return text
+
+    def reload_model(self, job=None):
+        if self._model_server is None:
+            # Nothing could be loaded before, e.g. no model was trained yet
+            self._load_model()
+            return
+        # With the registry the pipeline already promoted the new version; without
+        # it the model at prediction.model_path is reloaded
+        if self.model_server.refresh(force=True):
+            logger.info("Serving model reloaded" + (f" after training job {job['job_id']}" if job else ""))
+
+    def submit_training(self, stages: list = None):
+        try:
+            return self.training_jobs.submit(stages=stages), 202
+        except TrainingJobRunning as e:
+            return {"error": str(e), "job_id": e.job_id}, 409
+
+    def training_job(self, job_id: str):
+        try:
+            return self.training_jobs.status(job_id), 200
+        except KeyError:
+            return {"error": f"Unknown training job {job_id}"}, 404
+
+    def rollback_model(self):
+        try:
+            self.model_server.rollback()
+        except ValueError as e:
+            return {"error": str(e)}, 409
+        return self.model_server.status(), 200
+
+    def promote_model(self, version: str):
+        try:
+            self.model_server.promote(version)
+        except KeyError:
+            return {"error": f"Unknown model version {version}"}, 404
+        except ValueError as e:
+            return {"error": str(e)}, 409
+        return self.model_server.status(), 200
+
+    def batching_stats(self) -> dict:
+        batcher = self.classifier.batcher
+        if batcher is None:
+            return {"enabled": False}
+        return {"enabled": True, **batcher.stats()}
@@ -0,0 +1,194 @@
+import dataclasses
+import threading
+import time
+from dataclasses import dataclass
+from cnnClassifier import logger
+from cnnClassifier.components.bulk_scoring import BulkScorer
+from cnnClassifier.components.model_registry import ModelRegistry
+from cnnClassifier.components.warm_start import WarmStartCache
+from cnnClassifier.components.instrumentation import MODEL_LOAD_DURATION, MODEL_LOADS, ACTIVE_MODEL
+from cnnClassifier.entity.config_entity import PredictionConfig
+from cnnClassifier.pipeline.predict import PredictionPipeline
+
+
+@dataclass(frozen=True)
+class ServedModel:
+    version: str  # registry version, None for the model at prediction.model_path
+    tag: str  # identifies the loaded model, e.g. in prediction cache keys
+    classifier: PredictionPipeline
+    bulk_scorer: BulkScorer
+
+
+class ModelServer:
+    """Serves the promoted registry version and hot-swaps it without downtime.
+
+    A watcher thread polls ``serving.json`` of the registry. A newly promoted
+    version is loaded and warmed up in the background while the current one
+    keeps serving, then swapped in with a single reference assignment. The
+    version it replaced stays loaded, so a rollback is instant. Requests hold
+    on to the ServedModel they started with, and a model dropped from the
+    previous slot is only closed after ``swap_grace_s``.
+    """
+
+    def __init__(self, config: PredictionConfig, registry: ModelRegistry = None, swap_grace_s: float = 30,
+                 on_swap=None):
+        self.config = config
+        self.registry = registry if self.config.use_registry else None
+        self.swap_grace_s = swap_grace_s
+        # Called with the new ServedModel after every swap
+        self.on_swap = on_swap
+        self.warm_start = WarmStartCache(self.config.warm_start_dir) if self.config.warm_start else None
+        # Only one load at a time; serving never takes this lock
+        self._refresh_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._watcher = None
+        self._exports = []
+
+        self.previous = None
+        self.active = self._load(self._serving_version())
+        ACTIVE_MODEL.set(1, model=self.active.tag)
+
+    def _serving_version(self):
+        if self.registry is None:
+            return None
+        return self.registry.serving()["current"]
+
+    def _load(self, version: str = None) -> ServedModel:
+        start = time.perf_counter()
+        config = self.config
+        if version is not None:
+            # Versions carry the input settings they were trained with
+            metadata = self.registry.get(version)
+            config = dataclasses.replace(
+                config,
+                path_of_model=self.registry.model_path(version),
+                params_image_size=metadata["image_size"],
+                params_preprocessing=metadata["preprocessing"]
+            )
+        # The file of an unversioned model may be replaced in place
+        tag = version or f"{config.path_of_model}@{config.path_of_model.stat().st_mtime_ns}"
+
+        model_path, export_warm_start = config.path_of_model, False
+        if self.warm_start is not None and model_path.suffix.lower() in (".keras", ".h5"):
+            fused_preprocessing = config.params_preprocessing if config.fuse_preprocessing else None
+            saved_model = self.warm_start.get(model_path, fused_preprocessing)
+            if saved_model is not None:
+                config = dataclasses.replace(config, path_of_model=saved_model)
+            else:
+                export_warm_start = True
+
+        classifier = PredictionPipeline(config)
+        served = ServedModel(
+            version=version,
+            tag=tag,
+            classifier=classifier,
+            bulk_scorer=BulkScorer(
+                classifier=classifier,
+                batch_size=config.bulk_batch_size,
+                num_workers=config.decode_workers
+            )
+        )
+        load_time = time.perf_counter() - start
+        MODEL_LOAD_DURATION.set(load_time, model=served.tag)
+        MODEL_LOADS.inc()
+        logger.info(f"Model {version or model_path} loaded and warmed up in {load_time:.1f}s")
+        if export_warm_start:
+            # Exported in the background, so the next load of this model starts warm
+            export = threading.Thread(
+                target=self._export_warm_start, args=(model_path, fused_preprocessing),
+                name="warm-start-export", daemon=True
+            )
+            export.start()
+            self._exports.append(export)
+        return served
+
+    def _export_warm_start(self, model_path, preprocessing: str = None):
+        try:
+            self.warm_start.export(model_path, preprocessing)
+        except Exception as e:
+            # Serving goes on with the Keras model
+            logger.warning(f"Could not export the warm-start SavedModel of {model_path}: {e}")
+
+    def _retire(self, served: ServedModel):
+        if served is not None and served.classifier.batcher is not None:
+            timer = threading.Timer(self.swap_grace_s, served.classifier.batcher.close)
+            timer.daemon = True
+            timer.start()
+
+    def _swap(self, served: ServedModel):
+        retired, self.previous, self.active = self.previous, self.active, served
+        ACTIVE_MODEL.set(0, model=self.previous.tag)
+        ACTIVE_MODEL.set(1, model=served.tag)
+        if retired is not served:
+            self._retire(retired)
+        logger.info(f"Serving model version {served.version} (previous: {self.previous.version})")
+        if self.on_swap is not None:
+            self.on_swap(served)
+
+    def refresh(self, force: bool = False) -> bool:
+        """Swaps in the promoted version if it changed; returns whether a swap happened.
+
+        Without a registry the model at prediction.model_path is reloaded when ``force`` is set.
+        """
+        with self._refresh_lock:
+            version = self._serving_version()
+            if version is None and not force:
+                return False
+            if version is not None and version == self.active.version:
+                return False
+
+            if self.previous is not None and version is not None and version == self.previous.version:
+                served = self.previous
+            else:
+                served = self._load(version)
+            self._swap(served)
+            return True
+
+    def rollback(self) -> ServedModel:
+        """Goes back to the previous version, instantly when it is still loaded."""
+        if self.registry is not None:
+            # Other server processes follow the registry
+            self.registry.rollback()
+            self.refresh()
+            return self.active
+
+        with self._refresh_lock:
+            if self.previous is None:
+                raise ValueError("There is no previous model to roll back to")
+            self._swap(self.previous)
+            return self.active
+
+    def promote(self, version: str) -> ServedModel:
+        if self.registry is None:
+            raise ValueError("Serving from the model registry is disabled")
+        self.registry.promote(version)
+        self.refresh()
+        return self.active
+
+    def _watch(self):
+        while not self._stop.wait(self.config.registry_poll_s):
+            try:
+                self.refresh()
+            except Exception as e:
+                # A broken version must not stop the server from serving the current one
+                logger.exception(e)
+
+    def start(self):
+        if self.registry is not None and self._watcher is None:
+            self._watcher = threading.Thread(target=self._watch, name="model-registry-watcher", daemon=True)
+            self._watcher.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        # TensorFlow aborts the process when it exits while a thread is still exporting
+        for export in self._exports:
+            export.join()
+
+    def status(self) -> dict:
+        return {
+            "registry": self.registry is not None,
+            "active": self.active.version,
+            "previous": self.previous.version if self.previous is not None else None,
+            "versions": self.registry.versions() if self.registry is not None else []
+        }
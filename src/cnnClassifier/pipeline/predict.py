@@ -0,0 +1,89 @@
+import numpy as np
+from cnnClassifier.components.micro_batching import MicroBatcher
+from cnnClassifier.components.inference_backend import load_backend, KerasBackend, SavedModelBackend
+from cnnClassifier.components.preprocessing import decode_image, to_model_input, get_preprocessing_function
+from cnnClassifier.components.instrumentation import (
+    PREDICTION_STEP_DURATION, PREDICTION_IMAGES, PREDICTION_BATCH_SIZE, mark_first_prediction
+)
+from cnnClassifier.config.configuration import ConfigurationManager
+from cnnClassifier.entity.config_entity import PredictionConfig
+
+
+class PredictionPipeline:
+    # Class order follows flow_from_directory, which sorts the class folders
+    class_names = ["Coccidiosis", "Healthy"]
+
+    def __init__(self, config: PredictionConfig = None):
+        if config is None:
+            config = ConfigurationManager().get_prediction_config()
+        self.config = config
+        self.backend = load_backend(self.config.path_of_model, num_threads=self.config.num_threads)
+
+        # Only Keras models can take the preprocessing into their graph; exported
+        # TFLite and ONNX models keep getting float32 input, and SavedModels
+        # taking uint8 input were exported with the preprocessing fused
+        if isinstance(self.backend, KerasBackend):
+            self.fused = self.config.fuse_preprocessing
+            if self.fused:
+                self.backend.fuse_preprocessing(get_preprocessing_function(self.config.params_preprocessing))
+        else:
+            self.fused = isinstance(self.backend, SavedModelBackend) and self.backend.input_dtype == np.uint8
+        self.input_dtype = np.uint8 if self.fused else np.float32
+
+        self.warmup()
+
+        self.batcher = None
+        if self.config.enable_batching:
+            self.batcher = MicroBatcher(
+                predict_fn=self.predict_batch,
+                max_batch_size=self.config.max_batch_size,
+                max_wait_ms=self.config.max_wait_ms
+            )
+
+    def warmup(self):
+        # Build the predict function for the batch sizes the batcher sends, so
+        # neither concurrent requests nor the first ones after a swap pay for it
+        batch_sizes = {1}
+        if self.config.enable_batching:
+            batch_sizes.add(self.config.max_batch_size)
+        for batch_size in sorted(batch_sizes):
+            self.backend.predict_batch(
+                np.zeros((batch_size, *self.config.params_image_size), dtype=self.input_dtype)
+            )
+
+    def decode(self, image_bytes: bytes, out: np.ndarray = None) -> np.ndarray:
+        """uint8 image of the model input size, written to ``out`` when given, e.g. a row of a batch."""
+        with PREDICTION_STEP_DURATION.time(step="decode"):
+            return decode_image(image_bytes, self.config.params_image_size, draft=self.config.draft_decode, out=out)
+
+    def to_input(self, images: np.ndarray) -> np.ndarray:
+        """Model input of decoded uint8 images, one or a batch."""
+        # The model applies the backbone preprocessing itself when fused
+        if self.fused:
+            return images
+        with PREDICTION_STEP_DURATION.time(step="preprocess"):
+            return to_model_input(images, self.config.params_preprocessing)
+
+    def preprocess(self, image_bytes: bytes) -> np.ndarray:
+        # Same preprocessing as training: bilinear resize followed by the backbone preprocessing
+        return self.to_input(self.decode(image_bytes))
+
+    def predict_batch(self, batch: np.ndarray) -> np.ndarray:
+        with PREDICTION_STEP_DURATION.time(step="forward"):
+            probabilities = self.backend.predict_batch(batch)
+        PREDICTION_IMAGES.inc(len(batch))
+        PREDICTION_BATCH_SIZE.observe(len(batch))
+        return probabilities
+
+    def predict(self, image_bytes: bytes):
+        array = self.preprocess(image_bytes)
+        if self.batcher is not None:
+            probabilities = self.batcher.predict(array)
+        else:
+            probabilities = self.predict_batch(np.expand_dims(array, axis=0))[0]
+        return self.postprocess(probabilities)
+
+    def postprocess(self, probabilities: np.ndarray):
+        prediction = self.class_names[int(np.argmax(probabilities))]
+        mark_first_prediction()
+        return [{"image": prediction}]
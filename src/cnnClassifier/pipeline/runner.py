@@ -0,0 +1,221 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from pathlib import Path
+import yaml
+from cnnClassifier import logger
+from cnnClassifier.entity.config_entity import PipelineRunnerConfig
+from cnnClassifier.utils.common import append_json, path_fingerprint
+from cnnClassifier.components.instrumentation import (metrics, PIPELINE_FAMILIES, STAGE_DURATION,
+                                                      STAGE_RUNS, PIPELINE_LAST_RUN)
+from cnnClassifier.pipeline import (stage_1_data_ingestion,
+                                    stage_02_prepare_base_model,
+                                    stage_03_training,
+                                    stage_04_evaluation,
+                                    stage_05_model_export,
+                                    stage_06_dataset_packing,
+                                    stage_07_model_registry)
+
+
+# dvc.yaml stage name -> (stage module, pipeline class, config.yaml sections the stage reads).
+# Only these sections are hashed, so editing an unrelated part of config.yaml
+# does not invalidate the stage.
+STAGES = {
+    "data_ingestion": (
+        stage_1_data_ingestion, stage_1_data_ingestion.DataIngestionTrainingPipeline,
+        ["data_ingestion", "split_index"]
+    ),
+    "dataset_packing": (
+        stage_06_dataset_packing, stage_06_dataset_packing.DatasetPackingPipeline,
+        ["data_ingestion", "dataset_packing"]
+    ),
+    "prepare_base_model": (
+        stage_02_prepare_base_model, stage_02_prepare_base_model.PrepareBaseModelTrainingPipeline,
+        ["prepare_base_model"]
+    ),
+    "training": (
+        stage_03_training, stage_03_training.ModelTrainingPipeline,
+        ["data_ingestion", "split_index", "dataset_packing", "prepare_base_model",
+         "prepare_callbacks", "training", "input_pipeline", "feature_cache"]
+    ),
+    "evaluation": (
+        stage_04_evaluation, stage_04_evaluation.EvaluationPipeline,
+        ["split_index", "dataset_packing", "training", "evaluation", "input_pipeline"]
+    ),
+    "model_export": (
+        stage_05_model_export, stage_05_model_export.ModelExportPipeline,
+        ["data_ingestion", "split_index", "training", "model_export"]
+    ),
+    "model_registry": (
+        stage_07_model_registry, stage_07_model_registry.ModelRegistryPipeline,
+        ["training", "model_registry"]
+    )
+}
+
+
+class StageRunner:
+    """Runs the dvc.yaml stage graph in-process, skipping up-to-date stages.
+
+    A stage is up to date when its outputs exist and the hash of its config
+    sections, params and dependencies matches the one recorded after its last
+    successful run. Dependencies are fingerprinted by path, size and mtime,
+    like make does, and stages marked ``always_changed`` always run. Stages
+    whose upstream stages are done run concurrently.
+    """
+
+    def __init__(self, config: PipelineRunnerConfig):
+        self.config = config
+        with open(self.config.dvc_file) as f:
+            self.stages = yaml.safe_load(f)["stages"]
+
+        unknown = set(self.stages) - set(STAGES)
+        if unknown:
+            raise ValueError(f"No pipeline registered for the dvc stages: {sorted(unknown)}")
+
+        self.upstream = {name: self._upstream(name) for name in self.stages}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _outs(stage: dict) -> list:
+        outs = []
+        for out in stage.get("outs", []) + stage.get("metrics", []):
+            # Entries are either a path or a {path: options} mapping
+            outs.extend(out if isinstance(out, dict) else [out])
+        return [Path(out) for out in outs]
+
+    def _upstream(self, name: str) -> set:
+        deps = [Path(dep) for dep in self.stages[name].get("deps", [])]
+        return {
+            other for other, stage in self.stages.items() if other != name and any(
+                dep == out or out in dep.parents for dep in deps for out in self._outs(stage)
+            )
+        }
+
+    def stage_hash(self, name: str) -> str:
+        stage = self.stages[name]
+        _, _, sections = STAGES[name]
+        digest = hashlib.sha256()
+        digest.update(json.dumps({
+            "cmd": stage["cmd"],
+            "config": {section: self.config.all_config.get(section) for section in sections},
+            "params": {param: self.config.all_params.get(param) for param in stage.get("params", [])}
+        }, sort_keys=True, default=str).encode())
+
+        for dep in stage.get("deps", []):
+            # config.yaml is covered by the sections above
+            if Path(dep) == Path(self.config.config_file):
+                continue
+            digest.update(f"{dep}\0{path_fingerprint(Path(dep))}\n".encode())
+        return digest.hexdigest()
+
+    def _load_state(self) -> dict:
+        if Path(self.config.state_file).exists():
+            with open(self.config.state_file) as f:
+                return json.load(f)
+        return {}
+
+    def _save_stage_state(self, name: str, record: dict):
+        with self._lock:
+            state = self._load_state()
+            state[name] = record
+            state_file = Path(self.config.state_file)
+            state_file.parent.mkdir(parents=True, exist_ok=True)
+            tmp_file = state_file.with_name(state_file.name + ".tmp")
+            with open(tmp_file, "w") as f:
+                json.dump(state, f, indent=4)
+            os.replace(tmp_file, state_file)
+
+    def is_up_to_date(self, name: str, stage_hash: str) -> bool:
+        if self.stages[name].get("always_changed"):
+            return False
+        record = self._load_state().get(name)
+        outs_exist = all(out.exists() for out in self._outs(self.stages[name]))
+        return record is not None and record["hash"] == stage_hash and outs_exist
+
+    def _run_stage(self, name: str, force: bool) -> dict:
+        module, pipeline, _ = STAGES[name]
+        stage_hash = self.stage_hash(name)
+        if not force and self.is_up_to_date(name, stage_hash):
+            logger.info(f">>>>>> stage {module.STAGE_NAME} is up to date, skipped <<<<<<")
+            STAGE_RUNS.inc(stage=name, status="skipped")
+            return {"stage": name, "status": "skipped", "wall_time_s": 0.}
+
+        logger.info(f"*******************")
+        logger.info(f">>>>>> stage {module.STAGE_NAME} started <<<<<<")
+        start = time.perf_counter()
+        try:
+            pipeline().main()
+        except Exception:
+            STAGE_RUNS.inc(stage=name, status="failed")
+            raise
+        wall_time = time.perf_counter() - start
+        STAGE_DURATION.set(wall_time, stage=name)
+        STAGE_RUNS.inc(stage=name, status="ran")
+        logger.info(f">>>>>> stage {module.STAGE_NAME} completed in {wall_time:.1f}s <<<<<<\n\nx==========x")
+
+        self._save_stage_state(name, {
+            "hash": stage_hash,
+            "finished": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "wall_time_s": wall_time
+        })
+        return {"stage": name, "status": "ran", "wall_time_s": wall_time}
+
+    def _with_upstream(self, names: list) -> set:
+        selected, pending = set(), list(names)
+        while pending:
+            name = pending.pop()
+            if name not in self.stages:
+                raise ValueError(f"Unknown stage: {name}, expected one of {list(self.stages)}")
+            if name not in selected:
+                selected.add(name)
+                pending.extend(self.upstream[name])
+        return selected
+
+    def run(self, stages: list = None, force: bool = False) -> list:
+        """Runs ``stages`` (all by default) and the stages they depend on.
+
+        ``force`` re-runs the selected stages even when they are up to date.
+        Returns one record per stage with its status and wall time.
+        """
+        pending = self._with_upstream(stages or list(self.stages))
+        forced = set(stages or self.stages) if force else set()
+        running, records, error = {}, [], None
+        start = time.perf_counter()
+
+        with ThreadPoolExecutor(max_workers=self.config.max_workers) as executor:
+            while (pending and error is None) or running:
+                if error is None:
+                    # Stages in dvc.yaml order whose upstream stages have all finished
+                    for name in [n for n in self.stages if n in pending]:
+                        if not self.upstream[name] & (pending | set(running.values())):
+                            pending.discard(name)
+                            running[executor.submit(self._run_stage, name, name in forced)] = name
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    try:
+                        records.append(future.result())
+                    except Exception as e:
+                        logger.exception(e)
+                        records.append({"stage": name, "status": "failed", "wall_time_s": None})
+                        error = error or e
+
+        wall_time = time.perf_counter() - start
+        append_json(path=Path(self.config.runs_file), data={
+            "timestamp": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "wall_time_s": wall_time,
+            "stages": records
+        })
+        PIPELINE_LAST_RUN.set(time.time())
+        metrics.write(self.config.metrics_file, PIPELINE_FAMILIES)
+        logger.info(
+            f"Pipeline finished in {wall_time:.1f}s: " +
+            ", ".join(f"{r['stage']} {r['status']}" for r in records)
+        )
+        if error is not None:
+            raise error
+        return records
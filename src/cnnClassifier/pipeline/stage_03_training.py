@@ -0,0 +1,50 @@
+from cnnClassifier.config.configuration import ConfigurationManager
+from cnnClassifier.components.prepare_callbacks import PrepareCallback, InstrumentationCallback
+from cnnClassifier.components.instrumentation import SampledProfiler
+from cnnClassifier.components.feature_cache import FeatureCache
+from cnnClassifier.components.training import Training
+from cnnClassifier import logger
+
+
+STAGE_NAME = "Training"
+
+
+class ModelTrainingPipeline:
+    def __init__(self):
+        pass
+
+    def main(self):
+        config = ConfigurationManager()
+        prepare_callbacks_config = config.get_prepare_callback_config()
+        prepare_callbacks = PrepareCallback(config=prepare_callbacks_config)
+        callback_list = prepare_callbacks.get_tb_ckpt_callbacks()
+
+        training_config = config.get_training_config()
+        training = Training(config=training_config)
+        callback_list.append(InstrumentationCallback(
+            batch_size=training.global_batch_size,
+            profiler=SampledProfiler(config.get_instrumentation_config())
+        ))
+        training.get_base_model()
+
+        if training_config.params_use_feature_cache:
+            feature_cache = FeatureCache(config=config.get_feature_cache_config())
+            training.train_on_cached_features(
+                feature_cache=feature_cache,
+                callback_list=callback_list
+            )
+        else:
+            training.train_valid_generator()
+            training.train(callback_list=callback_list)
+
+
+if __name__ == '__main__':
+    try:
+        logger.info(f"*******************")
+        logger.info(f">>>>>> stage {STAGE_NAME} started <<<<<<")
+        obj = ModelTrainingPipeline()
+        obj.main()
+        logger.info(f">>>>>> stage {STAGE_NAME} completed <<<<<<\n\nx==========x")
+    except Exception as e:
+        logger.exception(e)
+        raise e
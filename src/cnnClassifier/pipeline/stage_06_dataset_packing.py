@@ -0,0 +1,33 @@
+from cnnClassifier.config.configuration import ConfigurationManager
+from cnnClassifier.components.dataset_packing import DatasetPacking
+from cnnClassifier import logger
+
+
+STAGE_NAME = "Dataset packing stage"
+
+
+class DatasetPackingPipeline:
+    def __init__(self):
+        pass
+
+    def main(self):
+        config = ConfigurationManager()
+        dataset_packing_config = config.get_dataset_packing_config()
+        if dataset_packing_config.params_input_pipeline != "packed":
+            # Shards packed earlier are left as they are, so the stages reading them are not invalidated
+            logger.info(f"INPUT_PIPELINE is {dataset_packing_config.params_input_pipeline}, dataset packing skipped")
+            return
+        dataset_packing = DatasetPacking(config=dataset_packing_config)
+        dataset_packing.pack()
+
+
+if __name__ == '__main__':
+    try:
+        logger.info(f"*******************")
+        logger.info(f">>>>>> stage {STAGE_NAME} started <<<<<<")
+        obj = DatasetPackingPipeline()
+        obj.main()
+        logger.info(f">>>>>> stage {STAGE_NAME} completed <<<<<<\n\nx==========x")
+    except Exception as e:
+        logger.exception(e)
+        raise e
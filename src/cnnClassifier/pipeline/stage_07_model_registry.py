@@ -0,0 +1,46 @@
+from cnnClassifier.config.configuration import ConfigurationManager
+from cnnClassifier.components.model_registry import ModelRegistry
+from cnnClassifier.components.warm_start import WarmStartCache
+from cnnClassifier import logger
+
+
+STAGE_NAME = "Model registry stage"
+
+
+class ModelRegistryPipeline:
+    def __init__(self):
+        pass
+
+    def main(self):
+        config = ConfigurationManager()
+        model_registry_config = config.get_model_registry_config()
+        model_registry = ModelRegistry(config=model_registry_config)
+        metadata = model_registry.register(
+            model_path=model_registry_config.trained_model_path,
+            scores_file=model_registry_config.scores_file
+        )
+        prediction_config = config.get_prediction_config()
+        warm_start = WarmStartCache(prediction_config.warm_start_dir)
+        if prediction_config.warm_start:
+            # Exported before the version is promoted, so servers load it warm right away
+            warm_start.export(
+                model_registry.model_path(metadata["version"]),
+                metadata["preprocessing"] if prediction_config.fuse_preprocessing else None
+            )
+        if model_registry_config.auto_promote:
+            model_registry.promote(metadata["version"])
+        model_registry.prune()
+        # SavedModels of pruned versions go too
+        warm_start.prune()
+
+
+if __name__ == '__main__':
+    try:
+        logger.info(f"*******************")
+        logger.info(f">>>>>> stage {STAGE_NAME} started <<<<<<")
+        obj = ModelRegistryPipeline()
+        obj.main()
+        logger.info(f">>>>>> stage {STAGE_NAME} completed <<<<<<\n\nx==========x")
+    except Exception as e:
+        logger.exception(e)
+        raise e
@@ -0,0 +1,76 @@
+"""Runs pipeline stages in a sweep workspace, launched by the hyperparameter sweep.
+
+The process is pinned to the CPUs of its slot and TensorFlow to as many
+threads, so concurrent trials do not oversubscribe the machine. Writes the
+wall time of every stage and the single-image latency of the trained model
+to ``result.json`` in the working directory.
+"""
+import argparse
+import json
+import os
+import time
+import numpy as np
+from cnnClassifier import logger
+
+
+def measure_latency(model_path, runs: int) -> float:
+    """Median milliseconds of a forward pass on a single image, after warming up."""
+    from cnnClassifier.components.inference_backend import load_backend
+
+    backend = load_backend(model_path)
+    batch = np.zeros((1, *backend.model.input_shape[1:]), dtype=np.float32)
+    for _ in range(3):
+        backend.predict_batch(batch)
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        backend.predict_batch(batch)
+        timings.append(time.perf_counter() - start)
+    return float(np.median(timings) * 1000)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("stages", nargs="+")
+    parser.add_argument("--cpus", default=None, help="comma-separated CPUs to run on")
+    parser.add_argument("--latency-runs", type=int, default=0, help="forward passes to time, 0 to skip")
+    args = parser.parse_args(argv)
+
+    threads = None
+    if args.cpus:
+        cpus = [int(cpu) for cpu in args.cpus.split(",")]
+        if hasattr(os, "sched_setaffinity"):
+            os.sched_setaffinity(0, cpus)
+        threads = len(cpus)
+
+    import tensorflow as tf
+    from cnnClassifier.config.configuration import ConfigurationManager
+    from cnnClassifier.pipeline.runner import STAGES
+
+    if threads:
+        # Only takes effect before TensorFlow runs its first op
+        tf.config.threading.set_intra_op_parallelism_threads(threads)
+        tf.config.threading.set_inter_op_parallelism_threads(min(threads, 2))
+
+    result = {"stages": {}, "latency_ms": None}
+    for name in args.stages:
+        _, pipeline, _ = STAGES[name]
+        start = time.perf_counter()
+        pipeline().main()
+        result["stages"][name] = time.perf_counter() - start
+        logger.info(f"Sweep stage {name} completed in {result['stages'][name]:.1f}s")
+
+    if args.latency_runs:
+        model_path = ConfigurationManager().get_training_config().trained_model_path
+        result["latency_ms"] = measure_latency(model_path, args.latency_runs)
+
+    with open("result.json", "w") as f:
+        json.dump(result, f, indent=4)
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except Exception as e:
+        logger.exception(e)
+        raise e
@@ -1,15 +1,16 @@
 # Import required modules and classes
 import os  # Provides functions for interacting with the operating system
+import hashlib  # Digests for fingerprinting directory trees
 from box.exceptions import BoxValueError  # Exception handling for BoxValueError
 import yaml  # Handles reading and writing YAML files
 from cnnClassifier import logger  # Custom logger for logging messages in the cnnClassifier module
 import json  # Provides functions for reading and writing JSON data
-import joblib  # For saving and loading binary (serialized) data
 from ensure import ensure_annotations  # A decorator to ensure function annotations are validated at runtime
 from box import ConfigBox  # A dictionary-like container that allows dot notation access
 from pathlib import Path  # Path management for different OS file systems
 from typing import Any  # Allows use of the Any type for general type annotation
 import base64  # Provides functions for encoding and decoding base64 data (commonly used for image data)
+import socket  # Finds free TCP ports for local servers and workers
 
 
 @ensure_annotations
@@ -76,6 +77,27 @@ def save_json(path: Path, data: dict):
     logger.info(f"json file saved at: {path}")
 
 
+@ensure_annotations
+def append_json(path: Path, data: dict):
+    """Appends a record to a JSON file holding a list of records.
+
+    Args:
+        path (Path): Path of the JSON file, created if it does not exist.
+        data (dict): Record to append.
+    """
+    # Load the existing records, if any
+    records = []
+    if os.path.exists(path):
+        with open(path) as f:
+            records = json.load(f)
+    records.append(data)
+    # Write all records back with indentation for readability
+    with open(path, "w") as f:
+        json.dump(records, f, indent=4)
+    # Log success of appending to the JSON file
+    logger.info(f"json record appended to: {path}")
+
+
 @ensure_annotations
 def load_json(path: Path) -> ConfigBox:
     """Loads JSON file data.
@@ -104,6 +126,8 @@ def save_bin(data: Any, path: Path):
         data (Any): Data to save as binary.
         path (Path): Path to save the binary file.
     """
+    # joblib is imported on first use, it adds a noticeable delay to every import of this module
+    import joblib
     # Save the data in binary format using joblib
     joblib.dump(value=data, filename=path)
     # Log success of saving binary file
@@ -120,6 +144,7 @@ def load_bin(path: Path) -> Any:
     Returns:
         Any: The deserialized data from the binary file.
     """
+    import joblib
     # Load data from the binary file
     data = joblib.load(path)
     # Log successful loading of binary file
@@ -144,6 +169,47 @@ def get_size(path: Path) -> str:
     return f"~ {size_in_kb} KB"
 
 
+def path_fingerprint(path: Path) -> str:
+    """Fingerprints a file or directory tree by path, size and mtime, like make does.
+
+    Args:
+        path (Path): File or directory to fingerprint.
+
+    Returns:
+        str: "missing", the size and mtime of a file, or a digest over the files of a directory.
+    """
+    path = Path(path)
+    if not path.exists():
+        return "missing"
+    if path.is_file():
+        stat = path.stat()
+        return f"{stat.st_size}:{stat.st_mtime_ns}"
+
+    # Walk the tree in a stable order so the digest only changes with the files
+    digest = hashlib.sha256()
+    for root, dirs, files in os.walk(path):
+        dirs.sort()
+        for file in sorted(files):
+            stat = os.stat(os.path.join(root, file))
+            relpath = os.path.relpath(os.path.join(root, file), path)
+            digest.update(f"{relpath}\0{stat.st_size}\0{stat.st_mtime_ns}\n".encode())
+    return digest.hexdigest()
+
+
+def free_port(host: str = "127.0.0.1") -> int:
+    """Finds a TCP port that is free on ``host``.
+
+    Args:
+        host (str): Interface to bind to.
+
+    Returns:
+        int: A port the OS reported free; another process may still take it before it is used.
+    """
+    with socket.socket() as s:
+        s.bind((host, 0))
+        return s.getsockname()[1]
+
+
 def decodeImage(imgstring, fileName):
     """Decodes a base64-encoded image string and saves it as a file.
 
@@ -161,6 +227,19 @@ def decodeImage(imgstring, fileName):
         f.close()
 
 
+def decodeImageBytes(imgstring) -> bytes:
+    """Decodes a base64-encoded image string into raw bytes held in memory.
+
+    Args:
+        imgstring (str): Base64 encoded string of the image.
+
+    Returns:
+        bytes: The decoded image data.
+    """
+    # Decode the base64 image string without touching the filesystem
+    return base64.b64decode(imgstring)
+
+
 def encodeImageIntoBase64(croppedImagePath):
     """Encodes an image file as a base64 string.
 
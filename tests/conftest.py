@@ -0,0 +1,103 @@
+"""Synthetic datasets and pipeline workspaces shared by the tests."""
+import os
+import subprocess
+import sys
+import zipfile
+from pathlib import Path
+import numpy as np
+import pytest
+import yaml
+from PIL import Image, ImageFilter
+
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+DATASET_NAME = "Chicken-fecal-images"
+CLASS_NAMES = ["Coccidiosis", "Healthy"]
+
+
+def synthetic_image(rng: np.random.Generator, class_index: int, size: tuple = (96, 96)) -> Image.Image:
+    """A smooth, noisy image whose colour depends on the class."""
+    width, height = size
+    base = rng.normal(90 + 80 * class_index, 25, (max(height // 16, 1), max(width // 16, 1), 3))
+    image = Image.fromarray(np.clip(base, 0, 255).astype(np.uint8)).resize(size, Image.BICUBIC)
+    noise = Image.fromarray(rng.integers(0, 255, (height, width, 3), dtype=np.uint8)).filter(ImageFilter.GaussianBlur(1))
+    return Image.blend(image, noise, 0.2)
+
+
+def write_dataset(root: Path, images_per_class: int, size: tuple = (96, 96), seed: int = 0) -> Path:
+    """Writes ``root/Chicken-fecal-images/<class>/*.jpg`` like the real dataset."""
+    rng = np.random.default_rng(seed)
+    data_dir = Path(root) / DATASET_NAME
+    for class_index, class_name in enumerate(CLASS_NAMES):
+        (data_dir / class_name).mkdir(parents=True, exist_ok=True)
+        for i in range(images_per_class):
+            synthetic_image(rng, class_index, size).save(data_dir / class_name / f"{class_name[0]}{i:04d}.jpg", quality=90)
+    return data_dir
+
+
+def write_archive(data_dir: Path, archive: Path) -> Path:
+    """Zips ``data_dir`` with the layout of the published archive."""
+    with zipfile.ZipFile(archive, "w", zipfile.ZIP_STORED) as zip_ref:
+        for path in sorted(Path(data_dir).rglob("*.jpg")):
+            zip_ref.write(path, path.relative_to(Path(data_dir).parent).as_posix())
+    return Path(archive)
+
+
+@pytest.fixture
+def dataset_factory():
+    return write_dataset
+
+
+@pytest.fixture
+def archive_factory():
+    return write_archive
+
+
+@pytest.fixture
+def workspace_factory(tmp_path, monkeypatch):
+    """Builds a project in ``tmp_path`` over a synthetic archive and makes it the working directory.
+
+    ``params`` and ``config`` override params.yaml and sections of
+    config.yaml; the backbone is left untrained so the tests run offline.
+    """
+    def make(params: dict, config: dict = None, images_per_class: int = 16, size: tuple = (96, 96)) -> Path:
+        archive = tmp_path / "source" / f"{DATASET_NAME}.zip"
+        write_archive(write_dataset(tmp_path / "source", images_per_class, size), archive)
+
+        with open(REPO_ROOT / "config" / "config.yaml") as f:
+            all_config = yaml.safe_load(f)
+        all_config["data_ingestion"]["source_URL"] = str(archive)
+        all_config["data_ingestion"]["source_sha256"] = None
+        for section, values in (config or {}).items():
+            all_config[section].update(values)
+        (tmp_path / "config").mkdir()
+        with open(tmp_path / "config" / "config.yaml", "w") as f:
+            yaml.safe_dump(all_config, f, sort_keys=False)
+
+        with open(REPO_ROOT / "params.yaml") as f:
+            all_params = yaml.safe_load(f)
+        all_params.update(params)
+        all_params[all_params["BACKBONE"]]["weights"] = None
+        with open(tmp_path / "params.yaml", "w") as f:
+            yaml.safe_dump(all_params, f, sort_keys=False)
+
+        (tmp_path / "dvc.yaml").write_bytes((REPO_ROOT / "dvc.yaml").read_bytes())
+        # dvc.yaml dependencies are relative to the project
+        os.symlink(REPO_ROOT / "src", tmp_path / "src")
+
+        pythonpath = os.pathsep.join(filter(None, [str(REPO_ROOT / "src"), os.environ.get("PYTHONPATH")]))
+        monkeypatch.setenv("PYTHONPATH", pythonpath)
+        monkeypatch.chdir(tmp_path)
+        return tmp_path
+
+    return make
+
+
+@pytest.fixture
+def run_stages():
+    """Runs pipeline stages of the working directory in a subprocess, like main.py."""
+    def run(*stages: str, force: bool = False):
+        command = [sys.executable, str(REPO_ROOT / "main.py"), *stages] + (["--force"] if force else [])
+        subprocess.run(command, check=True)
+
+    return run
@@ -0,0 +1,70 @@
+"""Profiled /predict requests take the same path as the others."""
+import io
+import time
+from pathlib import Path
+import numpy as np
+import pytest
+
+pytest.importorskip("tensorflow")
+pytest.importorskip("httpx")
+
+from PIL import Image
+from starlette.testclient import TestClient
+
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+
+
+@pytest.fixture
+def client(workspace_factory, run_stages, monkeypatch):
+    workspace_factory(
+        params={"BACKBONE": "MobileNetV3Small", "IMAGE_SIZE": [32, 32, 3], "INPUT_PIPELINE": "tf_data"},
+        config={
+            # The untrained model is enough to serve predictions
+            "prediction": {
+                "model_path": "artifacts/prepare_base_model/base_model_updated.keras",
+                "use_registry": False,
+                "warm_start": False
+            },
+            "prediction_cache": {"enabled": False},
+            "instrumentation": {"profiler": "cprofile", "profile_sample_rate": 1.0}
+        }
+    )
+    run_stages("data_ingestion", "prepare_base_model")
+    monkeypatch.syspath_prepend(str(REPO_ROOT))
+    import asgi_app
+
+    with TestClient(asgi_app.app) as client:
+        for _ in range(600):
+            if client.get("/readyz").status_code == 200:
+                break
+            time.sleep(0.1)
+        yield client
+
+
+def jpeg() -> bytes:
+    buffer = io.BytesIO()
+    Image.fromarray(np.random.default_rng(0).integers(0, 255, (48, 48, 3), dtype=np.uint8)).save(buffer, "JPEG")
+    return buffer.getvalue()
+
+
+def test_profiled_requests_take_the_same_path(client):
+    profiler = client.app.state.client_app.profiler
+    profile_dir = Path(profiler.config.profile_dir)
+    headers = {"content-type": "image/jpeg"}
+
+    profiled = client.post("/predict", content=jpeg(), headers=headers)
+    assert profiled.status_code == 200
+    assert len(list(profile_dir.glob("predict_*.prof"))) == 1
+
+    # A broken image is the client's error, profiled or not
+    response = client.post("/predict", content=b"not an image", headers=headers)
+    assert response.status_code == 400
+    assert "Could not decode image" in response.json()["error"]
+    assert len(list(profile_dir.glob("predict_*.prof"))) == 2
+
+    profiler.enabled = False
+    unprofiled = client.post("/predict", content=jpeg(), headers=headers)
+    assert unprofiled.status_code == 200
+    assert unprofiled.json() == profiled.json()
+    assert len(list(profile_dir.glob("predict_*.prof"))) == 2
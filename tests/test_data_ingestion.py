@@ -0,0 +1,221 @@
+"""Resuming interrupted downloads and incremental extraction of the source archive."""
+import http.server
+import json
+import threading
+import time
+import zipfile
+from pathlib import Path
+import pytest
+from cnnClassifier.components.data_ingestion import DataIngestion
+from cnnClassifier.entity.config_entity import DataIngestionConfig
+
+
+class ArchiveHandler(http.server.BaseHTTPRequestHandler):
+    """Serves ``server.content`` with Range and If-Range support, like a static file server."""
+
+    def do_GET(self):
+        content, etag = self.server.content, self.server.etag
+        self.server.requests.append(dict(self.headers))
+        range_header = self.headers.get("Range")
+        if range_header and self.headers.get("If-Range") in (None, etag):
+            start = int(range_header.split("=")[1].rstrip("-"))
+            if start >= len(content):
+                self.send_response(416)
+                self.send_header("Content-Range", f"bytes */{len(content)}")
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            body = content[start:]
+            self.send_response(206)
+            self.send_header("Content-Range", f"bytes {start}-{len(content) - 1}/{len(content)}")
+        else:
+            body = content
+            self.send_response(200)
+        self.send_header("ETag", etag)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), ArchiveHandler)
+    server.content, server.etag, server.requests = b"0123456789" * 100, '"v1"', []
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+
+
+def ingestion(tmp_path: Path, server, sha256: str = None) -> DataIngestion:
+    return DataIngestion(DataIngestionConfig(
+        root_dir=tmp_path,
+        source_URL=f"http://127.0.0.1:{server.server_address[1]}/data.zip",
+        local_data_file=tmp_path / "data.zip",
+        unzip_dir=tmp_path / "data",
+        source_sha256=sha256,
+        manifest_file=tmp_path / "manifest.json",
+        extract_workers=1
+    ))
+
+
+def interrupt(tmp_path: Path, server, length: int):
+    """Leaves the state of a download of the current content interrupted after ``length`` bytes."""
+    ingestion(tmp_path, server).download_file()
+    local_data_file = tmp_path / "data.zip"
+    partial_file = tmp_path / "data.zip.part"
+    partial_file.write_bytes(local_data_file.read_bytes()[:length])
+    DataIngestion._validator_file(partial_file).write_text(json.dumps({
+        "url": ingestion(tmp_path, server).config.source_URL, "validator": server.etag
+    }))
+    local_data_file.unlink()
+    server.requests.clear()
+
+
+def test_resumes_an_unchanged_source(tmp_path, server):
+    interrupt(tmp_path, server, 300)
+    ingestion(tmp_path, server).download_file()
+    assert (tmp_path / "data.zip").read_bytes() == server.content
+    assert server.requests[0]["Range"] == "bytes=300-"
+    assert server.requests[0]["If-Range"] == '"v1"'
+    assert not (tmp_path / "data.zip.part.json").exists()
+
+
+def test_restarts_when_the_source_changed(tmp_path, server):
+    interrupt(tmp_path, server, 300)
+    server.content, server.etag = b"abcdefghij" * 120, '"v2"'
+    ingestion(tmp_path, server).download_file()
+    assert (tmp_path / "data.zip").read_bytes() == server.content
+
+
+def test_restarts_without_a_stored_validator(tmp_path, server):
+    interrupt(tmp_path, server, 300)
+    (tmp_path / "data.zip.part.json").unlink()
+    ingestion(tmp_path, server).download_file()
+    assert "Range" not in server.requests[0]
+    assert (tmp_path / "data.zip").read_bytes() == server.content
+
+
+def test_completes_a_partial_file_that_was_already_whole(tmp_path, server):
+    interrupt(tmp_path, server, len(server.content))
+    ingestion(tmp_path, server).download_file()
+    assert (tmp_path / "data.zip").read_bytes() == server.content
+
+    # With a checksum, the complete partial file is verified and kept without downloading it again
+    sha256 = DataIngestion.sha256(tmp_path / "data.zip")
+    interrupt(tmp_path, server, len(server.content))
+    ingestion(tmp_path, server, sha256).download_file()
+    assert len(server.requests) == 1
+    assert (tmp_path / "data.zip").read_bytes() == server.content
+
+
+# ----------------------------------------------------------------------
+# Incremental extraction
+
+def write_zip(path: Path, entries: dict) -> Path:
+    with zipfile.ZipFile(path, "w") as zip_ref:
+        for name, content in entries.items():
+            zip_ref.writestr(name, content)
+    return path
+
+
+def local_ingestion(tmp_path: Path, source: Path, extract_workers: int = 1) -> DataIngestion:
+    return DataIngestion(DataIngestionConfig(
+        root_dir=tmp_path,
+        source_URL=str(source),
+        local_data_file=tmp_path / "data.zip",
+        unzip_dir=tmp_path / "data",
+        source_sha256=None,
+        manifest_file=tmp_path / "manifest.json",
+        extract_workers=extract_workers
+    ))
+
+
+@pytest.fixture
+def written(tmp_path, monkeypatch):
+    """Names of the files the extractions write, with the threads writing them."""
+    unzip_dir = (tmp_path / "data").resolve()
+    write_atomic = DataIngestion._write_atomic
+
+    def spy(target, source):
+        spy.names.append(target.relative_to(unzip_dir).as_posix())
+        spy.threads.add(threading.get_ident())
+        # Lets the other workers pick up entries meanwhile
+        time.sleep(0.001)
+        write_atomic(target, source)
+
+    spy.names, spy.threads = [], set()
+    monkeypatch.setattr(DataIngestion, "_write_atomic", staticmethod(spy))
+    return spy
+
+
+def extracted(tmp_path: Path) -> dict:
+    data_dir = tmp_path / "data"
+    return {path.relative_to(data_dir).as_posix(): path.read_bytes() for path in data_dir.rglob("*") if path.is_file()}
+
+
+def test_only_changed_entries_are_extracted_again(tmp_path, written):
+    entries = {f"images/a/{i}.jpg": f"image {i}".encode() for i in range(5)}
+    archive = write_zip(tmp_path / "source.zip", entries)
+    local_ingestion(tmp_path, archive).extract_zip_file()
+    assert sorted(written.names) == sorted(entries)
+    assert extracted(tmp_path) == entries
+
+    # Unchanged archive: nothing is written
+    written.names.clear()
+    local_ingestion(tmp_path, archive).extract_zip_file()
+    assert written.names == []
+
+    # One entry changed with the same size, one added and one deleted
+    entries["images/a/1.jpg"] = b"IMAGE 1"
+    entries["images/b/new.jpg"] = b"new image"
+    del entries["images/a/3.jpg"]
+    write_zip(archive, entries)
+    local_ingestion(tmp_path, archive).extract_zip_file()
+    assert sorted(written.names) == ["images/a/1.jpg", "images/b/new.jpg"]
+    assert extracted(tmp_path) == entries
+    with open(tmp_path / "manifest.json") as f:
+        assert sorted(json.load(f)["files"]) == sorted(entries)
+
+
+def test_damaged_files_are_extracted_again(tmp_path, written):
+    entries = {"images/a.jpg": b"image a", "images/b.jpg": b"image b"}
+    archive = write_zip(tmp_path / "source.zip", entries)
+    local_ingestion(tmp_path, archive).extract_zip_file()
+
+    (tmp_path / "data" / "images" / "a.jpg").write_bytes(b"trunc")
+    (tmp_path / "data" / "images" / "b.jpg").unlink()
+    written.names.clear()
+    local_ingestion(tmp_path, archive).extract_zip_file()
+    assert sorted(written.names) == ["images/a.jpg", "images/b.jpg"]
+    assert extracted(tmp_path) == entries
+
+
+@pytest.mark.parametrize("name", ["../evil.jpg", "images/../../evil.jpg", "/tmp/evil.jpg"])
+def test_entries_escaping_the_extraction_directory_are_rejected(tmp_path, name):
+    ingestion = local_ingestion(tmp_path, tmp_path / "source.zip")
+    with pytest.raises(ValueError, match="escapes"):
+        ingestion._target(name)
+
+    # The whole archive is rejected before anything is written
+    write_zip(tmp_path / "source.zip", {"images/a.jpg": b"image a", name: b"evil"})
+    with pytest.raises(ValueError, match="escapes"):
+        ingestion.extract_zip_file()
+    assert extracted(tmp_path) == {}
+    assert not (tmp_path / "evil.jpg").exists()
+    assert not (tmp_path / "manifest.json").exists()
+
+
+def test_parallel_extraction(tmp_path, written):
+    entries = {f"images/{i % 4}/{i}.jpg": bytes([i % 256]) * (1000 + i) for i in range(200)}
+    archive = write_zip(tmp_path / "source.zip", entries)
+
+    local_ingestion(tmp_path, archive, extract_workers=8).extract_zip_file()
+
+    assert len(written.threads) > 1
+    assert sorted(written.names) == sorted(entries)
+    assert extracted(tmp_path) == entries
+    assert not list((tmp_path / "data").rglob("*.tmp"))
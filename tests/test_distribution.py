@@ -0,0 +1,64 @@
+"""Multi-worker training on localhost converges to the same weights on every worker."""
+import json
+from pathlib import Path
+import pytest
+
+pytest.importorskip("tensorflow")
+
+from cnnClassifier.components.distribution import worker_info
+
+
+NUM_WORKERS = 2
+TOLERANCE = 1e-5
+
+
+@pytest.mark.parametrize("cluster, task, expected", [
+    ({}, {}, (1, 0, True)),
+    ({"worker": ["a:1", "b:1"]}, {"type": "worker", "index": 0}, (2, 0, True)),
+    ({"worker": ["a:1", "b:1"]}, {"type": "worker", "index": 1}, (2, 1, False)),
+    # The chief is one of the workers, the others follow it
+    ({"chief": ["c:1"], "worker": ["a:1", "b:1"]}, {"type": "chief", "index": 0}, (3, 0, True)),
+    ({"chief": ["c:1"], "worker": ["a:1", "b:1"]}, {"type": "worker", "index": 0}, (3, 1, False)),
+    ({"chief": ["c:1"], "worker": ["a:1", "b:1"]}, {"type": "worker", "index": 1}, (3, 2, False)),
+])
+def test_worker_info(monkeypatch, cluster, task, expected):
+    if cluster:
+        monkeypatch.setenv("TF_CONFIG", json.dumps({"cluster": cluster, "task": task}))
+    else:
+        monkeypatch.delenv("TF_CONFIG", raising=False)
+    assert worker_info() == expected
+
+
+@pytest.fixture
+def workspace(workspace_factory, run_stages):
+    workspace = workspace_factory(
+        params={
+            "BACKBONE": "MobileNetV3Small",
+            "IMAGE_SIZE": [32, 32, 3],
+            "BATCH_SIZE": 8,
+            "EPOCHS": 1,
+            "AUGMENTATION": False,
+            "FEATURE_CACHE": False,
+            "INPUT_PIPELINE": "tf_data",
+            "DISTRIBUTION": {"STRATEGY": "multi_worker_mirrored", "NUM_CPU_REPLICAS": 1}
+        },
+        # Interrupted runs are not part of this test
+        config={"training": {"resume": False}}
+    )
+    run_stages("data_ingestion", "prepare_base_model")
+    return workspace
+
+
+def test_local_workers_converge_to_the_same_weights(workspace):
+    from cnnClassifier.components.distribution import launch_local_workers, max_weight_difference
+    from cnnClassifier.config.configuration import ConfigurationManager
+
+    assert launch_local_workers(NUM_WORKERS) == [0] * NUM_WORKERS
+
+    training_config = ConfigurationManager().get_training_config()
+    model_name = Path(training_config.trained_model_path).name
+    paths = [training_config.trained_model_path] + [
+        Path(training_config.root_dir) / f"worker_{index}" / model_name for index in range(1, NUM_WORKERS)
+    ]
+    assert all(Path(path).exists() for path in paths)
+    assert max_weight_difference(paths) <= TOLERANCE
@@ -0,0 +1,109 @@
+"""Cached backbone features are reused until the backbone weights or the preprocessing change."""
+import numpy as np
+import pytest
+
+tf = pytest.importorskip("tensorflow")
+
+from cnnClassifier.components.feature_cache import FeatureCache
+from cnnClassifier.entity.config_entity import FeatureCacheConfig
+
+
+IMAGE_SIZE = [32, 32, 3]
+
+
+def model() -> tf.keras.Model:
+    """A frozen convolution under a trainable head, like the prepared base model."""
+    inputs = tf.keras.Input(shape=IMAGE_SIZE)
+    x = tf.keras.layers.Conv2D(4, 3, trainable=False)(inputs)
+    x = tf.keras.layers.GlobalAveragePooling2D(trainable=False)(x)
+    outputs = tf.keras.layers.Dense(2, activation="softmax")(x)
+    return tf.keras.Model(inputs, outputs)
+
+
+@pytest.fixture
+def dataset(tmp_path, dataset_factory):
+    data_dir = dataset_factory(tmp_path, images_per_class=4, size=(32, 32))
+    return data_dir, sorted(str(path) for path in data_dir.rglob("*.jpg"))
+
+
+@pytest.fixture
+def extractions(monkeypatch):
+    """Numbers of images each load extracted."""
+    counts = []
+    extend = FeatureCache._extend
+
+    def counted(self, backbone, features_path, index, missing):
+        counts.append(len(missing))
+        return extend(self, backbone, features_path, index, missing)
+
+    monkeypatch.setattr(FeatureCache, "_extend", counted)
+    return counts
+
+
+def cache(tmp_path, data_dir, preprocessing: str = "rescale", prune_stale: bool = True) -> FeatureCache:
+    return FeatureCache(FeatureCacheConfig(
+        root_dir=tmp_path / "feature_cache",
+        training_data=data_dir,
+        params_image_size=IMAGE_SIZE,
+        params_batch_size=4,
+        params_preprocessing=preprocessing,
+        prune_stale=prune_stale
+    ))
+
+
+def stores(tmp_path) -> list:
+    return sorted(path.name for path in (tmp_path / "feature_cache").iterdir() if path.is_dir())
+
+
+def test_features_are_extracted_once(tmp_path, dataset, extractions):
+    data_dir, paths = dataset
+    classifier = model()
+    features = cache(tmp_path, data_dir).load(classifier, paths)
+    assert features.shape == (8, 4)
+
+    # Reordered and repeated images are served from the cache
+    assert np.array_equal(cache(tmp_path, data_dir).load(classifier, paths[::-1] + paths[:2]),
+                          np.concatenate([features[::-1], features[:2]]))
+    assert extractions == [8]
+
+    backbone, _ = FeatureCache.split_model(classifier)
+    expected = backbone.predict(np.stack([
+        np.asarray(tf.keras.utils.load_img(path), dtype=np.float32) / 255. for path in paths
+    ]), verbose=0)
+    np.testing.assert_allclose(features, expected, atol=1e-2)
+
+
+def test_changed_weights_invalidate_the_cache(tmp_path, dataset, extractions):
+    data_dir, paths = dataset
+    classifier = model()
+    features = np.array(cache(tmp_path, data_dir).load(classifier, paths))
+    old_stores = stores(tmp_path)
+
+    # Training the head does not touch the cached features
+    head = classifier.layers[-1]
+    head.set_weights([weight + 1. for weight in head.get_weights()])
+    cache(tmp_path, data_dir).load(classifier, paths)
+    assert extractions == [8] and stores(tmp_path) == old_stores
+
+    conv = classifier.layers[1]
+    conv.set_weights([weight * 2. for weight in conv.get_weights()])
+    changed = cache(tmp_path, data_dir).load(classifier, paths)
+
+    assert extractions == [8, 8]
+    assert not np.allclose(changed, features)
+    # The stale store is removed
+    assert len(stores(tmp_path)) == 1 and stores(tmp_path) != old_stores
+
+
+def test_changed_preprocessing_invalidates_the_cache(tmp_path, dataset, extractions):
+    data_dir, paths = dataset
+    classifier = model()
+    features = np.array(cache(tmp_path, data_dir).load(classifier, paths))
+
+    changed = cache(tmp_path, data_dir, preprocessing="mobilenet_v2", prune_stale=False).load(classifier, paths)
+    assert extractions == [8, 8]
+    assert not np.allclose(changed, features)
+    # Without pruning both stores stay usable
+    assert len(stores(tmp_path)) == 2
+    np.testing.assert_array_equal(cache(tmp_path, data_dir, prune_stale=False).load(classifier, paths), features)
+    assert extractions == [8, 8]
@@ -0,0 +1,60 @@
+"""Admission of the inference pool, including work abandoned by timed out requests."""
+import asyncio
+import threading
+import pytest
+from cnnClassifier.components.inference_pool import InferencePool, InferenceQueueFull
+
+
+def test_timed_out_work_keeps_its_slot_until_it_finishes():
+    release = threading.Event()
+
+    async def scenario():
+        pool = InferencePool(num_workers=1, max_pending=1, timeout_s=0.05)
+        with pytest.raises(asyncio.TimeoutError):
+            async with pool.slot():
+                await pool.with_timeout(pool.run(release.wait))
+
+        # The request is gone but its job still runs on the pool thread
+        assert pool.stats()["pending"] == 1
+        with pytest.raises(InferenceQueueFull):
+            async with pool.slot():
+                pass
+
+        release.set()
+        for _ in range(100):
+            if pool.stats()["pending"] == 0:
+                break
+            await asyncio.sleep(0.01)
+        assert pool.stats()["pending"] == 0
+        async with pool.slot():
+            assert await pool.run(lambda: 42) == 42
+        assert pool.stats() == {"pending": 0, "max_pending": 1, "rejected": 1, "timed_out": 1}
+        pool.shutdown()
+
+    try:
+        asyncio.run(scenario())
+    finally:
+        release.set()
+
+
+def test_queued_jobs_of_a_timed_out_request_are_cancelled():
+    release = threading.Event()
+    ran = []
+
+    async def scenario():
+        pool = InferencePool(num_workers=1, max_pending=2, timeout_s=0.05)
+        blocker = asyncio.ensure_future(pool.run(release.wait))
+        with pytest.raises(asyncio.TimeoutError):
+            async with pool.slot():
+                await pool.with_timeout(pool.run(ran.append, 1))
+        # Never started, so the slot is released at once
+        assert pool.stats()["pending"] == 0
+        release.set()
+        await blocker
+        pool.shutdown()
+
+    try:
+        asyncio.run(scenario())
+    finally:
+        release.set()
+    assert ran == []
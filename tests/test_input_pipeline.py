@@ -0,0 +1,51 @@
+"""The on-disk cache of decoded images follows changes to the dataset."""
+import os
+import pytest
+
+pytest.importorskip("tensorflow")
+
+from cnnClassifier.components.input_pipeline import InputPipeline
+
+
+def pipeline(data_dir, cache_dir) -> InputPipeline:
+    return InputPipeline(
+        data_dir=data_dir, image_size=[32, 32, 3], batch_size=4, validation_split=0.25,
+        cache="disk", cache_dir=cache_dir
+    )
+
+
+def cache_filename(data_dir, cache_dir) -> str:
+    input_pipeline = pipeline(data_dir, cache_dir)
+    paths, _ = input_pipeline.list_files("training")
+    return input_pipeline._cache_filename("training", paths)
+
+
+def test_an_image_rewritten_in_place_changes_the_cache(tmp_path, dataset_factory):
+    data_dir = dataset_factory(tmp_path, images_per_class=4)
+    cache_dir = tmp_path / "cache"
+    before = cache_filename(data_dir, cache_dir)
+    assert cache_filename(data_dir, cache_dir) == before
+
+    # Same name, new content, as incremental ingestion leaves it
+    path = sorted((data_dir / "Healthy").iterdir())[-1]
+    stat = path.stat()
+    path.write_bytes(path.read_bytes() + b"\0")
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+    assert cache_filename(data_dir, cache_dir) != before
+
+
+def test_a_newer_image_of_the_same_size_changes_the_cache(tmp_path, dataset_factory):
+    data_dir = dataset_factory(tmp_path, images_per_class=4)
+    cache_dir = tmp_path / "cache"
+    before = cache_filename(data_dir, cache_dir)
+
+    path = sorted((data_dir / "Coccidiosis").iterdir())[-1]
+    stat = path.stat()
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+    assert cache_filename(data_dir, cache_dir) != before
+
+
+def test_the_memory_cache_has_no_file(tmp_path, dataset_factory):
+    data_dir = dataset_factory(tmp_path, images_per_class=4)
+    input_pipeline = InputPipeline(data_dir=data_dir, image_size=[32, 32, 3], batch_size=4, cache="memory")
+    assert input_pipeline._cache_filename("training", input_pipeline.list_files()[0]) == ""
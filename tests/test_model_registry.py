@@ -0,0 +1,94 @@
+"""Registering, promoting, rolling back and pruning model versions."""
+import json
+import pytest
+from cnnClassifier.components.model_registry import ModelRegistry
+from cnnClassifier.entity.config_entity import ModelRegistryConfig
+
+
+def registry(tmp_path, keep_versions: int = 3) -> ModelRegistry:
+    return ModelRegistry(ModelRegistryConfig(
+        root_dir=tmp_path / "registry",
+        trained_model_path=tmp_path / "model.keras",
+        scores_file=tmp_path / "scores.json",
+        auto_promote=True,
+        keep_versions=keep_versions,
+        params_image_size=[224, 224, 3],
+        params_preprocessing="rescale"
+    ))
+
+
+def model(tmp_path, content: bytes, name: str = "model.keras"):
+    path = tmp_path / name
+    path.write_bytes(content)
+    return path
+
+
+def test_register_copies_the_model_with_its_metadata(tmp_path):
+    scores = tmp_path / "scores.json"
+    scores.write_text(json.dumps({"accuracy": 0.9}))
+    models = registry(tmp_path)
+
+    metadata = models.register(model(tmp_path, b"weights 1"), scores_file=scores)
+
+    assert metadata["version"] == "v0001"
+    assert metadata["scores"] == {"accuracy": 0.9}
+    assert metadata["image_size"] == [224, 224, 3] and metadata["preprocessing"] == "rescale"
+    assert models.model_path("v0001").read_bytes() == b"weights 1"
+    # Versions are immutable
+    assert models.model_path("v0001").stat().st_mode & 0o222 == 0
+    assert models.get("v0001") == metadata
+    with pytest.raises(KeyError):
+        models.get("v0002")
+    with pytest.raises(KeyError):
+        models.get("../v0001")
+
+
+def test_register_dedupes_by_content(tmp_path):
+    models = registry(tmp_path)
+    first = models.register(model(tmp_path, b"weights 1"))
+    # The same bytes under another name are the same version
+    assert models.register(model(tmp_path, b"weights 1", "copy.keras")) == first
+    second = models.register(model(tmp_path, b"weights 2"))
+    assert second["version"] == "v0002"
+    assert [metadata["version"] for metadata in models.versions()] == ["v0001", "v0002"]
+
+
+def test_promote_and_rollback(tmp_path):
+    models = registry(tmp_path)
+    for i in range(3):
+        models.register(model(tmp_path, f"weights {i}".encode()))
+    assert models.serving()["current"] is None
+    with pytest.raises(ValueError):
+        models.rollback()
+
+    models.promote("v0001")
+    models.promote("v0002")
+    assert models.promote("v0002")["previous"] == "v0001", "promoting the served version changes nothing"
+    serving = models.serving()
+    assert (serving["current"], serving["previous"]) == ("v0002", "v0001")
+
+    serving = models.rollback()
+    assert (serving["current"], serving["previous"]) == ("v0001", "v0002")
+    # Rolling back twice undoes the rollback
+    serving = models.rollback()
+    assert (serving["current"], serving["previous"]) == ("v0002", "v0001")
+
+    with pytest.raises(KeyError):
+        models.promote("v0009")
+    assert models.serving()["current"] == "v0002"
+
+
+def test_prune_keeps_the_newest_and_the_served_versions(tmp_path):
+    models = registry(tmp_path, keep_versions=2)
+    for i in range(5):
+        models.register(model(tmp_path, f"weights {i}".encode()))
+    models.promote("v0001")
+    models.promote("v0002")
+
+    models.prune()
+
+    # v0001 and v0002 are served, v0004 and v0005 are the newest
+    assert [metadata["version"] for metadata in models.versions()] == ["v0001", "v0002", "v0004", "v0005"]
+    assert not (tmp_path / "registry" / "v0003").exists()
+    # Numbers are never reused
+    assert models.register(model(tmp_path, b"weights 5"))["version"] == "v0006"
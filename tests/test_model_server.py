@@ -0,0 +1,159 @@
+"""Hot swaps of the served model version and the grace period of retired models."""
+import threading
+import time
+import pytest
+from cnnClassifier.pipeline import model_server
+from cnnClassifier.pipeline.model_server import ModelServer
+from cnnClassifier.components.model_registry import ModelRegistry
+from cnnClassifier.entity.config_entity import ModelRegistryConfig, PredictionConfig
+
+
+class FakeBatcher:
+    def __init__(self):
+        self.closed = threading.Event()
+
+    def close(self):
+        self.closed.set()
+
+
+class FakeClassifier:
+    """Stands in for PredictionPipeline, which would load a real model."""
+
+    loads = []
+
+    def __init__(self, config: PredictionConfig):
+        self.path = config.path_of_model
+        self.batcher = FakeBatcher()
+        FakeClassifier.loads.append(self.path)
+
+
+class FakeBulkScorer:
+    def __init__(self, **kwargs):
+        pass
+
+
+@pytest.fixture
+def registry(tmp_path, monkeypatch):
+    monkeypatch.setattr(model_server, "PredictionPipeline", FakeClassifier)
+    monkeypatch.setattr(model_server, "BulkScorer", FakeBulkScorer)
+    FakeClassifier.loads = []
+
+    registry = ModelRegistry(ModelRegistryConfig(
+        root_dir=tmp_path / "registry",
+        trained_model_path=tmp_path / "model.keras",
+        scores_file=tmp_path / "scores.json",
+        auto_promote=True,
+        keep_versions=5,
+        params_image_size=[224, 224, 3],
+        params_preprocessing="rescale"
+    ))
+    for i in range(3):
+        path = tmp_path / "model.keras"
+        path.write_bytes(f"weights {i}".encode())
+        registry.register(path)
+    registry.promote("v0001")
+    return registry
+
+
+def server(tmp_path, registry, swap_grace_s: float = 30, on_swap=None) -> ModelServer:
+    config = PredictionConfig(
+        path_of_model=tmp_path / "model.keras",
+        num_threads=None,
+        enable_batching=True,
+        max_batch_size=16,
+        max_wait_ms=5,
+        bulk_batch_size=64,
+        decode_workers=1,
+        draft_decode=False,
+        fuse_preprocessing=False,
+        use_registry=True,
+        registry_poll_s=0.05,
+        warm_start=False,
+        warm_start_dir=tmp_path / "warm_start",
+        params_image_size=[224, 224, 3],
+        params_preprocessing="rescale"
+    )
+    return ModelServer(config, registry, swap_grace_s=swap_grace_s, on_swap=on_swap)
+
+
+def test_serves_the_promoted_version(tmp_path, registry):
+    models = server(tmp_path, registry)
+    assert models.active.version == "v0001"
+    assert models.active.classifier.path == registry.model_path("v0001")
+    assert not models.refresh(), "the promoted version is already served"
+    assert len(FakeClassifier.loads) == 1
+
+
+def test_hot_swap_keeps_requests_on_their_model(tmp_path, registry):
+    swaps = []
+    models = server(tmp_path, registry, on_swap=swaps.append)
+    # A request in flight holds on to the model it started with
+    in_flight = models.active
+
+    registry.promote("v0002")
+    assert models.refresh()
+
+    assert models.active.version == "v0002"
+    assert models.previous is in_flight
+    assert in_flight.classifier.path == registry.model_path("v0001")
+    assert not in_flight.classifier.batcher.closed.is_set()
+    assert [served.version for served in swaps] == ["v0002"]
+
+
+def test_rollback_swaps_back_without_loading(tmp_path, registry):
+    models = server(tmp_path, registry)
+    first = models.active
+    registry.promote("v0002")
+    models.refresh()
+    loads = len(FakeClassifier.loads)
+
+    assert models.rollback() is first
+    assert registry.serving()["current"] == "v0001"
+    assert len(FakeClassifier.loads) == loads
+
+
+def test_retired_models_close_after_the_grace_period(tmp_path, registry):
+    models = server(tmp_path, registry, swap_grace_s=0.3)
+    first = models.active
+    registry.promote("v0002")
+    models.refresh()
+    second = models.active
+
+    # v0001 leaves the previous slot, v0002 stays loaded for a rollback
+    registry.promote("v0003")
+    models.refresh()
+    retired_at = time.monotonic()
+    assert not first.classifier.batcher.closed.is_set()
+    assert first.classifier.batcher.closed.wait(5)
+    assert time.monotonic() - retired_at >= 0.25
+    assert not second.classifier.batcher.closed.is_set()
+    assert not models.active.classifier.batcher.closed.is_set()
+
+
+def test_the_watcher_follows_the_registry(tmp_path, registry):
+    models = server(tmp_path, registry).start()
+    try:
+        registry.promote("v0003")
+        for _ in range(100):
+            if models.active.version == "v0003":
+                break
+            time.sleep(0.05)
+        assert models.active.version == "v0003"
+        assert models.previous.version == "v0001"
+    finally:
+        models.stop()
+
+
+def test_a_broken_version_keeps_the_current_one_serving(tmp_path, registry, monkeypatch):
+    models = server(tmp_path, registry).start()
+    try:
+        def broken(config):
+            raise OSError("truncated model file")
+
+        monkeypatch.setattr(model_server, "PredictionPipeline", broken)
+        registry.promote("v0002")
+        time.sleep(0.3)
+        assert models.active.version == "v0001"
+        assert models._watcher.is_alive()
+    finally:
+        models.stop()
@@ -0,0 +1,32 @@
+"""Lookups of the prediction cache in memory and in the shared SQLite store."""
+from cnnClassifier.components.prediction_cache import PredictionCache
+from cnnClassifier.entity.config_entity import PredictionCacheConfig
+
+
+def cache(sqlite_path=None) -> PredictionCache:
+    return PredictionCache(PredictionCacheConfig(enabled=True, max_entries=8, ttl_s=60, sqlite_path=sqlite_path))
+
+
+def test_memory_lookup_leaves_the_miss_to_the_shared_store(tmp_path):
+    writer, reader = cache(tmp_path / "cache.sqlite"), cache(tmp_path / "cache.sqlite")
+    writer.put("key", {"class": "Healthy"})
+
+    # Written by another process: not in memory, found in the shared store
+    assert reader.get_memory("key") is None
+    assert reader.get_shared("key") == {"class": "Healthy"}
+    assert reader.get_memory("key") == {"class": "Healthy"}
+    assert reader.get_shared("other") is None
+    assert {name: reader.stats()[name] for name in ("hits", "disk_hits", "misses")} == {
+        "hits": 1, "disk_hits": 1, "misses": 1
+    }
+
+
+def test_memory_only_cache_counts_misses():
+    memory = cache()
+    assert not memory.shared
+    assert memory.get("key") is None
+    memory.put("key", [1])
+    assert memory.get("key") == [1]
+    assert {name: memory.stats()[name] for name in ("hits", "disk_hits", "misses")} == {
+        "hits": 1, "disk_hits": 0, "misses": 1
+    }
@@ -0,0 +1,55 @@
+"""Serving-time decoding stays close to the decode and resize the model was trained with."""
+import io
+import numpy as np
+import pytest
+
+pytest.importorskip("tensorflow")
+
+from PIL import Image
+from cnnClassifier.components.preprocessing import decode_and_resize, decode_image
+
+
+@pytest.fixture
+def encoded(tmp_path, dataset_factory):
+    def encode(size: tuple, image_format: str = "JPEG") -> bytes:
+        data_dir = dataset_factory(tmp_path / f"{size[0]}x{size[1]}", images_per_class=1, size=size)
+        path = next(data_dir.rglob("*.jpg"))
+        if image_format == "JPEG":
+            return path.read_bytes()
+        buffer = io.BytesIO()
+        Image.open(path).save(buffer, image_format)
+        return buffer.getvalue()
+
+    return encode
+
+
+@pytest.mark.parametrize("size, image_size", [
+    ((96, 96), [96, 96, 3]),
+    ((300, 200), [224, 224, 3]),
+    ((1024, 768), [224, 224, 3]),
+    ((1600, 1200), [96, 96, 3])
+])
+@pytest.mark.parametrize("draft", [False, True])
+def test_decode_image_matches_decode_and_resize(encoded, size, image_size, draft):
+    contents = encoded(size)
+    reference = decode_and_resize(contents, image_size).numpy()
+    image = decode_image(contents, image_size, draft=draft)
+
+    assert image.shape == tuple(image_size) and image.dtype == np.uint8
+    diff = np.abs(image.astype(np.float32) - reference)
+    if draft and min(size) >= 4 * min(image_size[:2]):
+        # Decoded at a reduced DCT scale before the resize
+        assert diff.mean() < 1. and diff.max() < 8.
+    else:
+        # Same IDCT and the same antialiased bilinear filter, up to rounding to uint8
+        assert diff.mean() < .5 and diff.max() < 2.
+
+
+def test_decode_image_handles_other_formats_and_writes_into_out(encoded):
+    contents = encoded((640, 480), "PNG")
+    reference = decode_and_resize(contents, [224, 224, 3]).numpy()
+    batch = np.zeros((2, 224, 224, 3), dtype=np.uint8)
+
+    assert np.shares_memory(decode_image(contents, [224, 224, 3], out=batch[1]), batch[1])
+    assert np.abs(batch[1].astype(np.float32) - reference).max() < 2.
+    assert not batch[0].any()
@@ -0,0 +1,154 @@
+"""The stage runner skips up-to-date stages and schedules the others by their dependencies."""
+import threading
+import time
+from pathlib import Path
+from types import SimpleNamespace
+import pytest
+import yaml
+
+pytest.importorskip("tensorflow")
+
+from cnnClassifier.pipeline import runner
+from cnnClassifier.pipeline.runner import StageRunner
+from cnnClassifier.entity.config_entity import PipelineRunnerConfig
+
+
+# prepare -> left, right -> join
+DVC_STAGES = {
+    "prepare": {"cmd": "prepare", "deps": ["input.txt"], "params": ["A"], "outs": ["out/prepare.txt"]},
+    "left": {"cmd": "left", "deps": ["out/prepare.txt"], "params": ["B"], "outs": ["out/left.txt"]},
+    "right": {"cmd": "right", "deps": ["out/prepare.txt"], "outs": ["out/right.txt"]},
+    "join": {"cmd": "join", "deps": ["out/left.txt", "out/right.txt"], "outs": ["out/join.txt"]}
+}
+
+
+class Project:
+    """Stub stages that write their outs from their deps and record when they ran."""
+
+    def __init__(self, path: Path, monkeypatch):
+        self.path = path
+        self.config = {name: {"setting": 1} for name in DVC_STAGES}
+        self.params = {"A": 1, "B": 1}
+        self.runs = []
+        self.hooks = {}
+        (path / "input.txt").write_text("input")
+        with open(path / "dvc.yaml", "w") as f:
+            yaml.safe_dump({"stages": DVC_STAGES}, f)
+        monkeypatch.chdir(path)
+        monkeypatch.setattr(runner, "STAGES", {name: self._stub(name) for name in DVC_STAGES})
+
+    def _stub(self, name: str):
+        project, stage = self, DVC_STAGES[name]
+
+        class Pipeline:
+            def main(self):
+                start = time.perf_counter()
+                if name in project.hooks:
+                    project.hooks[name]()
+                content = "".join(Path(dep).read_text() for dep in stage["deps"]) + name
+                for out in stage["outs"]:
+                    Path(out).parent.mkdir(exist_ok=True)
+                    Path(out).write_text(content)
+                project.runs.append((name, start, time.perf_counter()))
+
+        return SimpleNamespace(STAGE_NAME=name), Pipeline, [name]
+
+    def run(self, stages: list = None, force: bool = False, max_workers: int = 1) -> dict:
+        self.runs.clear()
+        stage_runner = StageRunner(PipelineRunnerConfig(
+            dvc_file=Path("dvc.yaml"),
+            config_file=Path("config/config.yaml"),
+            state_file=Path("state/state.json"),
+            runs_file=Path("state/runs.json"),
+            metrics_file=Path("state/metrics.prom"),
+            max_workers=max_workers,
+            all_config=self.config,
+            all_params=self.params
+        ))
+        records = stage_runner.run(stages, force=force)
+        return {record["stage"]: record["status"] for record in records}
+
+    def ran(self) -> list:
+        return [name for name, _, _ in self.runs]
+
+
+@pytest.fixture
+def project(tmp_path, monkeypatch):
+    return Project(tmp_path, monkeypatch)
+
+
+def test_runs_stages_after_their_upstream_stages(project):
+    assert project.run() == {name: "ran" for name in DVC_STAGES}
+    order = project.ran()
+    assert order[0] == "prepare" and order[-1] == "join"
+    assert Path("out/join.txt").read_text() == "inputprepareleftinputprepareright" + "join"
+
+
+def test_unchanged_stages_are_skipped(project):
+    project.run()
+    assert project.run() == {name: "skipped" for name in DVC_STAGES}
+    assert project.ran() == []
+
+
+def test_a_changed_param_reruns_the_stage_and_its_dependents(project):
+    project.run()
+    project.params["B"] = 2
+    assert project.run() == {"prepare": "skipped", "left": "ran", "right": "skipped", "join": "ran"}
+
+
+def test_a_changed_config_section_reruns_the_stage_and_its_dependents(project):
+    project.run()
+    project.config["right"] = {"setting": 2}
+    # Sections other stages do not read leave them alone
+    project.config["unrelated"] = {"setting": 2}
+    assert project.run() == {"prepare": "skipped", "left": "skipped", "right": "ran", "join": "ran"}
+
+
+def test_a_changed_dependency_reruns_everything_downstream(project):
+    project.run()
+    Path("input.txt").write_text("changed input")
+    assert project.run() == {name: "ran" for name in DVC_STAGES}
+
+
+def test_a_missing_output_reruns_its_stage(project):
+    project.run()
+    Path("out/right.txt").unlink()
+    # Rewritten with the same content, but a new mtime: join follows
+    assert project.run() == {"prepare": "skipped", "left": "skipped", "right": "ran", "join": "ran"}
+
+
+def test_force_reruns_up_to_date_stages(project):
+    project.run()
+    assert project.run(force=True) == {name: "ran" for name in DVC_STAGES}
+    # Only the selected stages are forced, their upstream stages still run only when changed
+    assert project.run(["left"], force=True) == {"prepare": "skipped", "left": "ran"}
+
+
+def test_selected_stages_run_with_their_upstream_stages(project):
+    assert project.run(["left"]) == {"prepare": "ran", "left": "ran"}
+    assert not Path("out/right.txt").exists()
+
+
+def test_independent_stages_run_in_parallel(project):
+    # Each waits for the other, so the run only finishes when both are running at once
+    barrier = threading.Barrier(2, timeout=10)
+    project.hooks = {"left": barrier.wait, "right": barrier.wait}
+    assert project.run(max_workers=2) == {name: "ran" for name in DVC_STAGES}
+
+    runs = {name: (start, end) for name, start, end in project.runs}
+    assert runs["prepare"][1] <= min(runs["left"][0], runs["right"][0])
+    assert runs["join"][0] >= max(runs["left"][1], runs["right"][1])
+
+
+def test_a_failed_stage_stops_its_dependents(project):
+    def fail():
+        raise RuntimeError("left failed")
+
+    project.hooks = {"left": fail}
+    with pytest.raises(RuntimeError, match="left failed"):
+        project.run()
+    assert "join" not in project.ran()
+
+    # The failed stage is not recorded as up to date
+    project.hooks = {}
+    assert project.run() == {"prepare": "skipped", "left": "ran", "right": "skipped", "join": "ran"}
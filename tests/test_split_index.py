@@ -0,0 +1,109 @@
+"""The train/validation split is reproducible and stable as the dataset grows."""
+import os
+import pytest
+
+pytest.importorskip("tensorflow")
+
+from cnnClassifier.components.split_index import SplitIndex
+from cnnClassifier.entity.config_entity import SplitIndexConfig
+
+
+CLASS_NAMES = ["Coccidiosis", "Healthy"]
+
+
+def add_images(data_dir, start: int, count: int):
+    """Writes placeholder images, the index only reads their names."""
+    for class_name in CLASS_NAMES:
+        class_dir = data_dir / class_name
+        class_dir.mkdir(parents=True, exist_ok=True)
+        for i in range(start, start + count):
+            (class_dir / f"{class_name[0]}{i:04d}.jpg").write_bytes(b"")
+    touch(data_dir)
+
+
+def touch(data_dir):
+    # Folder mtimes may not tick between changes this close together
+    for class_name in CLASS_NAMES:
+        stat = os.stat(data_dir / class_name)
+        os.utime(data_dir / class_name, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+
+
+def subsets(split_index: SplitIndex) -> tuple:
+    return split_index.relative_files("training")[0], split_index.relative_files("validation")[0]
+
+
+@pytest.fixture
+def data_dir(tmp_path):
+    data_dir = tmp_path / "data"
+    add_images(data_dir, 0, 50)
+    return data_dir
+
+
+def config(tmp_path, data_dir, validation_split: float = 0.2, seed: int = 42) -> SplitIndexConfig:
+    return SplitIndexConfig(
+        index_file=tmp_path / "split_index.json",
+        training_data=data_dir,
+        params_validation_split=validation_split,
+        params_seed=seed
+    )
+
+
+def test_build_is_deterministic_and_stratified(tmp_path, data_dir):
+    training, validation = subsets(SplitIndex.build(data_dir, 0.2, 42))
+    assert subsets(SplitIndex.build(data_dir, 0.2, 42)) == (training, validation)
+
+    assert len(validation) == 20 and len(training) == 80
+    for class_name in CLASS_NAMES:
+        assert sum(path.startswith(f"{class_name}/") for path in validation) == 10
+    assert not set(training) & set(validation)
+    # Not simply the first files of each class, as with the legacy split
+    assert validation != [f"{c}/{c[0]}{i:04d}.jpg" for c in CLASS_NAMES for i in range(10)]
+
+    # Another seed draws another validation subset of the same size
+    other = subsets(SplitIndex.build(data_dir, 0.2, 7))[1]
+    assert len(other) == 20 and other != validation
+
+
+def test_saved_index_loads_unchanged(tmp_path, data_dir):
+    split_index = SplitIndex.from_config(config(tmp_path, data_dir))
+    loaded = SplitIndex.load(tmp_path / "split_index.json", data_dir)
+    assert loaded.fingerprint == split_index.fingerprint
+    assert subsets(loaded) == subsets(split_index)
+
+    with pytest.raises(FileNotFoundError):
+        SplitIndex.load(tmp_path / "missing.json", data_dir)
+
+
+def test_added_files_keep_the_existing_assignment(tmp_path, data_dir):
+    training, validation = subsets(SplitIndex.from_config(config(tmp_path, data_dir)))
+
+    add_images(data_dir, 50, 50)
+    grown = SplitIndex.load(tmp_path / "split_index.json", data_dir)
+    grown_training, grown_validation = subsets(grown)
+
+    assert len(grown_validation) == 40
+    assert set(training) <= set(grown_training)
+    assert set(validation) <= set(grown_validation)
+    # The updated index was saved
+    assert SplitIndex.load(tmp_path / "split_index.json", data_dir).fingerprint == grown.fingerprint
+
+    # Removing files leaves the others where they were
+    for path in grown_validation[:5]:
+        (data_dir / path).unlink()
+    touch(data_dir)
+    shrunk_training, shrunk_validation = subsets(SplitIndex.load(tmp_path / "split_index.json", data_dir))
+    assert shrunk_training == grown_training
+    assert shrunk_validation == grown_validation[5:]
+
+
+def test_changed_split_params_rebuild_the_index(tmp_path, data_dir):
+    validation = subsets(SplitIndex.from_config(config(tmp_path, data_dir)))[1]
+
+    assert subsets(SplitIndex.from_config(config(tmp_path, data_dir, validation_split=0.3)))[1] != validation
+    assert len(SplitIndex.load(tmp_path / "split_index.json", data_dir).relative_files("validation")[0]) == 30
+
+    reseeded = SplitIndex.from_config(config(tmp_path, data_dir, validation_split=0.3, seed=7))
+    assert reseeded.seed == 7
+    assert SplitIndex.load(tmp_path / "split_index.json", data_dir).seed == 7
+    # Back to the original params, the original split
+    assert subsets(SplitIndex.from_config(config(tmp_path, data_dir)))[1] == validation
@@ -0,0 +1,109 @@
+"""Streaming evaluation metrics agree with direct NumPy computations over all predictions."""
+import numpy as np
+import pytest
+from cnnClassifier.components.streaming_metrics import StreamingClassificationMetrics
+
+
+CLASS_NAMES = ["Coccidiosis", "Healthy", "Other"]
+
+
+def predictions(count: int, seed: int = 0):
+    """Labels and softmax probabilities that are right more often than chance."""
+    rng = np.random.default_rng(seed)
+    labels = rng.integers(0, len(CLASS_NAMES), count)
+    logits = rng.normal(0, 1.5, (count, len(CLASS_NAMES)))
+    logits[np.arange(count), labels] += 1.
+    probabilities = np.exp(logits) / np.exp(logits).sum(axis=1, keepdims=True)
+    return labels, probabilities
+
+
+def streamed(labels, probabilities, batch_size: int = 37) -> dict:
+    metrics = StreamingClassificationMetrics(CLASS_NAMES)
+    for start in range(0, len(labels), batch_size):
+        metrics.update(labels[start:start + batch_size], probabilities[start:start + batch_size])
+    return metrics.result()
+
+
+def roc_auc(scores, positive) -> float:
+    """Probability that a positive scores above a negative, ties counting half."""
+    positives, negatives = scores[positive], scores[~positive]
+    wins = (positives[:, None] > negatives[None, :]).sum() + 0.5 * (positives[:, None] == negatives[None, :]).sum()
+    return wins / (len(positives) * len(negatives))
+
+
+def test_matches_numpy(count=2000):
+    labels, probabilities = predictions(count)
+    result = streamed(labels, probabilities)
+
+    predicted = probabilities.argmax(axis=1)
+    one_hot = np.eye(len(CLASS_NAMES))[labels]
+    confusion = np.zeros((len(CLASS_NAMES),) * 2, dtype=int)
+    np.add.at(confusion, (labels, predicted), 1)
+
+    assert result["images"] == count
+    assert result["confusion_matrix"] == confusion.tolist()
+    assert result["accuracy"] == pytest.approx(np.mean(predicted == labels))
+    assert result["loss"] == pytest.approx(-np.mean(np.log(probabilities[np.arange(count), labels])))
+    assert result["brier_score"] == pytest.approx(np.mean(np.sum((probabilities - one_hot) ** 2, axis=1)))
+
+    for index, name in enumerate(CLASS_NAMES):
+        true_positives = np.sum((predicted == index) & (labels == index))
+        precision = true_positives / np.sum(predicted == index)
+        recall = true_positives / np.sum(labels == index)
+        per_class = result["per_class"][name]
+        assert per_class["precision"] == pytest.approx(precision)
+        assert per_class["recall"] == pytest.approx(recall)
+        assert per_class["f1"] == pytest.approx(2 * precision * recall / (precision + recall))
+        assert per_class["support"] == np.sum(labels == index)
+        # Scores within one histogram bin count as ties
+        assert per_class["roc_auc"] == pytest.approx(roc_auc(probabilities[:, index], labels == index), abs=1e-3)
+
+    assert result["macro_f1"] == pytest.approx(np.mean([result["per_class"][name]["f1"] for name in CLASS_NAMES]))
+    assert result["roc_auc"] == pytest.approx(np.mean([
+        roc_auc(probabilities[:, index], labels == index) for index in range(len(CLASS_NAMES))
+    ]), abs=1e-3)
+
+
+def test_calibration_matches_numpy(count=2000, bins=10):
+    labels, probabilities = predictions(count, seed=1)
+    result = streamed(labels, probabilities)
+
+    confidence = probabilities.max(axis=1)
+    correct = probabilities.argmax(axis=1) == labels
+    bin_index = np.minimum((confidence * bins).astype(int), bins - 1)
+    expected = [
+        {"confidence": confidence[bin_index == b].mean(), "accuracy": correct[bin_index == b].mean(),
+         "count": int(np.sum(bin_index == b))}
+        for b in range(bins) if np.any(bin_index == b)
+    ]
+    ece = sum(row["count"] * abs(row["accuracy"] - row["confidence"]) for row in expected) / count
+
+    assert [row["count"] for row in result["calibration"]] == [row["count"] for row in expected]
+    for row, expected_row in zip(result["calibration"], expected):
+        assert row["confidence"] == pytest.approx(expected_row["confidence"])
+        assert row["accuracy"] == pytest.approx(expected_row["accuracy"])
+    assert result["expected_calibration_error"] == pytest.approx(ece)
+
+
+def test_batching_and_label_encoding_do_not_change_the_result():
+    labels, probabilities = predictions(500, seed=2)
+    whole = streamed(labels, probabilities, batch_size=500)
+    one_hot = StreamingClassificationMetrics(CLASS_NAMES)
+    one_hot.update(np.eye(len(CLASS_NAMES))[labels], probabilities)
+
+    for result in (streamed(labels, probabilities, batch_size=7), one_hot.result()):
+        assert result["confusion_matrix"] == whole["confusion_matrix"]
+        assert result["per_class"] == whole["per_class"]
+        for row, whole_row in zip(result["calibration"], whole["calibration"], strict=True):
+            assert row == pytest.approx(whole_row)
+        for key in ("loss", "brier_score", "expected_calibration_error", "roc_auc"):
+            assert result[key] == pytest.approx(whole[key])
+
+
+def test_roc_auc_is_undefined_without_both_outcomes():
+    metrics = StreamingClassificationMetrics(CLASS_NAMES)
+    metrics.update(np.array([0, 0, 1]), np.array([[0.7, 0.2, 0.1], [0.6, 0.3, 0.1], [0.2, 0.7, 0.1]]))
+    result = metrics.result()
+    assert result["per_class"]["Other"]["roc_auc"] is None
+    # Coccidiosis and Healthy are perfectly separated
+    assert result["roc_auc"] == pytest.approx(1.)
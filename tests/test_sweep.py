@@ -0,0 +1,233 @@
+"""Trial sampling, early stopping and the leaderboard of the hyperparameter sweep."""
+import json
+import math
+from pathlib import Path
+import pytest
+from cnnClassifier.components.sweep import HyperparameterSweep, Trial, sample_trials
+from cnnClassifier.entity.config_entity import SweepConfig
+from cnnClassifier.utils.common import read_yaml
+
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+
+
+def make_sweep(tmp_path, cls=HyperparameterSweep, **settings) -> HyperparameterSweep:
+    config = SweepConfig(**{
+        "root_dir": tmp_path / "sweep",
+        "shared_dir": tmp_path / "shared",
+        "space": {"LEARNING_RATE": [0.001]},
+        "search": "grid",
+        "num_trials": None,
+        "seed": 0,
+        "max_parallel": 2,
+        "threads_per_trial": 1,
+        "early_stopping": None,
+        "min_epochs": 1,
+        "reduction_factor": 2,
+        "latency_runs": 0,
+        "dvc_file": REPO_ROOT / "dvc.yaml",
+        "params_file": REPO_ROOT / "params.yaml",
+        "all_config": read_yaml(REPO_ROOT / "config" / "config.yaml"),
+        "all_params": read_yaml(REPO_ROOT / "params.yaml"),
+        **settings
+    })
+    return cls(config, name="test")
+
+
+def make_trial(tmp_path, index: int, epochs: int = 4, **fields) -> Trial:
+    return Trial(
+        trial_id=f"trial_{index:03d}",
+        overrides={},
+        params={"EPOCHS": epochs},
+        workspace=tmp_path / f"trial_{index:03d}",
+        **fields
+    )
+
+
+def history(*val_accuracies) -> list:
+    return [{"epoch": epoch, "val_accuracy": value} for epoch, value in enumerate(val_accuracies, start=1)]
+
+
+# ----------------------------------------------------------------------
+# Sampling
+
+def test_grid_search_takes_every_combination():
+    trials = sample_trials({"BATCH_SIZE": [16, 32], "AUGMENTATION": [True, False]}, "grid")
+    assert len(trials) == 4
+    assert {(trial["BATCH_SIZE"], trial["AUGMENTATION"]) for trial in trials} == {
+        (16, True), (16, False), (32, True), (32, False)
+    }
+    assert len(sample_trials({"BATCH_SIZE": [16, 32, 64]}, "grid", num_trials=2)) == 2
+
+
+def test_grid_search_rejects_ranges():
+    with pytest.raises(ValueError, match="LEARNING_RATE"):
+        sample_trials({"LEARNING_RATE": {"min": 0.0001, "max": 0.01}}, "grid")
+    with pytest.raises(ValueError, match="Unknown search"):
+        sample_trials({"BATCH_SIZE": [16]}, "bayesian")
+
+
+def test_random_search_draws_within_the_ranges():
+    space = {
+        "LEARNING_RATE": {"min": 0.0001, "max": 0.01, "log": True},
+        "HEAD.DROPOUT": {"min": 0.0, "max": 0.5},
+        "EPOCHS": {"min": 2, "max": 6},
+        "BATCH_SIZE": [16, 32]
+    }
+    trials = sample_trials(space, "random", num_trials=200, seed=3)
+    assert len(trials) == 200
+    assert all(0.0001 <= trial["LEARNING_RATE"] <= 0.01 for trial in trials)
+    assert all(0.0 <= trial["HEAD.DROPOUT"] <= 0.5 for trial in trials)
+    assert all(isinstance(trial["EPOCHS"], int) and 2 <= trial["EPOCHS"] <= 6 for trial in trials)
+    assert {trial["BATCH_SIZE"] for trial in trials} == {16, 32}
+    # The log range spreads its draws evenly over the decades
+    below = sum(trial["LEARNING_RATE"] < 0.001 for trial in trials)
+    assert 60 < below < 140
+
+    assert sample_trials(space, "random", num_trials=5, seed=3) == trials[:5]
+    assert sample_trials(space, "random", num_trials=5, seed=4) != trials[:5]
+
+
+# ----------------------------------------------------------------------
+# Early stopping
+
+class StubSweep(HyperparameterSweep):
+    """Trains trials instantly, each reaching the validation accuracy given in ``quality``."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.quality = {}
+        self.runs = []
+
+    def _run_trial(self, trial: Trial, epochs: int):
+        self.runs.append((trial.trial_id, epochs))
+        trial.history = history(*(self.quality[trial.trial_id] for _ in range(epochs)))
+        trial.status = "completed" if epochs >= trial.max_epochs else "running"
+
+
+def test_successive_halving_promotes_the_best_trials(tmp_path):
+    quality = {"trial_000": 0.6, "trial_001": 0.9, "trial_002": 0.7, "trial_003": 0.5}
+    sweep = make_sweep(tmp_path, StubSweep, early_stopping="successive_halving")
+    sweep.quality = quality
+    sweep.trials = [make_trial(tmp_path, index, epochs=4) for index in range(4)]
+
+    sweep._successive_halving()
+
+    # Rungs of 1, 2 then 4 epochs, keeping the best half of each
+    assert sorted(sweep.runs) == sorted([
+        ("trial_000", 1), ("trial_001", 1), ("trial_002", 1), ("trial_003", 1),
+        ("trial_001", 2), ("trial_002", 2),
+        ("trial_001", 4)
+    ])
+    status = {trial.trial_id: trial.status for trial in sweep.trials}
+    assert status == {"trial_000": "stopped", "trial_001": "completed", "trial_002": "stopped", "trial_003": "stopped"}
+
+
+def test_successive_halving_skips_failed_trials(tmp_path):
+    class FailingSweep(StubSweep):
+        def _run_trial(self, trial, epochs):
+            super()._run_trial(trial, epochs)
+            if trial.trial_id == "trial_001":
+                trial.status = "failed"
+
+    quality = {"trial_000": 0.6, "trial_001": 0.9, "trial_002": 0.7}
+    sweep = make_sweep(tmp_path, FailingSweep, early_stopping="successive_halving")
+    sweep.quality = quality
+    sweep.trials = [make_trial(tmp_path, index, epochs=2) for index in range(3)]
+
+    sweep._successive_halving()
+
+    status = {trial.trial_id: trial.status for trial in sweep.trials}
+    assert status == {"trial_000": "completed", "trial_001": "failed", "trial_002": "completed"}
+
+
+def write_progress(sweep: HyperparameterSweep, trial: Trial, val_accuracies):
+    progress_file = trial.workspace / sweep.all_config["prepare_callbacks"]["progress_file"]
+    progress_file.parent.mkdir(parents=True, exist_ok=True)
+    with open(progress_file, "w") as f:
+        json.dump({"history": history(*val_accuracies)}, f)
+
+
+def test_median_rule_stops_a_trial_below_the_median(tmp_path):
+    sweep = make_sweep(tmp_path, early_stopping="median", min_epochs=2)
+    trial = make_trial(tmp_path, 0)
+    sweep.trials = [trial] + [
+        make_trial(tmp_path, index, history=history(*values))
+        for index, values in enumerate([[0.6, 0.7, 0.8], [0.5, 0.8], [0.4, 0.9, 0.9]], start=1)
+    ]
+    should_stop = sweep._median_should_stop(trial)
+
+    # Not before min_epochs
+    write_progress(sweep, trial, [0.1])
+    assert not should_stop()
+    # Median of 0.7, 0.8 and 0.9 at epoch 2
+    write_progress(sweep, trial, [0.1, 0.75])
+    assert should_stop()
+
+
+def test_median_rule_keeps_trials_at_or_above_the_median(tmp_path):
+    sweep = make_sweep(tmp_path, early_stopping="median", min_epochs=1)
+    trial = make_trial(tmp_path, 0)
+    others = [make_trial(tmp_path, index, history=history(value)) for index, value in [(1, 0.5), (2, 0.7)]]
+    sweep.trials = [trial, *others]
+    should_stop = sweep._median_should_stop(trial)
+
+    write_progress(sweep, trial, [0.6])
+    assert not should_stop()
+
+    # Compared only against trials that reached the same epoch, at least MEDIAN_MIN_TRIALS of them
+    write_progress(sweep, trial, [0.6, 0.1])
+    assert not should_stop()
+    others[0].history = history(0.5, 0.9)
+    others[1].history = history(0.7, 0.8)
+    write_progress(sweep, trial, [0.6, 0.1, 0.1])
+    assert not should_stop(), "epoch 3 has no other trial"
+
+
+# ----------------------------------------------------------------------
+# Leaderboard
+
+def test_leaderboard_flags_the_pareto_front(tmp_path):
+    sweep = make_sweep(tmp_path)
+    results = [
+        # accuracy, training time, latency
+        ("completed", 0.9, 100., 5.),  # most accurate
+        ("completed", 0.8, 50., 5.),  # fastest to train
+        ("completed", 0.7, 80., 2.),  # lowest latency
+        ("completed", 0.8, 60., 6.),  # beaten by trial_001 on every axis
+        ("completed", 0.9, 100., 5.),  # ties with trial_000, neither beats the other
+        ("stopped", None, 10., None)
+    ]
+    sweep.trials = [
+        make_trial(
+            tmp_path, index, status=status, accuracy=accuracy, training_time_s=training_time,
+            latency_ms=latency, history=history(accuracy or 0.95)
+        )
+        for index, (status, accuracy, training_time, latency) in enumerate(results)
+    ]
+
+    rows = sweep.leaderboard()
+
+    pareto = {row["trial"]: row["pareto"] for row in rows}
+    assert pareto == {
+        "trial_000": True, "trial_001": True, "trial_002": True,
+        "trial_003": False, "trial_004": True, "trial_005": False
+    }
+    # Completed trials first by accuracy, then stopped ones, ranked by their validation accuracy
+    assert [row["status"] for row in rows] == ["completed"] * 5 + ["stopped"]
+    assert [row["accuracy"] for row in rows] == [0.9, 0.9, 0.8, 0.8, 0.7, 0.95]
+    assert math.isclose(rows[-1]["val_accuracy"], 0.95)
+
+
+# ----------------------------------------------------------------------
+# Workspaces
+
+def test_feature_cache_is_shared_next_to_the_base_model(tmp_path):
+    sweep = make_sweep(tmp_path)
+    base_model_dir = tmp_path / "shared" / "prepare_base_model-0123"
+
+    config = sweep._workspace_config({"prepare_base_model": base_model_dir})
+
+    assert config["prepare_base_model"]["root_dir"] == str(base_model_dir / "artifacts/prepare_base_model")
+    assert config["feature_cache"]["root_dir"] == str(base_model_dir / "artifacts/feature_cache")
+    assert config["training"]["root_dir"] == "artifacts/training"
@@ -0,0 +1,92 @@
+"""The lock that keeps a single training job running across server processes."""
+import json
+import os
+import threading
+import time
+import pytest
+from cnnClassifier.components.training_jobs import TrainingJobManager, TrainingJobRunning
+from cnnClassifier.entity.config_entity import TrainingJobsConfig
+
+
+def manager(tmp_path, seconds: float = 0.) -> TrainingJobManager:
+    return TrainingJobManager(TrainingJobsConfig(
+        root_dir=tmp_path,
+        progress_file=tmp_path / "progress.json",
+        trained_model_path=tmp_path / "model.keras",
+        command=["-c", f"import time; time.sleep({seconds})"]
+    ))
+
+
+def wait_until_finished(jobs: TrainingJobManager, job_id: str) -> dict:
+    for _ in range(200):
+        job = jobs.status(job_id)
+        if job["finished"] is not None and not jobs.lock_file.exists():
+            return job
+        time.sleep(0.05)
+    raise TimeoutError(job_id)
+
+
+def test_a_second_job_is_rejected_while_one_runs(tmp_path):
+    first, second = manager(tmp_path, seconds=2), manager(tmp_path)
+    job = first.submit()
+    with pytest.raises(TrainingJobRunning) as e:
+        second.submit()
+    assert e.value.job_id == job["job_id"]
+    assert wait_until_finished(first, job["job_id"])["status"] == "succeeded"
+    # The lock is released, a new job can start
+    wait_until_finished(second, second.submit()["job_id"])
+
+
+def test_concurrent_submissions_start_a_single_job(tmp_path):
+    managers = [manager(tmp_path, seconds=2) for _ in range(8)]
+    barrier = threading.Barrier(len(managers))
+    started, rejected = [], []
+
+    def submit(jobs):
+        barrier.wait()
+        try:
+            started.append(jobs.submit()["job_id"])
+        except TrainingJobRunning:
+            rejected.append(jobs)
+
+    threads = [threading.Thread(target=submit, args=(jobs,)) for jobs in managers]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(started) == 1 and len(rejected) == len(managers) - 1
+    wait_until_finished(managers[0], started[0])
+
+
+def test_an_empty_lock_counts_as_held(tmp_path):
+    jobs = manager(tmp_path)
+    jobs.lock_file.write_text("")
+    with pytest.raises(TrainingJobRunning):
+        jobs.submit()
+    assert jobs.lock_file.exists()
+
+    # Unless it was left behind long ago
+    old = time.time() - jobs.UNREADABLE_LOCK_TIMEOUT_S - 1
+    os.utime(jobs.lock_file, (old, old))
+    wait_until_finished(jobs, jobs.submit()["job_id"])
+
+
+@pytest.mark.parametrize("status", ["succeeded", "failed"])
+def test_the_lock_of_an_ended_job_is_cleared(tmp_path, status):
+    jobs = manager(tmp_path)
+    with open(tmp_path / "ended.json", "w") as f:
+        json.dump({"job_id": "ended", "status": status, "server_pid": os.getpid()}, f)
+    jobs.lock_file.write_text("ended")
+
+    assert jobs.running_job_id() is None
+    assert not jobs.lock_file.exists()
+    jobs.lock_file.write_text("ended")
+    wait_until_finished(jobs, jobs.submit()["job_id"])
+
+
+def test_the_lock_of_a_dead_server_is_cleared(tmp_path):
+    jobs = manager(tmp_path)
+    with open(tmp_path / "orphan.json", "w") as f:
+        json.dump({"job_id": "orphan", "status": "running", "server_pid": 2 ** 22 + 1}, f)
+    jobs.lock_file.write_text("orphan")
+    wait_until_finished(jobs, jobs.submit()["job_id"])